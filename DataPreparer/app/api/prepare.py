@@ -1,14 +1,44 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional, Dict, List
-from app.core.pipeline import apply_pipeline
-from app.core.minio_client import download_file_from_minio, upload_file_to_minio, upload_raw_file_to_minio
-from app.core.database import save_dataframe_to_db, engine
+from app.core.pipeline import (
+    fit_pipeline, apply_pipeline, compile_pipeline, with_downcast, PipelineValidationError, PipelinePlan, FittedPipeline, ReadPushdown,
+    PIPELINE_WORKERS
+)
+from app.core.chunked import (
+    fit_chunked, transform_chunked, output_schema, empty_frame, count_passes, SchemaAccumulator, DEFAULT_CHUNK_SIZE
+)
+from app.core.minio_client import (
+    download_file_from_minio, open_minio_stream, stat_minio_object, upload_file_to_minio, upload_chunks_to_minio,
+    upload_bytes_to_minio, read_chunks_from_minio, delete_object, MINIO_STREAMING
+)
+from app.core.streaming_upload import stream_upload, UploadError
+from app.core.jobs import submit_job, get_job, report_progress, JobQueueFull
+from app.core.profile import DatasetProfiler, merge_profiles
+from app.core.instrumentation import PrepareMetrics, StreamTimer
+from app.core.encoding import detect_encoding
+from app.core.preview import read_sample, schema_diff, SAMPLING_METHODS, PREVIEW_MAX_ROWS
+from app.core.prepare_cache import cache_key, lookup, release, collect_garbage, now as cache_now, PREPARE_CACHE_ENABLED
+from app.core.database import (
+    save_dataframe_to_db, save_dataset_metadata, create_indexes, engine, find_dataset, update_dataset_metadata, dataset_lock,
+    count_path_references, bulk_append
+)
+import numpy as np
 import pandas as pd
 import os
 import json
+import time
+from itertools import chain
+from contextlib import contextmanager
 from sqlalchemy import text
-import chardet  # <-- ajouté pour détecter l'encodage
+
+# Au-delà de cette taille (octets), le dataset est préparé chunk par chunk
+CHUNKED_MODE_MIN_BYTES = int(os.getenv("CHUNKED_MODE_MIN_BYTES", str(512 * 1024 * 1024)))
+# Format des datasets nettoyés dans MinIO : parquet (colonnaire, compressé) ou csv
+CLEANED_DATASET_FORMAT = os.getenv("CLEANED_DATASET_FORMAT", "parquet")
+# Réduction automatique des types en fin de pipeline, si la requête ne précise rien
+PREPARE_OPTIMIZE_DTYPES = os.getenv("PREPARE_OPTIMIZE_DTYPES", "false").lower() == "true"
 
 
 router = APIRouter()
@@ -58,82 +88,666 @@ class PrepareRequest(BaseModel):
     file_path: str
     pipeline: Dict
     dataset_id: Optional[str] = None
+    # Nombre de lignes par chunk : force le mode chunké (automatique pour les gros fichiers)
+    chunk_size: Optional[int] = None
+    # Colonnes du dataset nettoyé à indexer dans PostgreSQL (index créés après le chargement)
+    indexes: Optional[List[str]] = None
+    # Réutiliser une préparation identique (même objet source, même plan) si elle existe
+    use_cache: bool = True
+    # Réduire les types en fin de pipeline (entiers/flottants étroits, category) ; défaut : PREPARE_OPTIMIZE_DTYPES
+    optimize_dtypes: Optional[bool] = None
+    # Threads du mode mémoire (étapes colonne par colonne exécutées par blocs de colonnes) ; défaut : PIPELINE_WORKERS
+    workers: Optional[int] = None
+
+class AppendRequest(BaseModel):
+    # Fichier contenant uniquement les nouvelles lignes (CSV ou JSON, mêmes colonnes que la source)
+    file_path: str
+    # Nombre de lignes par chunk pour la lecture du delta et la réécriture du dataset nettoyé
+    chunk_size: Optional[int] = None
+
+class PreviewRequest(BaseModel):
+    file_path: str
+    pipeline: Dict
+    # Nombre de lignes de l'échantillon (au plus PREVIEW_MAX_ROWS)
+    rows: int = 100
+    # "head" (premières lignes) ou "reservoir" (lignes tirées au hasard dans tout le fichier)
+    sampling: str = "head"
+    seed: int = 0
 
 # ===== Fonctions pour lire les fichiers avec encodage automatique =====
-def read_csv_with_encoding(file_path):
-    rawdata = open(file_path, "rb").read()
-    encoding = chardet.detect(rawdata)['encoding']
-    return pd.read_csv(file_path, encoding=encoding)
+def read_csv_with_encoding(open_source, encoding: str, pushdown: Optional[ReadPushdown] = None):
+    pushdown = pushdown or ReadPushdown()
+    with open_source() as stream:
+        if not pushdown.filters:
+            return pd.read_csv(stream, encoding=encoding, usecols=pushdown.usecols)
+        # Filtres appliqués chunk par chunk : les lignes écartées ne sont jamais toutes en mémoire
+        with pd.read_csv(stream, encoding=encoding, usecols=pushdown.usecols, chunksize=DEFAULT_CHUNK_SIZE) as reader:
+            return pd.concat([pushdown.apply(chunk) for chunk in reader])
 
-def read_json_with_encoding(file_path):
-    rawdata = open(file_path, "rb").read()
-    encoding = chardet.detect(rawdata)['encoding']
-    return pd.read_json(file_path, encoding=encoding)
+def read_json_with_encoding(open_source, encoding: str):
+    with open_source() as stream:
+        return pd.read_json(stream, encoding=encoding)
 
-@router.post("/prepare")
-def prepare_dataset(request: PrepareRequest):
+@contextmanager
+def _open_local_file(local_file: str, offset: int = 0, length: int = 0):
+    with open(local_file, "rb") as f:
+        f.seek(offset)
+        yield f
+
+def open_dataset_source(file_path: str):
+    """
+    Préparer la lecture d'un fichier source stocké dans MinIO
+
+    Par défaut l'objet est lu en flux, sans copie sur disque ; chaque lecture
+    (échantillons de détection d'encodage, passes du mode chunké) ouvre un nouveau
+    flux. Avec MINIO_STREAMING=false, l'objet est d'abord téléchargé dans un
+    fichier temporaire.
+
+    Returns:
+        Tuple (fonction ouvrant un flux binaire à partir de (position, nombre
+        d'octets), par défaut le fichier entier ; fichier temporaire ou None)
+    """
+    if MINIO_STREAMING:
+        return (lambda offset=0, length=0: open_minio_stream(file_path, offset=offset, length=length)), None
+    local_file = download_file_from_minio(file_path)
+    return (lambda offset=0, length=0: _open_local_file(local_file, offset, length)), local_file
+
+def memory_bytes(df: pd.DataFrame) -> int:
+    """Empreinte mémoire d'un DataFrame (chaînes comprises)"""
+    return int(df.memory_usage(deep=True).sum())
+
+def memory_report(input_bytes: int, output_bytes: int) -> Dict:
+    """Empreinte mémoire avant (données lues) et après (dataset nettoyé) la préparation"""
+    return {
+        "input_bytes": input_bytes,
+        "output_bytes": output_bytes,
+        "reduction": round(input_bytes / output_bytes, 2) if output_bytes else None
+    }
+
+def column_dtypes(df: pd.DataFrame) -> Dict[str, str]:
+    """Dtype de chaque colonne, dans l'ordre du DataFrame"""
+    return {str(col): str(dtype) for col, dtype in df.dtypes.items()}
+
+def _no_progress(step: str, rows_processed: Optional[int] = None) -> None:
+    pass
+
+def check_indexes(indexes: Optional[List[str]], columns: List[str]) -> None:
+    """Refuser (400) les colonnes à indexer absentes du dataset nettoyé"""
+    missing = [col for col in indexes or [] if col not in columns]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Colonnes à indexer absentes du dataset nettoyé: {missing}")
+
+def prepare_chunked(
+    open_source, encoding: str, plan: PipelinePlan, chunk_size: int, cleaned_path: str, table_name: str,
+    profiler: DatasetProfiler, report=_no_progress, metrics: Optional[PrepareMetrics] = None,
+    indexes: Optional[List[str]] = None
+):
+    """
+    Préparer un CSV chunk par chunk, sans jamais le charger entièrement en mémoire
+
+    Le schéma du dataset nettoyé (dtypes unifiés sur tous les chunks) est fixé
+    après l'ajustement : la table PostgreSQL est créée à partir de lui et chaque
+    chunk transformé y est conformé avant d'être écrit. Le profil des colonnes est
+    accumulé dans profiler pendant la passe d'écriture, les durées des passes et
+    des étapes dans metrics.
+
+    Returns:
+        Tuple (nombre de lignes, dtypes par colonne, pipeline ajusté, statistiques
+        de chargement) du dataset nettoyé ; les statistiques contiennent la durée du
+        chargement PostgreSQL (db_seconds), l'empreinte mémoire cumulée des chunks
+        lus (input_bytes) et écrits (output_bytes) et le nombre de lectures de la
+        source (passes)
     """
-    Endpoint pour préparer un dataset :
-    1. Télécharger depuis MinIO
+    # Colonnes supprimées et filtres de tête appliqués dès la lecture de chaque chunk
+    pushdown = plan.read_pushdown()
+
+    def read_chunks(dtype=None):
+        with open_source() as stream, pd.read_csv(
+            stream, encoding=encoding, usecols=pushdown.usecols, dtype=dtype, chunksize=chunk_size
+        ) as reader:
+            for chunk in reader:
+                yield pushdown.apply(chunk)
+
+    # Passe(s) 1 : statistiques d'ajustement et dtypes de chaque chunk
+    metrics = metrics or PrepareMetrics()
+    passes = count_passes(plan)
+    report("fitting")
+    with metrics.phase("fit"):
+        schema = SchemaAccumulator()
+        states = fit_chunked(plan, read_chunks, schema)
+        input_dtypes = schema.finalize()
+        if not schema.stable and plan.fit_stages():
+            # Dtypes différents d'un chunk à l'autre : statistiques réajustées sur les dtypes unifiés
+            states = fit_chunked(plan, lambda: read_chunks(input_dtypes))
+            passes += len(plan.fit_stages())
+    with open_source() as stream:
+        input_columns = list(pd.read_csv(stream, encoding=encoding, nrows=0).columns)
+
+    # Schéma du dataset nettoyé, connu avant toute écriture
+    dtypes = output_schema(plan, states, input_dtypes)
+    check_indexes(indexes, list(dtypes))
+
+    # Passe 2 : transformation et écriture au fil de l'eau vers MinIO et PostgreSQL
+    stats = {"rows": 0, "db_seconds": 0.0, "input_bytes": 0, "output_bytes": 0, "passes": passes}
+    report("transforming", 0)
+    stats["db_seconds"] += save_dataframe_to_db(empty_frame(dtypes), table_name)["seconds"]
+
+    def measured_chunks():
+        for chunk in read_chunks(input_dtypes):
+            stats["input_bytes"] += memory_bytes(chunk)
+            yield chunk
+
+    def load_chunks():
+        for chunk in transform_chunked(plan, measured_chunks(), states, metrics):
+            chunk = align_to_schema(chunk, dtypes)
+            load = save_dataframe_to_db(chunk, table_name, if_exists="append")
+            stats["db_seconds"] += load["seconds"]
+            stats["rows"] += len(chunk)
+            stats["output_bytes"] += memory_bytes(chunk)
+            profiler.update(chunk)
+            report("transforming", stats["rows"])
+            yield chunk
+
+    # Durée de l'envoi vers MinIO : temps total moins celui passé à produire les chunks
+    loaded = StreamTimer()
+    upload_start = time.perf_counter()
+    upload_chunks_to_minio(cleaned_path, loaded.wrap(load_chunks()))
+    metrics.add_phase("upload", time.perf_counter() - upload_start - loaded.seconds)
+    metrics.add_phase("db_load", stats["db_seconds"])
+    return stats.pop("rows"), dtypes, FittedPipeline(plan.operations, states, input_columns, list(dtypes)), stats
+
+def cached_response(record: Dict, request: PrepareRequest, key: str) -> Dict:
+    """Réponse de /prepare pour une préparation réutilisée depuis le cache"""
+    columns = json.loads(record["columns"]) if isinstance(record.get("columns"), str) else record.get("columns") or []
+    dtypes = json.loads(record["dtypes"]) if isinstance(record.get("dtypes"), str) else record.get("dtypes") or {}
+    check_indexes(request.indexes, columns)
+    rows = int(record["rows"])
+    return {
+        "status": "success",
+        "dataset_id": record["dataset_id"],
+        "cleaned_dataset_path": record["cleaned_path"],
+        "fitted_pipeline_path": record["fitted_pipeline_path"],
+        "table_name": record["table_name"],
+        "cache": {"key": key, "hit": True},
+        "metadata": {
+            "rows": rows,
+            "columns": columns,
+            "dtypes": dtypes,
+            "shape": (rows, len(columns)),
+            "mode": "cached",
+            "passes": 0,
+            # Index demandés absents de la table réutilisée : créés maintenant
+            "db_load": {"indexes": create_indexes(record["table_name"], request.indexes)}
+        }
+    }
+
+def run_prepare(request: PrepareRequest, report=_no_progress):
+    """
+    Préparer un dataset :
+    1. Lire depuis MinIO (en flux)
     2. Charger avec pandas
     3. Appliquer le pipeline de transformations
     4. Sauvegarder le dataset nettoyé dans MinIO et PostgreSQL
+
+    Args:
+        request: Paramètres de la préparation
+        report: Fonction appelée avec (étape, lignes traitées) à chaque avancement
+
+    Returns:
+        Résultat de la préparation (chemins, métadonnées)
     """
-    try:
-        # 1. Télécharger le fichier depuis MinIO
-        local_file = download_file_from_minio(request.file_path)
-
-        # 2. Charger les données dans pandas avec détection automatique d'encodage
-        if local_file.endswith('.csv'):
-            df = read_csv_with_encoding(local_file)
-        elif local_file.endswith('.json'):
-            df = read_json_with_encoding(local_file)
-        else:
-            raise HTTPException(status_code=400, detail="Format de fichier non supporté. Utilisez CSV ou JSON.")
+    # 0. Valider et compiler le pipeline avant tout transfert (plan mis en cache)
+    plan = compile_pipeline(request.pipeline)
+    optimize_dtypes = PREPARE_OPTIMIZE_DTYPES if request.optimize_dtypes is None else request.optimize_dtypes
+    if optimize_dtypes:
+        plan = with_downcast(plan)
+    workers = PIPELINE_WORKERS if request.workers is None else request.workers
+    if workers < 1:
+        raise HTTPException(status_code=400, detail="workers doit être supérieur ou égal à 1")
 
-        # 3. Appliquer le pipeline
-        df_cleaned = apply_pipeline(df, request.pipeline)
+    # 1. Préparation déjà effectuée sur le même objet source avec un plan équivalent ?
+    source = stat_minio_object(request.file_path)
+    key = cache_key(source.etag, plan, CLEANED_DATASET_FORMAT)
+    if request.use_cache and PREPARE_CACHE_ENABLED:
+        cached = lookup(key, request.dataset_id)
+        if cached is not None:
+            return cached_response(cached, request, key)
 
-        # 4. Sauvegarder la version nettoyée dans MinIO
-        cleaned_path = f"cleaned/{os.path.basename(request.file_path)}"
-        upload_file_to_minio(cleaned_path, df_cleaned)
+    # 2. Ouvrir le fichier depuis MinIO (flux, ou fichier temporaire en repli)
+    metrics = PrepareMetrics()
+    report("reading")
+    with metrics.phase("download"):
+        open_source, local_file = open_dataset_source(request.file_path)
+    ext = os.path.splitext(request.file_path)[1].lower()
 
-        # 5. Générer un ID de dataset unique
+    try:
         dataset_id = request.dataset_id or f"dataset_{pd.Timestamp.now().value}"
-        
-        # 6. Sauvegarder le DataFrame nettoyé dans PostgreSQL
-        table_name = f"dataset_{dataset_id}".replace("-", "_").replace(".", "_")
-        save_dataframe_to_db(df_cleaned, table_name)
+        # Table propre à la préparation : une entrée de même dataset_id ne voit jamais sa table réécrite
+        table_name = f"dataset_{dataset_id}".replace("-", "_").replace(".", "_")[:50] + f"_{key[:12]}"
+        stem = os.path.splitext(os.path.basename(request.file_path))[0]
+        # Chemin adressé par contenu : deux pipelines différents ne s'écrasent pas
+        cleaned_path = f"cleaned/{stem}-{key[:16]}.{CLEANED_DATASET_FORMAT}"
 
-        # 7. Sauvegarder les métadonnées dans une table séparée
-        metadata_df = pd.DataFrame([{
-            "dataset_id": dataset_id,
-            "table_name": table_name,
-            "original_path": request.file_path,
-            "cleaned_path": cleaned_path,
-            "rows": len(df_cleaned),
-            "columns": json.dumps(list(df_cleaned.columns)),
-            "pipeline": json.dumps(request.pipeline)
-        }])
-        metadata_df.to_sql("dataset_metadata", engine, if_exists="append", index=False)
-
-        # Nettoyer le fichier temporaire
-        if os.path.exists(local_file):
+        chunk_size = request.chunk_size
+        if not chunk_size and source.size >= CHUNKED_MODE_MIN_BYTES:
+            chunk_size = DEFAULT_CHUNK_SIZE
+        # Profil des colonnes, calculé sur les données au moment où elles sont écrites
+        profiler = DatasetProfiler()
+        # Encodage détecté sur échantillons (mémorisé par ETag)
+        with metrics.phase("encoding"):
+            encoding = detect_encoding(open_source, source.size, source.etag)
+
+        if chunk_size:
+            # Mode chunké : mémoire bornée par la taille d'un chunk
+            if ext != '.csv':
+                raise HTTPException(status_code=400, detail="Le mode chunké ne supporte que les fichiers CSV.")
+            rows, dtypes, fitted, load_stats = prepare_chunked(
+                open_source, encoding, plan, chunk_size, cleaned_path, table_name, profiler, report, metrics,
+                request.indexes
+            )
+            db_seconds = load_stats["db_seconds"]
+            passes = load_stats["passes"]
+            memory = memory_report(load_stats["input_bytes"], load_stats["output_bytes"])
+        else:
+            # 3. Charger les données dans pandas avec détection automatique d'encodage
+            if ext not in ('.csv', '.json'):
+                raise HTTPException(status_code=400, detail="Format de fichier non supporté. Utilisez CSV ou JSON.")
+            with metrics.phase("read"):
+                if ext == '.csv':
+                    df = read_csv_with_encoding(open_source, encoding, plan.read_pushdown())
+                else:
+                    df = read_json_with_encoding(open_source, encoding)
+
+            # 4. Appliquer le pipeline en conservant les statistiques ajustées
+            report("transforming", len(df))
+            input_bytes = memory_bytes(df)
+            with metrics.phase("transform"):
+                df_cleaned, fitted = fit_pipeline(df, plan, workers, metrics)
+            del df
+            rows, dtypes = len(df_cleaned), column_dtypes(df_cleaned)
+            passes = 1
+            check_indexes(request.indexes, list(dtypes))
+            memory = memory_report(input_bytes, memory_bytes(df_cleaned))
+            with metrics.phase("profile"):
+                profiler.update(df_cleaned)
+
+            # 5. Sauvegarder la version nettoyée dans MinIO
+            report("uploading", rows)
+            with metrics.phase("upload"):
+                upload_file_to_minio(cleaned_path, df_cleaned)
+
+            # 6. Sauvegarder le DataFrame nettoyé dans PostgreSQL (COPY)
+            report("loading_db", rows)
+            db_seconds = save_dataframe_to_db(df_cleaned, table_name)["seconds"]
+            metrics.add_phase("db_load", db_seconds)
+    finally:
+        # Nettoyer le fichier temporaire (mode repli)
+        if local_file and os.path.exists(local_file):
             os.remove(local_file)
 
+    columns = list(dtypes)
+    report("indexing", rows)
+    index_start = time.perf_counter()
+    indexes = create_indexes(table_name, request.indexes)
+    index_seconds = time.perf_counter() - index_start
+    metrics.add_phase("indexing", index_seconds)
+
+    report("saving_metadata", rows)
+
+    # 7. Sauvegarder le pipeline ajusté à côté du dataset nettoyé (transform sans réajustement)
+    fitted.pipeline = request.pipeline
+    fitted_pipeline_path = f"{os.path.splitext(cleaned_path)[0]}.pipeline.json"
+    upload_bytes_to_minio(fitted_pipeline_path, fitted.to_json().encode("utf-8"), content_type="application/json")
+
+    # 8. Sauvegarder les métadonnées dans une table séparée (entrée du cache) ;
+    # l'entrée d'une préparation antérieure de même dataset_id est remplacée
+    timestamp = cache_now()
+    replaced = save_dataset_metadata({
+        "dataset_id": dataset_id,
+        "table_name": table_name,
+        "original_path": request.file_path,
+        "cleaned_path": cleaned_path,
+        "rows": rows,
+        "columns": json.dumps(columns),
+        "dtypes": json.dumps(dtypes),
+        "profile": json.dumps(profiler.finalize()),
+        "metrics": json.dumps(metrics.report()),
+        "pipeline": json.dumps(request.pipeline),
+        "fitted_pipeline_path": fitted_pipeline_path,
+        "source_etag": source.etag,
+        "cache_key": key,
+        "created_at": timestamp,
+        "last_used_at": timestamp
+    })
+    release(replaced)
+    metrics.emit(dataset_id=dataset_id, mode="chunked" if chunk_size else "memory", rows=rows)
+
+    return {
+        "status": "success",
+        "dataset_id": dataset_id,
+        "cleaned_dataset_path": cleaned_path,
+        "fitted_pipeline_path": fitted_pipeline_path,
+        "table_name": table_name,
+        "cache": {"key": key, "hit": False},
+        "metadata": {
+            "rows": rows,
+            "columns": columns,
+            "dtypes": dtypes,
+            "shape": (rows, len(columns)),
+            "mode": "chunked" if chunk_size else "memory",
+            "passes": passes,
+            "workers": 1 if chunk_size else workers,
+            "memory": memory,
+            "pushdown": plan.read_pushdown().summary() if ext == '.csv' else None,
+            "metrics": metrics.report(),
+            "db_load": {
+                "seconds": round(db_seconds, 3),
+                "rows_per_second": round(rows / db_seconds) if db_seconds else None,
+                "indexes": indexes,
+                "index_seconds": round(index_seconds, 3)
+            }
+        }
+    }
+
+@router.post("/prepare")
+def prepare_dataset(request: PrepareRequest):
+    """Endpoint pour préparer un dataset de façon synchrone (voir /prepare/jobs pour les gros datasets)"""
+    try:
+        return run_prepare(request)
+    except HTTPException:
+        raise
+    except PipelineValidationError as e:
+        raise HTTPException(status_code=400, detail=f"Pipeline invalide: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la préparation: {str(e)}")
+
+def _prepare_job(job_id: str, payload: Dict, progress) -> Dict:
+    """Exécuter une préparation dans un processus du pool et renvoyer l'état final du job"""
+    def report(step: str, rows_processed: Optional[int] = None) -> None:
+        report_progress(progress, job_id, step, rows_processed)
+
+    # Aucune exception ne traverse la frontière du processus : l'erreur est rendue dans l'état
+    try:
+        return {"status": "completed", "step": "done", "result": run_prepare(PrepareRequest(**payload), report)}
+    except HTTPException as e:
+        return {"status": "failed", "status_code": e.status_code, "error": e.detail}
+    except PipelineValidationError as e:
+        return {"status": "failed", "status_code": 400, "error": f"Pipeline invalide: {str(e)}"}
+    except Exception as e:
+        return {"status": "failed", "status_code": 500, "error": f"Erreur lors de la préparation: {str(e)}"}
+
+@router.post("/prepare/preview")
+def preview_pipeline(request: PreviewRequest):
+    """
+    Aperçu d'un pipeline sur un échantillon borné du fichier source
+
+    L'échantillon est lu par requêtes de plage (quelques blocs, quelle que soit la
+    taille du fichier) ; rien n'est écrit dans MinIO ni dans PostgreSQL. Les dtypes
+    sont inférés sur l'échantillon et peuvent différer de ceux du dataset complet.
+    """
+    start = time.perf_counter()
+    try:
+        if request.sampling not in SAMPLING_METHODS:
+            raise HTTPException(status_code=400, detail=f"sampling doit valoir {' ou '.join(sorted(SAMPLING_METHODS))}")
+        if not 1 <= request.rows <= PREVIEW_MAX_ROWS:
+            raise HTTPException(status_code=400, detail=f"rows doit être compris entre 1 et {PREVIEW_MAX_ROWS}")
+        ext = os.path.splitext(request.file_path)[1].lower()
+        if ext not in ('.csv', '.json'):
+            raise HTTPException(status_code=400, detail="Format de fichier non supporté. Utilisez CSV ou JSON.")
+        plan = compile_pipeline(request.pipeline)
+
+        source = stat_minio_object(request.file_path)
+        # Lectures par plage : aucune copie sur disque, même sans MINIO_STREAMING
+        open_source = lambda offset=0, length=0: open_minio_stream(request.file_path, offset=offset, length=length)
+        encoding = detect_encoding(open_source, source.size, source.etag)
+        try:
+            sample = read_sample(open_source, source.size, ext, encoding, request.rows, request.sampling, request.seed)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        transformed = apply_pipeline(sample, plan)
+        before, after = column_dtypes(sample), column_dtypes(transformed)
         return {
             "status": "success",
-            "dataset_id": dataset_id,
-            "cleaned_dataset_path": cleaned_path,
-            "table_name": table_name,
-            "metadata": {
-                "rows": len(df_cleaned),
-                "columns": list(df_cleaned.columns),
-                "shape": df_cleaned.shape
+            "sampling": request.sampling,
+            "rows_in": len(sample),
+            "rows_out": len(transformed),
+            # Sérialisation JSON de pandas : NaN -> null, dates ISO, types numpy convertis
+            "sample": json.loads(transformed.to_json(orient="records", date_format="iso")),
+            "schema": {"input": before, "output": after, "diff": schema_diff(before, after)},
+            "ignored_steps": list(plan.ignored_steps),
+            "seconds": round(time.perf_counter() - start, 3)
+        }
+    except HTTPException:
+        raise
+    except PipelineValidationError as e:
+        raise HTTPException(status_code=400, detail=f"Pipeline invalide: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur lors de l'aperçu: {str(e)}")
+
+@router.post("/prepare/jobs")
+def submit_prepare_job(request: PrepareRequest):
+    """
+    Soumettre une préparation exécutée en tâche de fond sur le pool de processus
+
+    Le pipeline est validé immédiatement ; l'avancement se suit avec
+    GET /prepare/jobs/{job_id}.
+    """
+    try:
+        compile_pipeline(request.pipeline)
+        job_id = submit_job(_prepare_job, request.model_dump())
+    except PipelineValidationError as e:
+        raise HTTPException(status_code=400, detail=f"Pipeline invalide: {str(e)}")
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"File de préparation pleine: {str(e)}")
+    return {"job_id": job_id, "status": "submitted"}
+
+@router.get("/prepare/jobs/{job_id}")
+def get_prepare_job(job_id: str):
+    """Statut d'un job de préparation : étape courante, lignes traitées, résultat ou erreur"""
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job non trouvé")
+    return job
+
+@router.post("/prepare/cache/gc")
+def collect_prepare_cache(dry_run: bool = False):
+    """
+    Supprimer les préparations non référencées (entrées supplantées, source modifiée,
+    expirées selon PREPARE_CACHE_TTL_DAYS, au-delà de PREPARE_CACHE_MAX_ENTRIES)
+    """
+    try:
+        return collect_garbage(dry_run=dry_run)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur lors du nettoyage du cache: {str(e)}")
+
+def checked_cast(series: pd.Series, dtype: str) -> pd.Series:
+    """
+    Convertir une colonne vers dtype, sans altérer de valeur
+
+    astype ramène silencieusement un entier hors bornes dans la plage du type
+    (300 -> 44 en int8) et tronque un flottant converti en entier : les valeurs
+    converties en entier doivent redonner les valeurs d'origine, et aucune valeur
+    finie ne doit devenir infinie en flottant.
+
+    Raises:
+        ValueError: Valeur non représentable dans dtype
+    """
+    with np.errstate(over="ignore"):
+        cast = series.astype(dtype)
+    if not pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+        return cast
+    values = series.dropna()
+    if pd.api.types.is_integer_dtype(cast.dtype):
+        lost = cast.loc[values.index].astype(values.dtype) != values
+    elif pd.api.types.is_float_dtype(cast.dtype):
+        lost = np.isinf(cast.loc[values.index].astype("float64")) & np.isfinite(values.astype("float64"))
+    else:
+        return cast
+    if lost.any():
+        raise ValueError(f"{int(lost.sum())} valeur(s) hors de la plage du type (ex. {values[lost].iloc[0]})")
+    return cast
+
+def align_to_schema(chunk: pd.DataFrame, dtypes: Dict[str, str]) -> pd.DataFrame:
+    """Colonnes (ordre compris) et dtypes du dataset préparé imposés à un chunk transformé"""
+    chunk = chunk.rename(columns=str)
+    missing = [col for col in dtypes if col not in chunk.columns]
+    extra = [col for col in chunk.columns if col not in dtypes]
+    if missing or extra:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Colonnes incompatibles avec le dataset préparé (manquantes: {missing}, en trop: {extra})"
+        )
+    chunk = chunk[list(dtypes)]
+    for col, dtype in dtypes.items():
+        if str(chunk[col].dtype) != dtype:
+            try:
+                chunk[col] = checked_cast(chunk[col], dtype)
+            except (TypeError, ValueError) as e:
+                raise HTTPException(status_code=400, detail=f"Colonne '{col}' incompatible avec le type {dtype}: {e}")
+    return chunk
+
+def run_append(dataset_id: str, request: AppendRequest, report=_no_progress):
+    """
+    Ajouter les lignes d'un fichier delta à un dataset préparé, sans le repréparer
+
+    Le pipeline ajusté lors de la préparation est appliqué tel quel aux nouvelles
+    lignes : les statistiques (moyennes, échelles, catégories...) ne sont pas
+    réajustées, les lignes existantes et ajoutées restent donc encodées de la même
+    façon. Le profil des colonnes est mis à jour avec celui des nouvelles lignes.
+    Les lignes sont ajoutées à la table PostgreSQL (une seule transaction) et le
+    dataset nettoyé est réécrit en flux dans un nouvel objet (anciennes lignes
+    relues telles quelles, sans transformation). L'entrée quitte le cache : son
+    contenu ne correspond plus à la source d'origine.
+
+    Les ajouts à un même dataset sont sérialisés (dataset_lock) : chacun relit
+    l'entrée laissée par le précédent, aucun ajout n'est perdu.
+
+    Args:
+        dataset_id: Dataset préparé à compléter
+        request: Fichier delta et taille des chunks
+        report: Fonction appelée avec (étape, lignes traitées) à chaque avancement
+
+    Returns:
+        Résultat de l'ajout (chemins, lignes ajoutées, métadonnées)
+    """
+    with dataset_lock(dataset_id):
+        return _append(dataset_id, request, report)
+
+def _append(dataset_id: str, request: AppendRequest, report):
+    """Corps de run_append, exécuté sous le verrou du dataset"""
+    record = find_dataset(dataset_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Dataset non trouvé")
+    if not record.get("fitted_pipeline_path") or not record.get("cleaned_path") or not record.get("table_name"):
+        raise HTTPException(status_code=400, detail="Le dataset n'a pas été préparé (aucun pipeline ajusté)")
+    ext = os.path.splitext(request.file_path)[1].lower()
+    if ext not in ('.csv', '.json'):
+        raise HTTPException(status_code=400, detail="Format de fichier non supporté. Utilisez CSV ou JSON.")
+    chunk_size = request.chunk_size or DEFAULT_CHUNK_SIZE
+
+    with open_minio_stream(record["fitted_pipeline_path"]) as stream:
+        fitted = FittedPipeline.from_json(stream.read())
+    dtypes = json.loads(record["dtypes"])
+    table_name, old_path = record["table_name"], record["cleaned_path"]
+    appends = json.loads(record.get("appends") or "[]")
+    # Nouvel objet : l'ancien peut être partagé par une autre entrée (chemin adressé par contenu)
+    new_path = f"cleaned/{dataset_id}-v{len(appends) + 1}{os.path.splitext(old_path)[1]}"
+
+    metrics = PrepareMetrics()
+    profiler = DatasetProfiler()
+    source = stat_minio_object(request.file_path)
+    report("reading")
+    with metrics.phase("download"):
+        open_source, local_file = open_dataset_source(request.file_path)
+    try:
+        with metrics.phase("encoding"):
+            encoding = detect_encoding(open_source, source.size, source.etag)
+
+        def delta_chunks():
+            if ext == '.json':
+                yield read_json_with_encoding(open_source, encoding)
+                return
+            with open_source() as stream, pd.read_csv(stream, encoding=encoding, chunksize=chunk_size) as reader:
+                yield from reader
+
+        stats = {"rows": 0, "db_seconds": 0.0}
+        with bulk_append(table_name) as load:
+            def new_rows():
+                for chunk in fitted.transform_stream(delta_chunks()):
+                    chunk = align_to_schema(chunk, dtypes)
+                    if chunk.empty:
+                        continue
+                    stats["db_seconds"] += load(chunk)["seconds"]
+                    stats["rows"] += len(chunk)
+                    profiler.update(chunk)
+                    report("appending", stats["rows"])
+                    yield chunk
+
+            # Anciennes lignes relues telles quelles, puis nouvelles lignes transformées ;
+            # la transaction n'est validée qu'une fois le nouvel objet écrit
+            try:
+                with metrics.phase("rewrite"):
+                    upload_chunks_to_minio(new_path, chain(read_chunks_from_minio(old_path, chunk_size), new_rows()))
+            except Exception:
+                delete_object(new_path)
+                raise
+        metrics.add_phase("db_load", stats["db_seconds"])
+    finally:
+        if local_file and os.path.exists(local_file):
+            os.remove(local_file)
+
+    report("saving_metadata", stats["rows"])
+    rows = int(record["rows"]) + stats["rows"]
+    timestamp = cache_now()
+    appends.append({"file_path": request.file_path, "source_etag": source.etag, "rows": stats["rows"], "appended_at": timestamp})
+    values = {
+        "rows": rows,
+        "cleaned_path": new_path,
+        "appends": json.dumps(appends),
+        "cache_key": None,
+        "last_used_at": timestamp,
+    }
+    if record.get("profile"):
+        values["profile"] = json.dumps(merge_profiles(json.loads(record["profile"]), profiler.finalize()))
+    update_dataset_metadata(dataset_id, values)
+    if count_path_references(old_path) == 0:
+        delete_object(old_path)
+    metrics.emit(dataset_id=dataset_id, mode="append", rows=stats["rows"])
+
+    return {
+        "status": "success",
+        "dataset_id": dataset_id,
+        "cleaned_dataset_path": new_path,
+        "fitted_pipeline_path": record["fitted_pipeline_path"],
+        "table_name": table_name,
+        "metadata": {
+            "rows_appended": stats["rows"],
+            "rows": rows,
+            "columns": list(dtypes),
+            "dtypes": dtypes,
+            "shape": (rows, len(dtypes)),
+            "mode": "append",
+            "appends": len(appends),
+            "metrics": metrics.report(),
+            "db_load": {
+                "seconds": round(stats["db_seconds"], 3),
+                "rows_per_second": round(stats["rows"] / stats["db_seconds"]) if stats["db_seconds"] else None
             }
         }
+    }
+
+@router.post("/prepare/{dataset_id}/append")
+def append_to_dataset(dataset_id: str, request: AppendRequest):
+    """Ajouter les lignes d'un fichier delta à un dataset préparé (pipeline ajusté réappliqué, sans réajustement)"""
+    try:
+        return run_append(dataset_id, request)
+    except HTTPException:
+        raise
+    except PipelineValidationError as e:
+        raise HTTPException(status_code=400, detail=f"Pipeline ajusté invalide: {str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur lors de la préparation: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de l'ajout: {str(e)}")
 
 @router.get("/prepare/{dataset_id}")
 def get_prepared_dataset(dataset_id: str):
@@ -150,6 +764,18 @@ def get_prepared_dataset(dataset_id: str):
         if isinstance(metadata.get("columns"), str):
             metadata["columns"] = json.loads(metadata["columns"])
         
+        if isinstance(metadata.get("dtypes"), str):
+            metadata["dtypes"] = json.loads(metadata["dtypes"])
+        
+        if isinstance(metadata.get("profile"), str):
+            metadata["profile"] = json.loads(metadata["profile"])
+        
+        if isinstance(metadata.get("metrics"), str):
+            metadata["metrics"] = json.loads(metadata["metrics"])
+        
+        if isinstance(metadata.get("appends"), str):
+            metadata["appends"] = json.loads(metadata["appends"])
+        
         if isinstance(metadata.get("pipeline"), str):
             metadata["pipeline"] = json.loads(metadata["pipeline"])
         
@@ -163,50 +789,63 @@ def get_prepared_dataset(dataset_id: str):
         return metadata
     except HTTPException:
         raise
-@router.post("/upload")
-async def upload_dataset(file: UploadFile = File(...)):
+# Corps multipart lu en flux par l'endpoint : schéma déclaré pour la documentation OpenAPI
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"]
+                }
+            }
+        }
+    }
+}
+
+@router.post("/upload", openapi_extra=UPLOAD_OPENAPI)
+async def upload_dataset(request: Request):
     """
     Endpoint pour uploader un dataset brut vers MinIO
+
+    Le fichier est transmis en flux (upload multipart, parts bornées) pendant sa
+    réception ; l'empreinte SHA-256 et la forme du CSV sont calculées au passage.
     """
     try:
-        # Lire le fichier en mémoire (attention aux gros fichiers, mais ok pour démo)
-        contents = await file.read()
-        file_size = len(contents)
-        
-        # Reset curseur pour upload
-        await file.seek(0)
-        
-        # Nom du fichier dans MinIO (on garde le nom d'origine pour simplifier)
-        filename = file.filename
-        
-        # Upload
-        minio_path = upload_raw_file_to_minio(file.file, filename, file_size)
-        
+        upload = await stream_upload(request, field="file")
+        minio_path, filename = upload["minio_path"], upload["filename"]
+
         # Enregistrer les métadonnées pour qu'il apparaisse dans la liste
         dataset_id = f"dataset_{pd.Timestamp.now().value}"
-        
-        # On ne connaît pas encore les colonnes/lignes car c'est brut,
-        # mais on crée l'entrée pour qu'elle soit listable.
-        metadata_df = pd.DataFrame([{
+
+        # Le dataset est brut : pas encore de table SQL ni de pipeline,
+        # lignes/colonnes estimées pendant la réception (CSV)
+        await run_in_threadpool(save_dataset_metadata, {
             "dataset_id": dataset_id,
             "table_name": None, # Pas encore de table SQL
             "original_path": minio_path,
             "cleaned_path": None,
-            "rows": 0,
-            "columns": json.dumps([]),
-            "pipeline": json.dumps({})
-        }])
-        
-        # Sauvegarde en bdd
-        metadata_df.to_sql("dataset_metadata", engine, if_exists="append", index=False)
+            "rows": upload["rows"] or 0,
+            "columns": json.dumps(upload["columns"] or []),
+            "pipeline": json.dumps({}),
+            "size_bytes": upload["size"],
+            "sha256": upload["sha256"]
+        })
 
         return {
             "status": "success",
             "message": f"Fichier {filename} uploadé avec succès",
             "minio_path": minio_path,
             "filename": filename,
-            "dataset_id": dataset_id
+            "dataset_id": dataset_id,
+            "size": upload["size"],
+            "sha256": upload["sha256"],
+            "rows": upload["rows"],
+            "columns": upload["columns"]
         }
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'upload: {str(e)}")
-
@@ -0,0 +1,197 @@
+"""
+Exécution out-of-core d'un pipeline : ajustement puis transformation chunk par chunk
+
+Passe(s) d'ajustement : les statistiques de chaque opération (moyennes, médianes,
+modes, min/max, écarts-types, ensembles de catégories) sont accumulées chunk par
+chunk. Les opérations indépendantes sont ajustées pendant la même passe ; une
+passe supplémentaire n'est nécessaire que lorsqu'une opération dépend du
+résultat d'une autre (ex: scaling après imputation des mêmes colonnes).
+
+Les types sont inférés par pandas chunk par chunk : une colonne entière dont
+seul un chunk tardif contient des valeurs manquantes y est lue en float64. La
+première passe relève donc les dtypes de chaque chunk et les unifie comme une
+lecture d'un bloc (SchemaAccumulator) ; les passes suivantes lisent la source
+avec ces dtypes, et le schéma de sortie est fixé avant la première écriture
+(output_schema).
+
+Passe de transformation : chaque chunk traverse le plan ajusté et est rendu à
+l'appelant, qui l'écrit au fil de l'eau. La mémoire reste bornée par la taille
+d'un chunk, pas par celle du dataset.
+"""
+import os
+import numpy as np
+import pandas as pd
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from app.core.instrumentation import PrepareMetrics, StreamTimer
+from app.core.pipeline import Accumulator, PipelinePlan
+
+# Nombre de lignes par chunk en mode chunké
+DEFAULT_CHUNK_SIZE = int(os.getenv("PREPARE_CHUNK_SIZE", "100000"))
+
+ChunkSource = Callable[[], Iterable[pd.DataFrame]]
+
+
+def _unified_dtype(current, dtype):
+    """Dtype d'une colonne dont deux chunks ont été lus avec des dtypes différents"""
+    if current == dtype:
+        return current
+    kinds = [d for d in (current, dtype) if pd.api.types.is_numeric_dtype(d) and not pd.api.types.is_bool_dtype(d)]
+    if len(kinds) == 2:
+        # Entiers puis flottants (valeurs manquantes) : float64, comme une lecture d'un bloc
+        return np.dtype("float64")
+    text = [d for d in (current, dtype) if pd.api.types.is_string_dtype(d) and not pd.api.types.is_object_dtype(d)]
+    # Texte et valeurs manquantes ou nombres : texte ; autres mélanges (booléens...) : object
+    return text[0] if text else np.dtype(object)
+
+
+class SchemaAccumulator(Accumulator):
+    """Dtypes des chunks lus, unifiés colonne par colonne"""
+
+    def __init__(self):
+        self.dtypes: Dict[str, Any] = {}
+        # Faux dès qu'un chunk a été lu avec d'autres dtypes que les précédents
+        self.stable = True
+
+    def update(self, df: pd.DataFrame) -> None:
+        for col, dtype in df.dtypes.items():
+            current = self.dtypes.get(col)
+            if current is None:
+                self.dtypes[col] = dtype
+            elif current != dtype:
+                self.stable = False
+                self.dtypes[col] = _unified_dtype(current, dtype)
+
+    def finalize(self) -> Dict[str, Any]:
+        return dict(self.dtypes)
+
+
+def _observe(chunks: Iterable[pd.DataFrame], accumulator: Accumulator) -> Iterator[pd.DataFrame]:
+    for chunk in chunks:
+        accumulator.update(chunk)
+        yield chunk
+
+
+def _stream(
+    plan: PipelinePlan,
+    chunks: Iterable[pd.DataFrame],
+    states: Dict[int, Any],
+    stop: int,
+    accumulators: Optional[Dict[int, Accumulator]] = None
+) -> Iterator[pd.DataFrame]:
+    stream: Iterable[pd.DataFrame] = chunks
+    for index, op in enumerate(plan.operations[:stop]):
+        if accumulators and index in accumulators:
+            stream = _observe(stream, accumulators[index])
+        elif op.stateful and index not in states:
+            # Opération de la même étape, pas encore ajustée : par construction, les
+            # opérations suivantes de l'étape ne dépendent pas de son résultat
+            continue
+        else:
+            stream = op.transform_stream(stream, states.get(index))
+    return iter(stream)
+
+
+def fit_chunked(plan: PipelinePlan, read_chunks: ChunkSource, schema: Optional[SchemaAccumulator] = None) -> List[Any]:
+    """
+    Ajuster un plan sur un dataset lu chunk par chunk
+
+    Args:
+        plan: Plan compilé
+        read_chunks: Fonction renvoyant un nouvel itérateur de chunks à chaque appel
+        schema: Dtypes des chunks lus, relevés pendant la première passe (une passe
+            est faite pour eux seuls si le plan n'a rien à ajuster)
+
+    Returns:
+        État ajusté de chaque opération du plan
+    """
+    states: Dict[int, Any] = {}
+    stages = plan.fit_stages()
+    if schema is not None and not stages:
+        for chunk in read_chunks():
+            schema.update(chunk)
+    for position, stage in enumerate(stages):
+        accumulators = {index: plan.operations[index].accumulator() for index in stage}
+        chunks = read_chunks()
+        if schema is not None and position == 0:
+            chunks = _observe(chunks, schema)
+        for _ in _stream(plan, chunks, states, max(stage) + 1, accumulators):
+            pass
+        for index, accumulator in accumulators.items():
+            states[index] = accumulator.finalize()
+    return [states.get(index) for index in range(len(plan.operations))]
+
+
+def _measured_stream(
+    plan: PipelinePlan,
+    chunks: Iterable[pd.DataFrame],
+    states: Dict[int, Any],
+    metrics: PrepareMetrics
+) -> Iterator[pd.DataFrame]:
+    # Chaque flux est chronométré amont compris : la durée propre d'une opération
+    # est sa durée cumulée moins celle du flux qu'elle consomme
+    source = StreamTimer()
+    stream = source.wrap(chunks)
+    timers = []
+    for index, op in enumerate(plan.operations):
+        timer = StreamTimer()
+        stream = timer.wrap(op.transform_stream(stream, states.get(index)))
+        timers.append(timer)
+    yield from stream
+
+    metrics.add_phase("read", source.seconds)
+    metrics.add_phase("transform", timers[-1].seconds - source.seconds if timers else 0.0)
+    upstream = source
+    for index, (op, timer) in enumerate(zip(plan.operations, timers)):
+        metrics.add_step(
+            index, op.kind, timer.seconds - upstream.seconds,
+            (upstream.rows, upstream.columns), (timer.rows, timer.columns)
+        )
+        upstream = timer
+
+
+def transform_chunked(
+    plan: PipelinePlan,
+    chunks: Iterable[pd.DataFrame],
+    states: List[Any],
+    metrics: Optional[PrepareMetrics] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Appliquer un plan ajusté chunk par chunk
+
+    Args:
+        plan: Plan compilé
+        chunks: Chunks à transformer
+        states: États renvoyés par fit_chunked
+        metrics: Mesures complétées, une fois le flux épuisé, avec la durée et les
+            dimensions de chaque étape (cumulées sur les chunks ; pic mémoire non mesuré)
+            et la durée de lecture des chunks (phase "read")
+
+    Returns:
+        Itérateur sur les chunks transformés (un par chunk reçu)
+    """
+    fitted = {index: state for index, state in enumerate(states)}
+    if metrics is None:
+        return _stream(plan, chunks, fitted, len(plan.operations))
+    return _measured_stream(plan, chunks, fitted, metrics)
+
+
+def empty_frame(dtypes: Dict[str, Any]) -> pd.DataFrame:
+    """DataFrame sans ligne ayant les colonnes et dtypes donnés"""
+    return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in dtypes.items()})
+
+
+def output_schema(plan: PipelinePlan, states: List[Any], dtypes: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Colonnes et dtypes produits par un plan ajusté à partir de chunks de dtypes donnés
+
+    Les dtypes de sortie ne dépendent que des dtypes d'entrée et des états ajustés
+    (catégories, largeurs réduites...) : le plan est appliqué à un DataFrame vide.
+    """
+    transformed = list(transform_chunked(plan, [empty_frame(dtypes)], states))[0]
+    return {str(col): str(dtype) for col, dtype in transformed.dtypes.items()}
+
+
+def count_passes(plan: PipelinePlan) -> int:
+    """Nombre de lectures du dataset nécessaires (ajustement ou relevé des dtypes + transformation)"""
+    return max(len(plan.fit_stages()), 1) + 1
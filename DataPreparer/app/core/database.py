@@ -1,6 +1,11 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 import pandas as pd
+import io
 import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
 
 # Configuration de la base de données
 user = os.getenv("POSTGRES_USER", "mluser")
@@ -13,10 +18,266 @@ DB_URL = os.getenv(
     f"postgresql+psycopg2://{user}:{password}@{server}:5432/{db_name}"
 )
 
+# Nombre de lignes envoyées par COPY (borne la mémoire du tampon CSV)
+COPY_CHUNK_ROWS = int(os.getenv("DB_COPY_CHUNK_ROWS", "50000"))
+
 # Création du moteur SQLAlchemy
 engine = create_engine(DB_URL)
 
-def save_dataframe_to_db(df, table_name):
-    # Enregistrer le DataFrame dans PostgreSQL
-    df.to_sql(table_name, engine, if_exists="replace", index=False)
+def _quote(identifier: str) -> str:
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+def _copy_rows(cursor, df: pd.DataFrame, table_name: str) -> None:
+    """Envoyer les lignes par COPY FROM STDIN (CSV), par blocs de COPY_CHUNK_ROWS lignes"""
+    columns = ", ".join(_quote(col) for col in df.columns)
+    statement = f"COPY {_quote(table_name)} ({columns}) FROM STDIN WITH (FORMAT csv)"
+    for start in range(0, len(df), COPY_CHUNK_ROWS):
+        buffer = io.StringIO()
+        df.iloc[start:start + COPY_CHUNK_ROWS].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cursor.copy_expert(statement, buffer)
+
+def save_dataframe_to_db(df: pd.DataFrame, table_name: str, if_exists: str = "replace") -> Dict[str, float]:
+    """
+    Enregistrer un DataFrame dans PostgreSQL par chargement en masse (COPY)
+
+    La table est créée par pandas à partir des dtypes (BIGINT, DOUBLE PRECISION,
+    BOOLEAN, TIMESTAMP, TEXT), puis les lignes sont envoyées par COPY dans la
+    même transaction.
+
+    Args:
+        df: DataFrame à enregistrer
+        table_name: Nom de la table
+        if_exists: "replace" pour recréer la table, "append" pour écrire chunk par chunk
+
+    Returns:
+        Nombre de lignes et durée du chargement (secondes)
+    """
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        df.head(0).to_sql(table_name, conn, if_exists=if_exists, index=False)
+        cursor = conn.connection.cursor()
+        try:
+            if hasattr(cursor, "copy_expert"):
+                _copy_rows(cursor, df, table_name)
+            else:
+                # Pilote sans COPY (psycopg2 absent) : insertions groupées
+                df.to_sql(table_name, conn, if_exists="append", index=False, method="multi", chunksize=1000)
+        finally:
+            cursor.close()
+    return {"rows": len(df), "seconds": time.perf_counter() - start}
+
+@contextmanager
+def bulk_append(table_name: str):
+    """
+    Ajouter des lignes à une table existante dans une seule transaction
+
+    Le bloc reçoit une fonction load(df) qui envoie les lignes par COPY ; la
+    transaction est validée à la sortie du bloc, annulée si une erreur survient.
+
+    Returns:
+        Fonction load(df) renvoyant le nombre de lignes et la durée de l'envoi
+    """
+    with engine.begin() as conn:
+        cursor = conn.connection.cursor()
+
+        def load(df: pd.DataFrame) -> Dict[str, float]:
+            start = time.perf_counter()
+            if hasattr(cursor, "copy_expert"):
+                _copy_rows(cursor, df, table_name)
+            else:
+                df.to_sql(table_name, conn, if_exists="append", index=False, method="multi", chunksize=1000)
+            return {"rows": len(df), "seconds": time.perf_counter() - start}
+
+        try:
+            yield load
+        finally:
+            cursor.close()
+
+def create_indexes(table_name: str, columns: Optional[List[str]]) -> List[str]:
+    """
+    Créer les index demandés, une fois les données chargées
+
+    Returns:
+        Noms des index créés
+    """
+    names = []
+    if not columns:
+        return names
+    with engine.begin() as conn:
+        for col in columns:
+            name = f"ix_{table_name}_{col}"[:63]
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {_quote(name)} ON {_quote(table_name)} ({_quote(col)})"))
+            names.append(name)
+    return names
+
+
+def _add_metadata_columns(record) -> None:
+    """Ajouter (TEXT) les colonnes de record absentes d'une table dataset_metadata existante"""
+    inspector = inspect(engine)
+    if inspector.has_table("dataset_metadata"):
+        existing = {col["name"] for col in inspector.get_columns("dataset_metadata")}
+        missing = [col for col in record if col not in existing]
+        if missing:
+            with engine.begin() as conn:
+                for col in missing:
+                    conn.execute(text(f'ALTER TABLE dataset_metadata ADD COLUMN IF NOT EXISTS "{col}" TEXT'))
+
+
+def save_dataset_metadata(record) -> List[Dict]:
+    """
+    Enregistrer l'entrée d'un dataset dans dataset_metadata
+
+    Un dataset_id désigne une seule entrée : celle d'une préparation antérieure
+    de même identifiant est remplacée dans la même transaction. La table est
+    créée par pandas au premier enregistrement : les colonnes apparues depuis
+    sont ajoutées (TEXT) aux tables existantes.
+
+    Returns:
+        Entrées remplacées (leurs tables et objets restent à libérer)
+    """
+    _add_metadata_columns(record)
+    replaced = []
+    with engine.begin() as conn:
+        if inspect(conn).has_table("dataset_metadata"):
+            params = {"dataset_id": record["dataset_id"]}
+            replaced = [dict(row) for row in conn.execute(
+                text("SELECT * FROM dataset_metadata WHERE dataset_id = :dataset_id"), params
+            ).mappings()]
+            conn.execute(text("DELETE FROM dataset_metadata WHERE dataset_id = :dataset_id"), params)
+        pd.DataFrame([record]).to_sql("dataset_metadata", conn, if_exists="append", index=False)
+    return replaced
+
+
+_local_locks: Dict[str, threading.Lock] = {}
+_local_locks_guard = threading.Lock()
+
+
+@contextmanager
+def dataset_lock(dataset_id: str):
+    """
+    Verrou exclusif sur un dataset, tenu pendant tout le bloc
+
+    Verrou consultatif de session PostgreSQL (partagé par toutes les instances
+    du service) ; verrou du processus pour les autres bases (SQLite en test).
+    """
+    if engine.dialect.name != "postgresql":
+        with _local_locks_guard:
+            lock = _local_locks.setdefault(dataset_id, threading.Lock())
+        with lock:
+            yield
+        return
+    params = {"key": f"dataset_metadata:{dataset_id}"}
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(hashtext(:key))"), params)
+        conn.commit()
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"), params)
+            conn.commit()
+
+
+def find_dataset(dataset_id: str) -> Optional[Dict]:
+    """Entrée de dataset_metadata d'un dataset (None s'il n'existe pas)"""
+    if not inspect(engine).has_table("dataset_metadata"):
+        return None
+    query = text("SELECT * FROM dataset_metadata WHERE dataset_id = :dataset_id")
+    result = pd.read_sql(query, engine, params={"dataset_id": dataset_id})
+    return None if result.empty else result.iloc[0].to_dict()
+
+
+def update_dataset_metadata(dataset_id: str, values: Dict) -> None:
+    """Mettre à jour les champs d'une entrée de dataset_metadata (colonnes absentes ajoutées en TEXT)"""
+    _add_metadata_columns(values)
+    params = {f"v{i}": value for i, value in enumerate(values.values())}
+    assignments = ", ".join(f"{_quote(col)} = :v{i}" for i, col in enumerate(values))
+    params["dataset_id"] = dataset_id
+    with engine.begin() as conn:
+        conn.execute(text(f"UPDATE dataset_metadata SET {assignments} WHERE dataset_id = :dataset_id"), params)
+
+
+def count_path_references(path: str) -> int:
+    """Nombre d'entrées de dataset_metadata dont le dataset nettoyé ou le pipeline ajusté est path"""
+    with engine.begin() as conn:
+        return conn.execute(
+            text("SELECT COUNT(*) FROM dataset_metadata WHERE cleaned_path = :path OR fitted_pipeline_path = :path"),
+            {"path": path}
+        ).scalar()
+
+
+def _metadata_columns():
+    """Colonnes de dataset_metadata (ensemble vide si la table n'existe pas encore)"""
+    inspector = inspect(engine)
+    if not inspector.has_table("dataset_metadata"):
+        return set()
+    return {col["name"] for col in inspector.get_columns("dataset_metadata")}
+
+
+def find_prepared_dataset(cache_key: str, dataset_id: Optional[str] = None) -> Optional[Dict]:
+    """
+    Entrée la plus récente de dataset_metadata pour une clé de cache
+
+    Une entrée suivie d'une entrée plus récente de même dataset_id (table
+    antérieure au remplacement des entrées) n'est jamais renvoyée : sa table a pu
+    être réécrite par la préparation suivante.
+    """
+    if "cache_key" not in _metadata_columns():
+        return None
+    query = (
+        'SELECT * FROM dataset_metadata AS entry WHERE cache_key = :cache_key AND NOT EXISTS ('
+        'SELECT 1 FROM dataset_metadata AS newer WHERE newer.dataset_id = entry.dataset_id '
+        'AND newer.created_at > entry.created_at)'
+    )
+    params = {"cache_key": cache_key}
+    if dataset_id:
+        query += ' AND dataset_id = :dataset_id'
+        params["dataset_id"] = dataset_id
+    query += ' ORDER BY created_at DESC LIMIT 1'
+    result = pd.read_sql(text(query), engine, params=params)
+    return None if result.empty else result.iloc[0].to_dict()
+
+
+def list_prepared_datasets() -> List[Dict]:
+    """Entrées de dataset_metadata produites par une préparation mise en cache"""
+    if "cache_key" not in _metadata_columns():
+        return []
+    query = text(
+        "SELECT dataset_id, table_name, original_path, cleaned_path, fitted_pipeline_path, "
+        "source_etag, cache_key, created_at, last_used_at FROM dataset_metadata WHERE cache_key IS NOT NULL"
+    )
+    records = pd.read_sql(query, engine)
+    # Valeurs manquantes en None (pandas les lit en NaN dans les colonnes de texte)
+    return records.astype(object).where(records.notna(), None).to_dict("records")
+
+
+def table_exists(table_name: str) -> bool:
+    return inspect(engine).has_table(table_name)
+
+
+def touch_dataset(dataset_id: str, timestamp: str) -> None:
+    """Mettre à jour la date de dernière utilisation d'un dataset préparé"""
+    with engine.begin() as conn:
+        conn.execute(
+            text("UPDATE dataset_metadata SET last_used_at = :timestamp WHERE dataset_id = :dataset_id"),
+            {"timestamp": timestamp, "dataset_id": dataset_id}
+        )
+
+
+def delete_dataset(dataset_id: str, table_name: Optional[str], created_at: Optional[str]) -> None:
+    """
+    Supprimer une entrée de dataset_metadata (identifiée par dataset_id et created_at) et sa table
 
+    Les autres entrées de même dataset_id sont conservées, ainsi que la table si
+    l'une d'elles y fait encore référence.
+    """
+    with engine.begin() as conn:
+        conn.execute(
+            text("DELETE FROM dataset_metadata WHERE dataset_id = :dataset_id AND created_at = :created_at"),
+            {"dataset_id": dataset_id, "created_at": created_at}
+        )
+        remaining = conn.execute(
+            text("SELECT COUNT(*) FROM dataset_metadata WHERE table_name = :table_name"), {"table_name": table_name}
+        ).scalar()
+        if table_name and not remaining:
+            conn.execute(text(f"DROP TABLE IF EXISTS {_quote(table_name)}"))
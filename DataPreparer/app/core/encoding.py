@@ -0,0 +1,112 @@
+"""
+Détection de l'encodage d'un fichier source à partir d'échantillons
+
+Seuls quelques blocs sont lus : le début du fichier et quelques positions tirées
+au hasard (lectures par plage, sans parcourir l'objet). Si tous les échantillons
+sont de l'UTF-8 valide, chardet n'est pas appelé ; sinon chardet examine les
+échantillons et son résultat n'est retenu qu'au-delà d'un seuil de confiance.
+L'encodage détecté est mémorisé par ETag : un objet déjà lu n'est plus examiné.
+"""
+import codecs
+import os
+import random
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from chardet.universaldetector import UniversalDetector
+
+# Taille de chaque échantillon (octets) et nombre d'échantillons tirés au hasard après l'en-tête
+ENCODING_SAMPLE_BYTES = int(os.getenv("ENCODING_SAMPLE_BYTES", str(256 * 1024)))
+ENCODING_SAMPLE_COUNT = int(os.getenv("ENCODING_SAMPLE_COUNT", "4"))
+# Confiance minimale de chardet ; en dessous, l'encodage de repli est utilisé
+ENCODING_MIN_CONFIDENCE = float(os.getenv("ENCODING_MIN_CONFIDENCE", "0.7"))
+# Encodage de repli (latin-1 décode n'importe quelle suite d'octets)
+ENCODING_FALLBACK = os.getenv("ENCODING_FALLBACK", "latin-1")
+# Nombre d'encodages mémorisés (par ETag)
+ENCODING_CACHE_SIZE = 1024
+
+_cache: "OrderedDict[str, str]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _sample_offsets(size: int) -> List[int]:
+    """Début du fichier puis positions aléatoires (triées), sans chevauchement avec l'en-tête"""
+    if size <= ENCODING_SAMPLE_BYTES * (ENCODING_SAMPLE_COUNT + 1):
+        # Petit fichier : un seul échantillon le couvre entièrement
+        return [0]
+    # Graine dérivée de la taille : mêmes échantillons d'une lecture à l'autre
+    rng = random.Random(size)
+    offsets = rng.sample(range(ENCODING_SAMPLE_BYTES, size - ENCODING_SAMPLE_BYTES), ENCODING_SAMPLE_COUNT)
+    return [0] + sorted(offsets)
+
+
+def _read_samples(open_source: Callable, size: int) -> List[bytes]:
+    offsets = _sample_offsets(size)
+    length = size if offsets == [0] else ENCODING_SAMPLE_BYTES
+    samples = []
+    for offset in offsets:
+        with open_source(offset, length) as f:
+            samples.append(f.read(length))
+    return samples
+
+
+def _is_utf8(sample: bytes, at_start: bool, at_end: bool) -> bool:
+    """UTF-8 valide, en tolérant un caractère coupé aux bords d'un échantillon pris au milieu"""
+    if not at_start:
+        # Octets de continuation (10xxxxxx) d'un caractère commencé avant l'échantillon
+        skip = 0
+        while skip < min(3, len(sample)) and 0x80 <= sample[skip] <= 0xBF:
+            skip += 1
+        sample = sample[skip:]
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=at_end)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def _detect(samples: List[bytes], size: int) -> str:
+    if all(
+        _is_utf8(sample, at_start=index == 0, at_end=len(sample) >= size)
+        for index, sample in enumerate(samples)
+    ):
+        return "utf-8"
+    detector = UniversalDetector()
+    for sample in samples:
+        detector.feed(sample)
+        if detector.done:
+            break
+    detector.close()
+    encoding, confidence = detector.result["encoding"], detector.result["confidence"] or 0.0
+    if encoding is None or confidence < ENCODING_MIN_CONFIDENCE:
+        return ENCODING_FALLBACK
+    return encoding
+
+
+def detect_encoding(open_source: Callable, size: int, etag: Optional[str] = None) -> str:
+    """
+    Détecter l'encodage d'un fichier à partir d'échantillons
+
+    Args:
+        open_source: Fonction ouvrant un flux binaire à partir de (position, nombre d'octets)
+        size: Taille du fichier en octets
+        etag: ETag de l'objet source (clé du cache ; None : pas de cache)
+
+    Returns:
+        Nom de l'encodage utilisable par pandas
+    """
+    if etag is not None:
+        with _cache_lock:
+            if etag in _cache:
+                _cache.move_to_end(etag)
+                return _cache[etag]
+
+    encoding = _detect(_read_samples(open_source, size), size)
+
+    if etag is not None:
+        with _cache_lock:
+            _cache[etag] = encoding
+            while len(_cache) > ENCODING_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return encoding
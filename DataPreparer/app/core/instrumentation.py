@@ -0,0 +1,197 @@
+"""
+Mesures d'une préparation : étapes du pipeline et phases d'entrée/sortie
+
+Pour chaque étape : durée, lignes et colonnes en entrée/sortie, et hausse
+maximale de la mémoire résidente (RSS) du processus pendant l'étape. La RSS est
+échantillonnée par un thread (lecture de /proc/self/statm) : coût négligeable,
+contrairement à tracemalloc qui ralentit pandas de plusieurs fois. C'est une
+mesure du processus : des préparations concurrentes dans le même processus
+s'additionnent.
+
+Les mesures sont renvoyées dans la réponse, enregistrées dans dataset_metadata et
+émises sous forme de lignes JSON sur le logger dataprep.metrics, pour être
+agrégées par la collecte de logs.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+# Intervalle d'échantillonnage de la mémoire résidente pendant une étape (secondes)
+MEMORY_SAMPLE_INTERVAL = float(os.getenv("PIPELINE_MEMORY_SAMPLE_INTERVAL", "0.01"))
+# Émission des mesures sur le logger dataprep.metrics
+PREPARE_METRICS_ENABLED = os.getenv("PREPARE_METRICS_ENABLED", "true").lower() == "true"
+
+metrics_logger = logging.getLogger("dataprep.metrics")
+if not metrics_logger.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    metrics_logger.addHandler(_handler)
+    metrics_logger.setLevel(logging.INFO)
+    metrics_logger.propagate = False
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def rss_bytes() -> Optional[int]:
+    """Mémoire résidente du processus (None si /proc n'est pas disponible)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _PeakSampler:
+    """Pic de mémoire résidente relevé par un thread entre l'entrée et la sortie du bloc"""
+
+    def __init__(self, interval: float = MEMORY_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.start = None
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self) -> None:
+        current = rss_bytes()
+        if current is not None and (self.peak is None or current > self.peak):
+            self.peak = current
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "_PeakSampler":
+        self.start = rss_bytes()
+        if self.start is not None:
+            self.peak = self.start
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._sample()
+
+    @property
+    def peak_delta(self) -> Optional[int]:
+        if self.start is None:
+            return None
+        return max(self.peak - self.start, 0)
+
+
+class StreamTimer:
+    """Temps passé à produire les éléments d'un flux (amont compris), lignes et colonnes produites"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.rows = 0
+        self.columns = 0
+
+    def wrap(self, stream: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        iterator = iter(stream)
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                self.seconds += time.perf_counter() - start
+                return
+            self.seconds += time.perf_counter() - start
+            self.rows += len(chunk)
+            self.columns = chunk.shape[1]
+            yield chunk
+
+
+class PrepareMetrics:
+    """Mesures des étapes du pipeline et des phases d'une préparation"""
+
+    def __init__(self):
+        self.steps: List[Dict[str, Any]] = []
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        """Chronométrer une phase (les durées d'une même phase s'additionnent)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start)
+
+    def add_phase(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_step(
+        self,
+        index: int,
+        operation: str,
+        seconds: float,
+        shape_in: Tuple[int, int],
+        shape_out: Tuple[int, int],
+        peak_memory_delta: Optional[int] = None
+    ) -> None:
+        self.steps.append({
+            "index": index,
+            "operation": operation,
+            "seconds": seconds,
+            "rows_in": int(shape_in[0]),
+            "rows_out": int(shape_out[0]),
+            "columns_in": int(shape_in[1]),
+            "columns_out": int(shape_out[1]),
+            "peak_memory_delta": peak_memory_delta,
+        })
+
+    def measure_step(self, index: int, operation: str, df: pd.DataFrame, run: Callable[[], Tuple[pd.DataFrame, Any]]):
+        """
+        Exécuter une étape en mesurant sa durée, ses dimensions et son pic mémoire
+
+        Args:
+            index: Position de l'étape dans le plan
+            operation: Nom de l'étape
+            df: DataFrame en entrée de l'étape
+            run: Fonction exécutant l'étape, renvoyant (DataFrame produit, état)
+
+        Returns:
+            Résultat de run
+        """
+        with _PeakSampler() as sampler:
+            start = time.perf_counter()
+            result = run()
+            seconds = time.perf_counter() - start
+        self.add_step(index, operation, seconds, df.shape, result[0].shape, sampler.peak_delta)
+        return result
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Mesures sérialisables
+
+        Returns:
+            Étapes (durée, lignes/colonnes en entrée et en sortie, pic mémoire en
+            octets) et durée de chaque phase, en secondes
+        """
+        return {
+            "steps": [dict(step, seconds=round(step["seconds"], 4)) for step in self.steps],
+            "phases": {name: round(seconds, 4) for name, seconds in self.phases.items()},
+        }
+
+    def emit(self, **labels: Any) -> None:
+        """Émettre une ligne JSON par étape et par phase sur le logger dataprep.metrics"""
+        if not PREPARE_METRICS_ENABLED:
+            return
+        report = self.report()
+        for step in report["steps"]:
+            metrics_logger.info(json.dumps({"metric": "prepare_step", **labels, **step}, default=str))
+        for name, seconds in report["phases"].items():
+            metrics_logger.info(json.dumps({"metric": "prepare_phase", **labels, "phase": name, "seconds": seconds}, default=str))
@@ -0,0 +1,150 @@
+"""
+Préparations asynchrones exécutées sur un pool de processus
+
+Chaque préparation soumise reçoit un identifiant de job et s'exécute dans un
+processus du pool : plusieurs datasets sont préparés en parallèle sur plusieurs
+cœurs sans bloquer les workers HTTP. Le nombre de jobs en attente ou en cours
+est borné. L'avancement (étape courante, lignes traitées) est publié par le
+processus de travail dans un dictionnaire partagé et lu par l'endpoint de statut.
+L'état d'un job terminé reste consultable PREPARE_JOB_TTL secondes, dans la
+limite des PREPARE_MAX_FINISHED_JOBS plus récents.
+"""
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+# Nombre de processus de préparation
+PREPARE_WORKERS = int(os.getenv("PREPARE_WORKERS", str(max((os.cpu_count() or 2) // 2, 1))))
+# Nombre maximal de jobs en attente ou en cours (au-delà, la soumission est refusée)
+PREPARE_MAX_PENDING = int(os.getenv("PREPARE_MAX_PENDING", "16"))
+# Durée (secondes) pendant laquelle l'état d'un job terminé reste consultable
+PREPARE_JOB_TTL = float(os.getenv("PREPARE_JOB_TTL", "3600"))
+# Nombre maximal de jobs terminés conservés (les plus anciens sont oubliés en premier)
+PREPARE_MAX_FINISHED_JOBS = int(os.getenv("PREPARE_MAX_FINISHED_JOBS", "1000"))
+
+ACTIVE_STATUSES = ("pending", "running")
+
+# Jobs de préparation, par identifiant (état local au processus du service)
+prepare_jobs: Dict[str, Dict[str, Any]] = {}
+# Jobs terminés, du plus ancien au plus récent, avec leur date de fin (horloge monotone)
+_finished: "OrderedDict[str, float]" = OrderedDict()
+
+_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+_manager = None
+_progress = None
+
+
+class JobQueueFull(RuntimeError):
+    """Trop de jobs de préparation en attente ou en cours"""
+
+
+def _get_pool():
+    """Créer le pool (et le dictionnaire d'avancement partagé) au premier job"""
+    global _pool, _manager, _progress
+    if _pool is None:
+        # spawn : pas de fork d'un processus multi-thread (boucle, pools de connexions)
+        context = multiprocessing.get_context("spawn")
+        _manager = context.Manager()
+        _progress = _manager.dict()
+        _pool = ProcessPoolExecutor(max_workers=PREPARE_WORKERS, mp_context=context)
+    return _pool, _progress
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _evict_finished() -> None:
+    """Oublier les jobs terminés expirés ou en surnombre (appelé sous _lock)"""
+    expired = time.monotonic() - PREPARE_JOB_TTL
+    while _finished:
+        job_id, finished_at = next(iter(_finished.items()))
+        if finished_at > expired and len(_finished) <= PREPARE_MAX_FINISHED_JOBS:
+            break
+        del _finished[job_id]
+        prepare_jobs.pop(job_id, None)
+
+
+def submit_job(target: Callable[[str, Dict[str, Any], Any], Dict[str, Any]], payload: Dict[str, Any]) -> str:
+    """
+    Soumettre un job au pool
+
+    Args:
+        target: Fonction de module (sérialisable) appelée avec (job_id, payload,
+            dictionnaire d'avancement) et renvoyant l'état final du job
+        payload: Paramètres du job (sérialisables)
+
+    Returns:
+        Identifiant du job
+    """
+    with _lock:
+        _evict_finished()
+        active = sum(job["status"] in ACTIVE_STATUSES for job in prepare_jobs.values())
+        if active >= PREPARE_MAX_PENDING:
+            raise JobQueueFull(f"{active} préparations en attente ou en cours (maximum {PREPARE_MAX_PENDING})")
+        pool, progress = _get_pool()
+        job_id = str(uuid.uuid4())
+        prepare_jobs[job_id] = {"job_id": job_id, "status": "pending", "submitted_at": _now()}
+        progress[job_id] = {"step": "queued", "rows_processed": 0}
+        future = pool.submit(target, job_id, payload, progress)
+    future.add_done_callback(lambda done: _finish(job_id, done))
+    return job_id
+
+
+def _finish(job_id: str, future: Future) -> None:
+    try:
+        outcome = future.result()
+    except Exception as e:
+        # Processus de travail mort (BrokenProcessPool...) : le job est perdu
+        outcome = {"status": "failed", "error": str(e)}
+    with _lock:
+        job = prepare_jobs[job_id]
+        if _progress is not None:
+            job.update(_progress.pop(job_id, {}))
+        job.update(outcome)
+        job["finished_at"] = _now()
+        _finished[job_id] = time.monotonic()
+        _evict_finished()
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """État courant d'un job (avec son avancement s'il n'est pas terminé) ; None s'il est inconnu ou oublié"""
+    with _lock:
+        _evict_finished()
+        job = prepare_jobs.get(job_id)
+        if job is None:
+            return None
+        state = dict(job)
+    if state["status"] in ACTIVE_STATUSES:
+        progress = _progress.get(job_id) or {}
+        state.update(progress)
+        if progress.get("step", "queued") != "queued":
+            state["status"] = "running"
+    return state
+
+
+def report_progress(progress, job_id: str, step: str, rows_processed: Optional[int] = None) -> None:
+    """Publier l'avancement d'un job depuis le processus de travail"""
+    state = dict(progress.get(job_id) or {})
+    state["step"] = step
+    if state.get("started_at") is None:
+        state["started_at"] = _now()
+    if rows_processed is not None:
+        state["rows_processed"] = rows_processed
+    progress[job_id] = state
+
+
+def shutdown_pool() -> None:
+    """Arrêter le pool et le gestionnaire d'avancement (arrêt du service)"""
+    global _pool, _manager, _progress
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _manager.shutdown()
+        _pool, _manager, _progress = None, None, None
@@ -3,7 +3,12 @@ from minio.error import S3Error
 import pandas as pd
 import os
 import tempfile
-from typing import Optional
+import io
+import pyarrow as pa
+import pyarrow.parquet as pq
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional
+from app.core.chunked import DEFAULT_CHUNK_SIZE
 
 # Configuration depuis les variables d'environnement ou valeurs par défaut
 MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "localhost:9000")
@@ -11,6 +16,14 @@ MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minio")
 MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minio123")
 MINIO_SECURE = os.getenv("MINIO_SECURE", "false").lower() == "true"
 MINIO_BUCKET = os.getenv("MINIO_BUCKET", "microlearn-data")
+# Compression des datasets Parquet (zstd, snappy, gzip, none)
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+# Lectures/écritures en flux (sans fichier temporaire) ; "false" pour repasser par le disque
+MINIO_STREAMING = os.getenv("MINIO_STREAMING", "true").lower() == "true"
+# Taille des parts des uploads multipart (5 Mo minimum côté S3)
+MINIO_PART_SIZE = max(int(os.getenv("MINIO_PART_SIZE", str(16 * 1024 * 1024))), 5 * 1024 * 1024)
+# Taille des lectures par plage (les petites lectures de pyarrow sont regroupées)
+MINIO_RANGE_READ_SIZE = int(os.getenv("MINIO_RANGE_READ_SIZE", str(4 * 1024 * 1024)))
 
 client = Minio(
     MINIO_ENDPOINT,
@@ -30,9 +43,19 @@ def ensure_bucket(bucket_name: str = MINIO_BUCKET):
 # S'assurer que le bucket existe au démarrage
 # ensure_bucket()  <-- Commented out to prevent blocking on startup if MinIO is not available
 
+def _split_path(path: str, bucket: Optional[str] = None):
+    """Séparer bucket et nom d'objet (s3://bucket/file, bucket/file ou juste file)"""
+    bucket_name = bucket or MINIO_BUCKET
+    path = path.replace("s3://", "")
+    if "/" in path:
+        if path.startswith(bucket_name + "/"):
+            return bucket_name, path[len(bucket_name) + 1:]
+        return tuple(path.split("/", 1))
+    return bucket_name, path
+
 def download_file_from_minio(path: str, bucket: Optional[str] = None) -> str:
     """
-    Télécharger un fichier depuis MinIO
+    Télécharger un fichier depuis MinIO vers un fichier temporaire (repli de open_minio_stream)
     
     Args:
         path: Chemin du fichier (peut être s3://bucket/file ou bucket/file ou juste file)
@@ -41,17 +64,7 @@ def download_file_from_minio(path: str, bucket: Optional[str] = None) -> str:
     Returns:
         Chemin local du fichier téléchargé
     """
-    bucket_name = bucket or MINIO_BUCKET
-    
-    # Nettoyer le path
-    path = path.replace("s3://", "")
-    if "/" in path:
-        if path.startswith(bucket_name + "/"):
-            file_path = path[len(bucket_name) + 1:]
-        else:
-            bucket_name, file_path = path.split("/", 1)
-    else:
-        file_path = path
+    bucket_name, file_path = _split_path(path, bucket)
     
     # Créer un fichier temporaire
     _, ext = os.path.splitext(file_path)
@@ -66,9 +79,264 @@ def download_file_from_minio(path: str, bucket: Optional[str] = None) -> str:
         os.remove(temp_path)
         raise Exception(f"Erreur lors du téléchargement depuis MinIO: {e}")
 
+def stat_minio_object(path: str, bucket: Optional[str] = None):
+    """Métadonnées d'un objet MinIO (taille, ETag...)"""
+    bucket_name, file_path = _split_path(path, bucket)
+    try:
+        return client.stat_object(bucket_name, file_path)
+    except S3Error as e:
+        raise Exception(f"Erreur lors de la lecture depuis MinIO: {e}")
+
+def object_exists(path: str, bucket: Optional[str] = None) -> bool:
+    """Vérifier l'existence d'un objet MinIO"""
+    bucket_name, file_path = _split_path(path, bucket)
+    try:
+        client.stat_object(bucket_name, file_path)
+        return True
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchBucket", "NoSuchObject"):
+            return False
+        raise
+
+def delete_object(path: str, bucket: Optional[str] = None) -> None:
+    """Supprimer un objet MinIO (sans erreur s'il n'existe pas)"""
+    bucket_name, file_path = _split_path(path, bucket)
+    try:
+        client.remove_object(bucket_name, file_path)
+    except S3Error as e:
+        if e.code not in ("NoSuchKey", "NoSuchBucket"):
+            raise
+
+@contextmanager
+def open_minio_stream(path: str, bucket: Optional[str] = None, offset: int = 0, length: int = 0):
+    """
+    Ouvrir un objet MinIO en lecture séquentielle, sans copie sur disque
+
+    Args:
+        path: Chemin du fichier (s3://bucket/file, bucket/file ou juste file)
+        bucket: Nom du bucket (optionnel)
+        offset: Position de début de lecture
+        length: Nombre d'octets à lire (0 : jusqu'à la fin)
+
+    Returns:
+        Flux binaire (réponse HTTP) directement consommable par pandas
+    """
+    bucket_name, file_path = _split_path(path, bucket)
+    try:
+        response = client.get_object(bucket_name, file_path, offset=offset, length=length)
+    except S3Error as e:
+        raise Exception(f"Erreur lors du téléchargement depuis MinIO: {e}")
+    try:
+        yield response
+    finally:
+        response.close()
+        response.release_conn()
+
+class MinioObjectFile(io.RawIOBase):
+    """Fichier en lecture seule et à accès aléatoire sur un objet MinIO (requêtes HTTP Range)"""
+
+    def __init__(self, path: str, bucket: Optional[str] = None):
+        self.path = path
+        self.bucket = bucket
+        self.size = stat_minio_object(path, bucket).size
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        else:
+            self.position = self.size + offset
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        length = min(len(buffer), self.size - self.position)
+        if length <= 0:
+            return 0
+        with open_minio_stream(self.path, self.bucket, offset=self.position, length=length) as response:
+            data = response.read()
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+def read_chunks_from_minio(path: str, chunk_size: int, bucket: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """
+    Relire un dataset stocké dans MinIO chunk par chunk
+
+    Parquet demande un accès aléatoire (métadonnées en fin de fichier) : l'objet
+    est lu par requêtes HTTP Range (footer puis un row group à la fois), ou
+    téléchargé dans un fichier temporaire avec MINIO_STREAMING=false. CSV est
+    lu en flux ; JSON est lu en une fois.
+
+    Args:
+        path: Chemin du dataset dans MinIO (.parquet, .csv ou .json)
+        chunk_size: Nombre de lignes par chunk
+        bucket: Nom du bucket (optionnel)
+
+    Returns:
+        Itérateur sur les chunks du dataset
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet" and MINIO_STREAMING:
+        with io.BufferedReader(MinioObjectFile(path, bucket), buffer_size=MINIO_RANGE_READ_SIZE) as source, \
+                pq.ParquetFile(source) as parquet_file:
+            for batch in parquet_file.iter_batches(batch_size=chunk_size):
+                yield batch.to_pandas()
+    elif ext == ".parquet":
+        local_file = download_file_from_minio(path, bucket)
+        try:
+            with pq.ParquetFile(local_file) as parquet_file:
+                for batch in parquet_file.iter_batches(batch_size=chunk_size):
+                    yield batch.to_pandas()
+        finally:
+            os.remove(local_file)
+    elif ext == ".json":
+        with open_minio_stream(path, bucket) as stream:
+            yield pd.read_json(stream)
+    else:
+        with open_minio_stream(path, bucket) as stream, pd.read_csv(stream, chunksize=chunk_size) as reader:
+            yield from reader
+
+class _IteratorStream(io.RawIOBase):
+    """Flux binaire en lecture alimenté à la demande par un itérateur d'octets"""
+
+    def __init__(self, blocks: Iterator[bytes]):
+        self.blocks = blocks
+        self.pending = memoryview(b"")
+        # Position de lecture dans le bloc courant (le bloc n'est jamais recopié)
+        self.offset = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while self.offset >= len(self.pending):
+            block = next(self.blocks, None)
+            if block is None:
+                return 0
+            self.pending, self.offset = memoryview(block), 0
+        size = min(len(buffer), len(self.pending) - self.offset)
+        buffer[:size] = self.pending[self.offset:self.offset + size]
+        self.offset += size
+        return size
+
+class _DrainableSink(io.RawIOBase):
+    """Destination d'écriture vidée au fur et à mesure (la position reste absolue)"""
+
+    def __init__(self):
+        self.blocks = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.blocks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.blocks)
+        self.blocks = []
+        return data
+
+def _to_arrow(df: pd.DataFrame, schema: Optional[pa.Schema] = None) -> pa.Table:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if schema is not None and not table.schema.equals(schema, check_metadata=False):
+        # Le schéma du premier chunk fait foi (ex: colonne entière dont un chunk
+        # suivant contient des valeurs manquantes, lue en float64 par pandas)
+        try:
+            table = table.cast(schema)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise ValueError(f"Schéma incompatible avec celui du premier chunk: {e}")
+    return table
+
+def _serialize_chunks(chunks: Iterable[pd.DataFrame], ext: str) -> Iterator[bytes]:
+    """Sérialiser des chunks au fil de l'eau (CSV, Parquet avec un row group par chunk, JSON)"""
+    if ext == ".parquet":
+        sink, writer = _DrainableSink(), None
+        try:
+            for chunk in chunks:
+                table = _to_arrow(chunk, writer.schema if writer else None)
+                if writer is None:
+                    writer = pq.ParquetWriter(sink, table.schema, compression=PARQUET_COMPRESSION)
+                writer.write_table(table)
+                yield sink.drain()
+        finally:
+            if writer is not None:
+                writer.close()
+        yield sink.drain()
+    elif ext == ".json":
+        separator = b"["
+        for chunk in chunks:
+            records = chunk.to_json(orient="records")[1:-1]
+            if records:
+                yield separator + records.encode("utf-8")
+                separator = b","
+        yield b"[]" if separator == b"[" else b"]"
+    else:
+        for position, chunk in enumerate(chunks):
+            yield chunk.to_csv(index=False, header=position == 0).encode("utf-8")
+
+def upload_chunks_to_minio(path: str, chunks: Iterable[pd.DataFrame], bucket: Optional[str] = None) -> str:
+    """
+    Upload un DataFrame produit chunk par chunk vers MinIO
+
+    Les chunks sont sérialisés au fil de l'eau et envoyés par upload multipart
+    (parts de MINIO_PART_SIZE octets) : ni le dataset ni sa sérialisation ne
+    sont jamais entiers en mémoire ou sur disque. Avec MINIO_STREAMING=false,
+    les chunks passent par un fichier temporaire (MinioChunkWriter).
+
+    Args:
+        path: Chemin de destination dans MinIO
+        chunks: Chunks du DataFrame, consommés une seule fois
+        bucket: Nom du bucket (optionnel)
+
+    Returns:
+        Chemin complet dans MinIO
+    """
+    if not MINIO_STREAMING:
+        writer = MinioChunkWriter(path, bucket)
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+        except Exception:
+            writer.discard()
+            raise
+        return writer.close()
+
+    bucket_name, file_path = _split_path(path, bucket)
+    ensure_bucket(bucket_name)
+    ext = os.path.splitext(file_path)[1]
+    if not ext:
+        ext = ".csv"
+        file_path += ext
+    stream = _IteratorStream(_serialize_chunks(chunks, ext))
+    try:
+        client.put_object(bucket_name, file_path, stream, length=-1, part_size=MINIO_PART_SIZE)
+        return f"{bucket_name}/{file_path}"
+    except S3Error as e:
+        raise Exception(f"Erreur lors de l'upload vers MinIO: {e}")
+
 def upload_file_to_minio(path: str, df: pd.DataFrame, bucket: Optional[str] = None) -> str:
     """
     Upload un DataFrame vers MinIO
+
+    En flux (MINIO_STREAMING), le DataFrame est sérialisé et envoyé tranche par
+    tranche : sa sérialisation complète n'est jamais en mémoire.
     
     Args:
         path: Chemin de destination dans MinIO
@@ -78,6 +346,11 @@ def upload_file_to_minio(path: str, df: pd.DataFrame, bucket: Optional[str] = No
     Returns:
         Chemin complet dans MinIO
     """
+    if MINIO_STREAMING:
+        # Sérialisé par tranches de DEFAULT_CHUNK_SIZE lignes (un row group Parquet chacune)
+        slices = (df.iloc[start:start + DEFAULT_CHUNK_SIZE] for start in range(0, max(len(df), 1), DEFAULT_CHUNK_SIZE))
+        return upload_chunks_to_minio(path, slices, bucket)
+
     bucket_name = bucket or MINIO_BUCKET
     ensure_bucket(bucket_name)
     
@@ -106,6 +379,9 @@ def upload_file_to_minio(path: str, df: pd.DataFrame, bucket: Optional[str] = No
         # Sauvegarder le DataFrame
         if ext == ".csv":
             df.to_csv(temp_path, index=False)
+        elif ext == ".parquet":
+            # Format colonnaire compressé : les dtypes sont conservés dans le schéma
+            df.to_parquet(temp_path, index=False, compression=PARQUET_COMPRESSION)
         elif ext == ".json":
             df.to_json(temp_path, orient="records", indent=2)
         else:
@@ -120,6 +396,70 @@ def upload_file_to_minio(path: str, df: pd.DataFrame, bucket: Optional[str] = No
         if os.path.exists(temp_path):
             os.remove(temp_path)
 
+def upload_bytes_to_minio(path: str, data: bytes, content_type: str = "application/octet-stream", bucket: Optional[str] = None) -> str:
+    """Upload un contenu en mémoire (artefact de petite taille) vers MinIO"""
+    bucket_name, file_path = _split_path(path, bucket)
+    ensure_bucket(bucket_name)
+    try:
+        client.put_object(bucket_name, file_path, io.BytesIO(data), length=len(data), content_type=content_type)
+        return f"{bucket_name}/{file_path}"
+    except S3Error as e:
+        raise Exception(f"Erreur lors de l'upload vers MinIO: {e}")
+
+class MinioChunkWriter:
+    """
+    Écrire un DataFrame chunk par chunk puis l'envoyer vers MinIO (repli sur disque)
+
+    Les chunks sont ajoutés au fil de l'eau dans un fichier temporaire (CSV, ou
+    Parquet avec un row group par chunk), si bien que seul le chunk courant est
+    gardé en mémoire.
+    """
+
+    def __init__(self, path: str, bucket: Optional[str] = None):
+        self.bucket_name, self.file_path = _split_path(path, bucket)
+        ensure_bucket(self.bucket_name)
+        self.ext = os.path.splitext(self.file_path)[1]
+        if not self.ext:
+            self.ext = ".csv"
+            self.file_path += self.ext
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=self.ext)
+        self.temp_path = temp_file.name
+        temp_file.close()
+        self.header_written = False
+        self.parquet_writer = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.ext == ".parquet":
+            self._write_parquet(df)
+            return
+        df.to_csv(self.temp_path, mode="a", header=not self.header_written, index=False)
+        self.header_written = True
+
+    def _write_parquet(self, df: pd.DataFrame) -> None:
+        table = _to_arrow(df, self.parquet_writer.schema if self.parquet_writer else None)
+        if self.parquet_writer is None:
+            self.parquet_writer = pq.ParquetWriter(self.temp_path, table.schema, compression=PARQUET_COMPRESSION)
+        self.parquet_writer.write_table(table)
+
+    def _close_parquet(self) -> None:
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+            self.parquet_writer = None
+
+    def close(self) -> str:
+        """Envoyer le fichier vers MinIO et renvoyer son chemin complet"""
+        try:
+            self._close_parquet()
+            client.fput_object(self.bucket_name, self.file_path, self.temp_path)
+            return f"{self.bucket_name}/{self.file_path}"
+        finally:
+            self.discard()
+
+    def discard(self) -> None:
+        self._close_parquet()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
 def upload_raw_file_to_minio(file_data, file_name: str, length: int, bucket: Optional[str] = None) -> str:
     """
     Upload un fichier brut (file-like object) vers MinIO
@@ -139,3 +479,27 @@ def upload_raw_file_to_minio(file_data, file_name: str, length: int, bucket: Opt
     except S3Error as e:
         raise Exception(f"Erreur lors de l'upload vers MinIO: {e}")
 
+
+def upload_raw_stream_to_minio(stream, file_name: str, bucket: Optional[str] = None) -> str:
+    """
+    Upload un flux brut de taille inconnue vers MinIO (upload multipart)
+
+    Le flux est lu par parts de MINIO_PART_SIZE octets : la mémoire utilisée est
+    bornée quelle que soit la taille du fichier. Appel bloquant, à exécuter hors
+    de la boucle d'événements.
+    """
+    bucket_name = bucket or MINIO_BUCKET
+    ensure_bucket(bucket_name)
+
+    try:
+        client.put_object(
+            bucket_name,
+            file_name,
+            stream,
+            length=-1,
+            part_size=MINIO_PART_SIZE,
+            content_type="application/octet-stream"
+        )
+        return f"{bucket_name}/{file_name}"
+    except S3Error as e:
+        raise Exception(f"Erreur lors de l'upload vers MinIO: {e}")
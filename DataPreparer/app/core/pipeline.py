@@ -1,121 +1,1691 @@
+import json
+import operator
+import os
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import StandardScaler, MinMaxScaler, LabelEncoder
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
 
-def apply_pipeline(df: pd.DataFrame, pipeline: Dict[str, Any]) -> pd.DataFrame:
+from app.core.instrumentation import PrepareMetrics
+
+# Nombre de plans compilés conservés en cache (clé = JSON canonique du pipeline)
+PIPELINE_CACHE_SIZE = int(os.getenv("PIPELINE_CACHE_SIZE", "128"))
+
+# Taille de l'échantillon (par colonne) utilisé pour estimer les médianes en mode chunké
+MEDIAN_SAMPLE_SIZE = int(os.getenv("PIPELINE_MEDIAN_SAMPLE_SIZE", "20000"))
+
+# Nombre de threads par défaut pour l'exécution par blocs de colonnes (1 = séquentiel)
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "1"))
+
+# Nombre maximal de valeurs distinctes suivies (par colonne) pour le calcul du mode en mode chunké
+MODE_MAX_DISTINCT = int(os.getenv("PIPELINE_MODE_MAX_DISTINCT", "100000"))
+
+NUMERIC_DTYPES = ["float64", "float32", "int64", "int32", "int16", "int8"]
+
+# Entiers signés candidats à la réduction de largeur, du plus étroit au plus large
+INTEGER_DOWNCAST_DTYPES = ["int8", "int16", "int32"]
+
+# One-hot "auto" : encodage creux des colonnes ayant au moins ce nombre de catégories
+ONE_HOT_SPARSE_MIN_CATEGORIES = int(os.getenv("PIPELINE_ONE_HOT_SPARSE_MIN_CATEGORIES", "64"))
+
+# Nombre de buckets par défaut du hash encoding
+HASH_ENCODING_BUCKETS = int(os.getenv("PIPELINE_HASH_ENCODING_BUCKETS", "1024"))
+
+# Nombre maximal de valeurs suivies par colonne (frequency/target encoding) : au-delà,
+# seules les plus fréquentes sont conservées et les autres reçoivent une valeur par défaut
+ENCODING_MAX_VALUES = int(os.getenv("PIPELINE_ENCODING_MAX_VALUES", "100000"))
+
+# Lissage par défaut du target encoding (poids, en nombre de lignes, de la moyenne globale)
+TARGET_ENCODING_SMOOTHING = 10.0
+
+# Réduction des flottants : seulement sans perte ("exact") ou systématique ("float32")
+FLOAT_PRECISIONS = {"exact", "float32"}
+
+# Colonnes textuelles converties en category : au plus ce nombre de valeurs distinctes...
+DOWNCAST_MAX_CATEGORIES = int(os.getenv("PIPELINE_DOWNCAST_MAX_CATEGORIES", "1000"))
+# ...et au plus cette proportion du nombre de valeurs non nulles
+DOWNCAST_MAX_CATEGORY_RATIO = 0.5
+
+IMPUTATION_STRATEGIES = {"mean", "median", "mode", "forward_fill", "backward_fill", "drop"}
+
+# Stratégies d'imputation calculées colonne par colonne, fusionnables en un seul fillna(dict)
+COLUMNWISE_STRATEGIES = {"mean", "median", "mode"}
+
+FILTER_OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+class PipelineValidationError(ValueError):
+    """Erreur levée lorsqu'une étape du pipeline est mal formée"""
+
+
+def _is_text(series: pd.Series) -> bool:
+    """Colonne textuelle (object ou dtype string de pandas)"""
+    return series.dtype == "object" or pd.api.types.is_string_dtype(series.dtype)
+
+
+def _resolve_columns(df: pd.DataFrame, columns: Optional[Tuple[str, ...]]) -> List[str]:
+    """Colonnes demandées présentes dans le DataFrame, ou toutes les colonnes numériques"""
+    if columns:
+        return [col for col in columns if col in df.columns]
+    return df.select_dtypes(include=NUMERIC_DTYPES).columns.tolist()
+
+
+def _as_tuple(columns: Optional[Iterable[str]]) -> Optional[Tuple[str, ...]]:
+    return None if columns is None else tuple(columns)
+
+
+def _to_python(value: Any) -> Any:
+    """Convertir un scalaire numpy en type Python natif"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _as_labels(series: pd.Series) -> pd.Series:
+    """Valeurs converties en str pour le label encoding (NaN -> "nan", quelle que soit la version de pandas)"""
+    return series.astype(str).fillna("nan")
+
+
+def _sorted_values(values: Iterable[Any]) -> List[Any]:
+    """Valeurs triées (ordre d'origine si les types ne sont pas comparables)"""
+    index = pd.Index(list(values))
+    try:
+        index = index.sort_values()
+    except TypeError:
+        pass
+    return [_to_python(v) for v in index]
+
+
+def _merge_fill_values(per_spec: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """La première imputation qui produit une valeur l'emporte, comme en exécution séquentielle"""
+    values: Dict[str, Any] = {}
+    for stats in per_spec:
+        for col, value in stats.items():
+            if col not in values or pd.isna(values[col]):
+                values[col] = value
+    return {col: _to_python(value) for col, value in values.items() if not pd.isna(value)}
+
+
+def _mode_value(counts: pd.Series) -> Any:
+    """Valeur la plus fréquente (la plus petite en cas d'égalité, comme Series.mode()[0])"""
+    if counts.empty:
+        return 0
+    top = counts[counts == counts.max()].index
+    try:
+        return top.min()
+    except TypeError:
+        return top[0]
+
+
+# ===== Statistiques incrémentales (mode chunké) =====
+
+class Accumulator:
+    """Statistiques d'une opération calculées incrémentalement, chunk par chunk"""
+
+    def update(self, df: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    def finalize(self) -> Any:
+        raise NotImplementedError
+
+
+class _MeanStat:
+    def __init__(self):
+        self.sums = pd.Series(dtype="float64")
+        self.counts = pd.Series(dtype="float64")
+
+    def update(self, frame: pd.DataFrame) -> None:
+        self.sums = self.sums.add(frame.sum(), fill_value=0)
+        self.counts = self.counts.add(frame.count(), fill_value=0)
+
+    def result(self) -> Dict[str, Any]:
+        return (self.sums / self.counts.replace(0, np.nan)).to_dict()
+
+
+class _MedianStat:
+    """Médiane estimée sur un échantillon réservoir (exacte tant que l'échantillon n'est pas plein)"""
+
+    def __init__(self, size: int = MEDIAN_SAMPLE_SIZE, seed: int = 0):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.samples: Dict[str, np.ndarray] = {}
+        self.seen: Dict[str, int] = {}
+
+    def update(self, frame: pd.DataFrame) -> None:
+        for col in frame.columns:
+            values = frame[col].dropna().to_numpy(dtype="float64")
+            sample = self.samples.get(col, np.empty(0))
+            seen = self.seen.get(col, 0)
+            take = max(0, min(self.size - seen, len(values)))
+            if take:
+                sample = np.concatenate([sample, values[:take]])
+            rest = values[take:]
+            if len(rest):
+                positions = seen + take + np.arange(len(rest))
+                slots = self.rng.integers(0, positions + 1)
+                keep = slots < self.size
+                sample[slots[keep]] = rest[keep]
+            self.samples[col] = sample
+            self.seen[col] = seen + len(values)
+
+    def result(self) -> Dict[str, Any]:
+        return {col: np.median(sample) if len(sample) else np.nan for col, sample in self.samples.items()}
+
+
+class _ModeStat:
+    """Comptage des valeurs, borné à MODE_MAX_DISTINCT valeurs par colonne"""
+
+    def __init__(self, max_distinct: int = MODE_MAX_DISTINCT):
+        self.max_distinct = max_distinct
+        self.counts: Dict[str, pd.Series] = {}
+
+    def update(self, frame: pd.DataFrame) -> None:
+        for col in frame.columns:
+            counts = self.counts.get(col)
+            chunk_counts = frame[col].value_counts()
+            counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0)
+            if len(counts) > self.max_distinct:
+                counts = counts.nlargest(self.max_distinct)
+            self.counts[col] = counts
+
+    def result(self) -> Dict[str, Any]:
+        return {col: _mode_value(counts) for col, counts in self.counts.items()}
+
+
+_FILL_STATS = {"mean": _MeanStat, "median": _MedianStat, "mode": _ModeStat}
+
+
+class _FillNaAccumulator(Accumulator):
+    def __init__(self, specs):
+        self.specs = specs
+        self.stats = [_FILL_STATS[strategy]() for strategy, _ in specs]
+
+    def update(self, df: pd.DataFrame) -> None:
+        for (_, columns), stat in zip(self.specs, self.stats):
+            cols = _resolve_columns(df, columns)
+            if cols:
+                stat.update(df[cols])
+
+    def finalize(self) -> Any:
+        return {"values": _merge_fill_values([stat.result() for stat in self.stats])}
+
+
+class _ScaleAccumulator(Accumulator):
+    """Moyenne/variance fusionnées par l'algorithme parallèle de Chan, ou min/max"""
+
+    def __init__(self, method: str, columns):
+        self.method = method
+        self.columns = columns
+        self.order: List[str] = []
+        self.n = self.mean = self.m2 = self.min = self.max = None
+
+    def update(self, df: pd.DataFrame) -> None:
+        cols = _resolve_columns(df, self.columns)
+        if not cols:
+            return
+        self.order += [col for col in cols if col not in self.order]
+        frame = df[cols].astype("float64")
+        if self.method == "minmax":
+            low, high = frame.min(), frame.max()
+            self.min = low if self.min is None else pd.concat([self.min, low], axis=1).min(axis=1)
+            self.max = high if self.max is None else pd.concat([self.max, high], axis=1).max(axis=1)
+            return
+        n_b = frame.count()
+        mean_b = frame.mean()
+        m2_b = ((frame - mean_b) ** 2).sum()
+        if self.n is None:
+            self.n, self.mean, self.m2 = n_b, mean_b, m2_b
+            return
+        index = self.n.index.union(n_b.index, sort=False)
+        n_a, mean_a, m2_a = self.n.reindex(index, fill_value=0), self.mean.reindex(index), self.m2.reindex(index, fill_value=0)
+        n_b, mean_b, m2_b = n_b.reindex(index, fill_value=0), mean_b.reindex(index), m2_b.reindex(index, fill_value=0)
+        n = n_a + n_b
+        delta = (mean_b - mean_a).fillna(0)
+        ratio = (n_b / n.replace(0, np.nan)).fillna(0)
+        self.mean = mean_a.fillna(mean_b) + delta * ratio
+        self.m2 = m2_a + m2_b + delta ** 2 * n_a * ratio
+        self.n = n
+
+    def finalize(self) -> Any:
+        if not self.order:
+            return _scale_state(self.method, [], [], [])
+        if self.method == "minmax":
+            low = self.min.reindex(self.order).to_numpy()
+            span = self.max.reindex(self.order).to_numpy() - low
+        else:
+            low = self.mean.reindex(self.order).to_numpy()
+            n = self.n.reindex(self.order).to_numpy()
+            span = np.sqrt(self.m2.reindex(self.order).to_numpy() / np.where(n > 0, n, np.nan))
+        return _scale_state(self.method, self.order, low, span)
+
+
+class _CategoriesAccumulator(Accumulator):
+    """Ensemble des valeurs distinctes par colonne (one-hot et label encoding)"""
+
+    def __init__(self, columns, labels: bool, finish=None):
+        self.columns = columns
+        self.labels = labels
+        self.finish = finish
+        self.values: Dict[str, set] = {}
+
+    def update(self, df: pd.DataFrame) -> None:
+        for col in self.columns:
+            if col not in df.columns:
+                continue
+            if self.labels:
+                if not _is_text(df[col]):
+                    continue
+                uniques = _as_labels(df[col]).unique()
+            else:
+                uniques = df[col].dropna().unique()
+            self.values.setdefault(col, set()).update(_to_python(v) for v in uniques)
+
+    def finalize(self) -> Any:
+        key = "classes" if self.labels else "categories"
+        state = {key: {col: _sorted_values(values) for col, values in self.values.items()}}
+        return self.finish(state) if self.finish else state
+
+
+class _DowncastAccumulator(Accumulator):
+    """Bornes des entiers, exactitude en float32 et valeurs distinctes (bornées) des textes"""
+
+    def __init__(self, columns, max_categories: int, max_category_ratio: float, float_precision: str):
+        self.columns = columns
+        self.max_categories = max_categories
+        self.max_category_ratio = max_category_ratio
+        self.float_precision = float_precision
+        self.stats: Dict[str, Dict[str, Any]] = {}
+
+    def update(self, df: pd.DataFrame) -> None:
+        for col in self.columns or df.columns:
+            if col not in df.columns:
+                continue
+            series = df[col]
+            kind = _downcast_kind(series)
+            stat = self.stats.setdefault(col, {"kind": kind, "min": None, "max": None, "exact32": True, "values": set(), "count": 0})
+            if stat["kind"] != kind:
+                # Entiers dans un chunk, flottants (valeurs manquantes) dans un autre
+                stat["kind"] = "float" if {stat["kind"], kind} == {"int", "float"} else "other"
+            valid = series.dropna()
+            if kind in ("int", "float") and len(valid):
+                values = valid.to_numpy()
+                low, high = values.min(), values.max()
+                stat["min"] = low if stat["min"] is None else min(stat["min"], low)
+                stat["max"] = high if stat["max"] is None else max(stat["max"], high)
+                if stat["exact32"]:
+                    with np.errstate(over="ignore", invalid="ignore"):
+                        stat["exact32"] = bool(np.array_equal(values.astype("float32").astype("float64"), values.astype("float64")))
+            elif kind == "text" and stat["values"] is not None:
+                stat["values"].update(valid.unique())
+                stat["count"] += len(valid)
+                if len(stat["values"]) > self.max_categories:
+                    stat["values"] = None
+
+    def finalize(self) -> Any:
+        dtypes: Dict[str, str] = {}
+        categories: Dict[str, List[Any]] = {}
+        for col, stat in self.stats.items():
+            if stat["kind"] == "int" and stat["min"] is not None:
+                for dtype in INTEGER_DOWNCAST_DTYPES:
+                    info = np.iinfo(dtype)
+                    if info.min <= stat["min"] and stat["max"] <= info.max:
+                        dtypes[col] = dtype
+                        break
+            elif stat["kind"] in ("int", "float") and stat["min"] is not None:
+                finite = max(abs(float(stat["min"])), abs(float(stat["max"]))) <= np.finfo("float32").max
+                if stat["exact32"] or (self.float_precision == "float32" and finite):
+                    dtypes[col] = "float32"
+            elif stat["kind"] == "text" and stat["values"] is not None and stat["values"]:
+                if len(stat["values"]) <= self.max_category_ratio * stat["count"]:
+                    dtypes[col] = "category"
+                    categories[col] = _sorted_values(stat["values"])
+        return {"dtypes": dtypes, "categories": categories}
+
+
+def _bounded_add(current: Optional[pd.DataFrame], chunk: pd.DataFrame, max_values: int) -> Tuple[pd.DataFrame, bool]:
+    """Fusionner des agrégats par valeur en ne gardant que les max_values valeurs les plus fréquentes"""
+    merged = chunk if current is None else current.add(chunk, fill_value=0)
+    if len(merged) > max_values:
+        return merged.nlargest(max_values, "count"), True
+    return merged, False
+
+
+class _ValueStatsAccumulator(Accumulator):
     """
-    Appliquer un pipeline de transformations sur un DataFrame
-    
-    Args:
-        df: DataFrame pandas à transformer
-        pipeline: Dictionnaire contenant les étapes de transformation
-    
-    Returns:
-        DataFrame transformé
+    Nombre d'occurrences (et somme de la cible) par valeur, agrégés chunk par chunk
+
+    Mémoire bornée par ENCODING_MAX_VALUES valeurs par colonne : au-delà, les valeurs
+    les moins fréquentes sont écartées (elles recevront la valeur par défaut).
     """
-    df = df.copy()
-    
-    steps = pipeline.get("steps", [])
-    
-    for step in steps:
-        step_name = step.get("name", "").lower()
-        
-        # Imputation des valeurs manquantes
-        if step_name == "imputation":
-            strategy = step.get("strategy", "mean").lower()
-            columns = step.get("columns")
-            
-            if columns:
-                # Colonnes spécifiques
-                cols_to_impute = [col for col in columns if col in df.columns]
+
+    def __init__(self, columns, max_values: int, target: Optional[str] = None):
+        self.columns = columns
+        self.max_values = max_values
+        self.target = target
+        self.stats: Dict[str, pd.DataFrame] = {}
+        self.truncated: Dict[str, bool] = {}
+        self.rows = 0
+        self.target_sum = 0.0
+        self.target_count = 0
+
+    def update(self, df: pd.DataFrame) -> None:
+        self.rows += len(df)
+        target = None
+        if self.target is not None:
+            if self.target not in df.columns:
+                return
+            target = _numeric_target(df[self.target], self.target)
+            self.target_sum += float(target.sum())
+            self.target_count += int(target.count())
+        for col in self.columns:
+            if col not in df.columns:
+                continue
+            labels = _as_labels(df[col])
+            if target is None:
+                chunk = labels.value_counts().to_frame("count")
             else:
-                # Toutes les colonnes numériques
-                cols_to_impute = df.select_dtypes(include=["float64", "int64"]).columns.tolist()
-            
+                chunk = target.groupby(labels.to_numpy()).agg(["sum", "count"])
+            self.stats[col], truncated = _bounded_add(self.stats.get(col), chunk, self.max_values)
+            self.truncated[col] = self.truncated.get(col, False) or truncated
+
+    def frequencies(self) -> Dict[str, Any]:
+        counts, defaults = {}, {}
+        for col, stats in self.stats.items():
+            counts[col] = {str(k): int(v) for k, v in stats["count"].items()}
+            # Valeurs écartées : au plus aussi fréquentes que la moins fréquente conservée
+            defaults[col] = int(stats["count"].min()) if self.truncated[col] else 0
+        return {"counts": counts, "defaults": defaults, "rows": self.rows}
+
+    def target_means(self, smoothing: float) -> Dict[str, Any]:
+        prior = self.target_sum / self.target_count if self.target_count else 0.0
+        encodings = {}
+        for col, stats in self.stats.items():
+            means = (stats["sum"] + smoothing * prior) / (stats["count"] + smoothing)
+            encodings[col] = {str(k): float(v) for k, v in means.items()}
+        return {"prior": prior, "encodings": encodings}
+
+
+class _FinalizedAccumulator(Accumulator):
+    """Accumulateur dont l'état final est calculé par une fonction de l'opération"""
+
+    def __init__(self, accumulator: Accumulator, finish):
+        self.accumulator = accumulator
+        self.finish = finish
+
+    def update(self, df: pd.DataFrame) -> None:
+        self.accumulator.update(df)
+
+    def finalize(self) -> Any:
+        return self.finish(self.accumulator)
+
+
+class _FirstValidAccumulator(Accumulator):
+    """Première valeur non nulle de chaque chunk, pour propager backward_fill entre chunks"""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.firsts: List[Dict[str, Any]] = []
+
+    def update(self, df: pd.DataFrame) -> None:
+        cols = _resolve_columns(df, self.columns)
+        first = df[cols].bfill().iloc[0] if len(df) and cols else pd.Series(dtype="float64")
+        self.firsts.append(first.dropna().to_dict())
+
+    def finalize(self) -> Any:
+        # Pour chaque chunk : première valeur non nulle trouvée dans les chunks suivants
+        following: List[Dict[str, Any]] = []
+        carry: Dict[str, Any] = {}
+        for first in reversed(self.firsts):
+            following.append(dict(carry))
+            carry = {**carry, **first}
+        following.reverse()
+        return {"following": following}
+
+
+def _scale_state(method: str, columns: List[str], low, span) -> Dict[str, Any]:
+    span = np.asarray(span, dtype="float64")
+    # Même traitement des échelles nulles que scikit-learn (_handle_zeros_in_scale)
+    span = np.where(np.abs(span) < 10 * np.finfo(np.float64).eps, 1.0, span)
+    return {
+        "method": method,
+        "columns": list(columns),
+        "offset": [float(v) for v in low],
+        "scale": [float(v) for v in span],
+    }
+
+
+def _merge_block_states(states: List[Any]) -> Any:
+    """États d'une opération ajustée par blocs de colonnes : dictionnaires fusionnés, listes concaténées"""
+    merged = None
+    for state in states:
+        if state is None:
+            continue
+        if merged is None:
+            merged = {key: dict(value) if isinstance(value, dict) else list(value) if isinstance(value, list) else value
+                      for key, value in state.items()}
+            continue
+        for key, value in state.items():
+            if isinstance(value, dict):
+                merged[key].update(value)
+            elif isinstance(value, list):
+                merged[key].extend(value)
+    return merged
+
+
+def _column_blocks(n_columns: int, workers: int) -> List[List[int]]:
+    """Positions des colonnes découpées en blocs contigus de tailles équilibrées"""
+    return [block.tolist() for block in np.array_split(np.arange(n_columns), min(workers, n_columns)) if len(block)]
+
+
+# ===== Opérations du plan compilé =====
+
+class DependencyTracker:
+    """Colonnes et lignes dont les valeurs dépendent de statistiques pas encore ajustées"""
+
+    def __init__(self):
+        self.columns: set = set()
+        self.all_columns = False
+        self.rows = False
+
+    def touches(self, columns: Optional[Tuple[str, ...]]) -> bool:
+        if self.rows or self.all_columns:
+            return True
+        if columns is None:
+            return bool(self.columns)
+        return bool(self.columns.intersection(columns))
+
+    def mark(self, columns: Optional[Tuple[str, ...]]) -> None:
+        if columns is None:
+            self.all_columns = True
+        else:
+            self.columns.update(columns)
+
+
+class Operation:
+    """Opération élémentaire d'un plan compilé"""
+
+    # Nécessite des statistiques ajustées sur les données
+    stateful = False
+    # Peut supprimer des lignes
+    affects_rows = False
+    # Identifiant de l'opération dans un pipeline ajusté sérialisé
+    kind = ""
+    # Chaque colonne écrite ne dépend que d'elle-même : exécutable par blocs de colonnes
+    column_local = False
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        """Arguments du constructeur, sérialisables en JSON"""
+        return {}
+
+    @property
+    def read_columns(self) -> Optional[Tuple[str, ...]]:
+        """Colonnes lues (None = toutes)"""
+        return None
+
+    @property
+    def write_columns(self) -> Optional[Tuple[str, ...]]:
+        """Colonnes modifiées ou créées (None = potentiellement toutes)"""
+        return ()
+
+    def fit(self, df: pd.DataFrame) -> Any:
+        """Calculer l'état de l'opération sur un DataFrame complet"""
+        return None
+
+    def accumulator(self) -> Accumulator:
+        """Accumulateur pour calculer le même état chunk par chunk"""
+        raise NotImplementedError
+
+    def transform(self, df: pd.DataFrame, state: Any) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def transform_stream(self, chunks: Iterable[pd.DataFrame], state: Any) -> Iterator[pd.DataFrame]:
+        """Appliquer l'opération chunk par chunk (un chunk produit par chunk reçu)"""
+        for chunk in chunks:
+            yield self.transform(chunk, state)
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self.transform(df, self.fit(df))
+
+    def merge_block_states(self, df: pd.DataFrame, states: List[Any]) -> Any:
+        """Fusionner les états ajustés sur des blocs de colonnes (dans l'ordre des colonnes de df)"""
+        return _merge_block_states(states)
+
+    def propagate(self, tracker: DependencyTracker) -> None:
+        """Propager les dépendances aux statistiques non ajustées (planification des passes)"""
+        if tracker.touches(self.read_columns):
+            if self.affects_rows:
+                tracker.rows = True
+            tracker.mark(self.write_columns)
+
+
+class FillNaOperation(Operation):
+    """Imputations mean/median/mode adjacentes fusionnées en un seul fillna(dict)"""
+
+    stateful = True
+    kind = "fillna"
+    column_local = True
+
+    def __init__(self, specs: Iterable[Tuple[str, Optional[Iterable[str]]]]):
+        self.specs = tuple((strategy, _as_tuple(columns)) for strategy, columns in specs)
+
+    @property
+    def params(self):
+        return {"specs": [[strategy, columns and list(columns)] for strategy, columns in self.specs]}
+
+    @property
+    def read_columns(self):
+        if any(columns is None for _, columns in self.specs):
+            return None
+        return tuple(col for _, columns in self.specs for col in columns)
+
+    write_columns = read_columns
+
+    def fit(self, df: pd.DataFrame) -> Any:
+        per_spec = []
+        for strategy, columns in self.specs:
+            cols = _resolve_columns(df, columns)
+            if not cols:
+                continue
             if strategy == "mean":
-                for col in cols_to_impute:
-                    df[col] = df[col].fillna(df[col].mean())
+                per_spec.append(df[cols].mean().to_dict())
             elif strategy == "median":
-                for col in cols_to_impute:
-                    df[col] = df[col].fillna(df[col].median())
-            elif strategy == "mode":
-                for col in cols_to_impute:
-                    df[col] = df[col].fillna(df[col].mode()[0] if not df[col].mode().empty else 0)
-            elif strategy == "forward_fill":
-                df[cols_to_impute] = df[cols_to_impute].fillna(method="ffill")
-            elif strategy == "backward_fill":
-                df[cols_to_impute] = df[cols_to_impute].fillna(method="bfill")
+                per_spec.append(df[cols].median().to_dict())
+            else:
+                per_spec.append({col: _mode_value(df[col].value_counts()) for col in cols})
+        return {"values": _merge_fill_values(per_spec)}
+
+    def accumulator(self) -> Accumulator:
+        return _FillNaAccumulator(self.specs)
+
+    def transform(self, df: pd.DataFrame, state: Any) -> pd.DataFrame:
+        values = state["values"]
+        return df.fillna(values) if values else df
+
+
+class PropagateFillOperation(Operation):
+    """Imputation par propagation (forward_fill / backward_fill)"""
+
+    kind = "propagate_fill"
+    column_local = True
+
+    def __init__(self, strategy: str, columns: Optional[Iterable[str]]):
+        self.strategy = strategy
+        self.columns = _as_tuple(columns)
+        # backward_fill a besoin, en mode chunké, des premières valeurs des chunks suivants
+        self.stateful = strategy == "backward_fill"
+
+    @property
+    def params(self):
+        return {"strategy": self.strategy, "columns": self.columns and list(self.columns)}
+
+    @property
+    def read_columns(self):
+        return self.columns
+
+    write_columns = read_columns
+
+    def accumulator(self) -> Accumulator:
+        return _FirstValidAccumulator(self.columns)
+
+    def transform(self, df: pd.DataFrame, state: Any) -> pd.DataFrame:
+        cols = _resolve_columns(df, self.columns)
+        if cols:
+            filled = df[cols].ffill() if self.strategy == "forward_fill" else df[cols].bfill()
+            df[cols] = filled
+        return df
+
+    def transform_stream(self, chunks: Iterable[pd.DataFrame], state: Any) -> Iterator[pd.DataFrame]:
+        following = (state or {}).get("following", [])
+        carry = pd.Series(dtype="float64")
+        for position, chunk in enumerate(chunks):
+            cols = _resolve_columns(chunk, self.columns)
+            if cols:
+                chunk = chunk.copy(deep=False)
+                if self.strategy == "forward_fill":
+                    filled = chunk[cols].ffill().fillna(carry)
+                    if len(filled):
+                        carry = filled.iloc[-1].dropna()
+                else:
+                    filled = chunk[cols].bfill()
+                    if position < len(following):
+                        filled = filled.fillna(following[position])
+                chunk[cols] = filled
+            yield chunk
+
+
+class DropNaOperation(Operation):
+    """Suppression des lignes contenant des valeurs manquantes"""
+
+    affects_rows = True
+    kind = "dropna"
+
+    def __init__(self, columns: Optional[Iterable[str]]):
+        self.columns = _as_tuple(columns)
+
+    @property
+    def params(self):
+        return {"columns": self.columns and list(self.columns)}
+
+    @property
+    def read_columns(self):
+        return self.columns
+
+    def transform(self, df: pd.DataFrame, state: Any) -> pd.DataFrame:
+        return df.dropna(subset=_resolve_columns(df, self.columns))
+
+
+class OneHotOperation(Operation):
+    """
+    One-hot encoding sur un ensemble de catégories ajusté
+
+    En mode creux (sparse), les colonnes ne sont pas développées en indicatrices :
+    elles sont conservées en category sur les catégories ajustées (une colonne en
+    stockage au lieu d'une par catégorie). Le Trainer, l'Evaluator et le Deployer
+    en construisent une matrice CSR pour les modèles qui acceptent une entrée creuse.
+    """
+
+    stateful = True
+    kind = "one_hot"
+
+    def __init__(self, columns: Iterable[str], sparse: Union[bool, str] = False):
+        self.columns = tuple(columns)
+        self.sparse = sparse
+
+    @property
+    def params(self):
+        if not self.sparse:
+            return {"columns": list(self.columns)}
+        return {"columns": list(self.columns), "sparse": self.sparse}
+
+    @property
+    def read_columns(self):
+        return self.columns
+
+    @property
+    def write_columns(self):
+        # Les colonnes indicatrices créées ne sont pas connues avant l'ajustement
+        return None
+
+    def fit(self, df: pd.DataFrame) -> Any:
+        return self.with_sparse_columns({"categories": {
+            col: _sorted_values(df[col].dropna().unique()) for col in self.columns if col in df.columns
+        }})
+
+    def accumulator(self) -> Accumulator:
+        return _CategoriesAccumulator(self.columns, labels=False, finish=self.with_sparse_columns)
+
+    def with_sparse_columns(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Ajouter à l'état les colonnes encodées en mode creux"""
+        if self.sparse == "auto":
+            state["sparse"] = [col for col, values in state["categories"].items() if len(values) >= ONE_HOT_SPARSE_MIN_CATEGORIES]
+        elif self.sparse:
+            state["sparse"] = list(state["categories"])
+        return state
+
+    def transform(self, df: pd.DataFrame, state: Any) -> pd.DataFrame:
+        categories = state["categories"]
+        cols_to_encode = [col for col in self.columns if col in df.columns and col in categories]
+        if not cols_to_encode:
+            return df
+        for col in cols_to_encode:
+            # Catégories fixées : mêmes colonnes indicatrices quel que soit le chunk ;
+            # une catégorie inconnue de l'ajustement devient une valeur manquante
+            df[col] = pd.Categorical.from_codes(pd.Index(categories[col]).get_indexer(df[col]), categories=categories[col])
+        sparse = set(state.get("sparse", ()))
+        dense = [col for col in cols_to_encode if col not in sparse]
+        if not dense:
+            return df
+        return pd.get_dummies(df, columns=dense, prefix=dense)
+
+
+class LabelEncodeOperation(Operation):
+    """Label encoding vectorisé (équivalent à LabelEncoder sur les valeurs converties en str)"""
+
+    stateful = True
+    kind = "label"
+    column_local = True
+
+    def __init__(self, columns: Iterable[str]):
+        self.columns = tuple(columns)
+
+    @property
+    def params(self):
+        return {"columns": list(self.columns)}
+
+    @property
+    def read_columns(self):
+        return self.columns
+
+    write_columns = read_columns
+
+    def fit(self, df: pd.DataFrame) -> Any:
+        return {"classes": {
+            col: _sorted_values(_as_labels(df[col]).unique())
+            for col in self.columns if col in df.columns and _is_text(df[col])
+        }}
+
+    def accumulator(self) -> Accumulator:
+        return _CategoriesAccumulator(self.columns, labels=True)
+
+    def transform(self, df: pd.DataFrame, state: Any) -> pd.DataFrame:
+        for col, classes in state["classes"].items():
+            if col in df.columns and _is_text(df[col]):
+                # Valeurs inconnues lors de l'ajustement -> -1
+                df[col] = pd.Index(classes).get_indexer(_as_labels(df[col])).astype("int64")
+        return df
+
+
+def _numeric_target(series: pd.Series, name: str) -> pd.Series:
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return series.astype("float64")
+    if not pd.api.types.is_numeric_dtype(series.dtype):
+        raise PipelineValidationError(f"target_encoding: la cible '{name}' doit être numérique ou booléenne")
+    return series.astype("float64")
+
+
+class HashEncodeOperation(Operation):
+    """Hash encoding : chaque valeur (convertie en str) est remplacée par son bucket, sans vocabulaire"""
+
+    kind = "hash"
+    column_local = True
+
+    def __init__(self, columns: Iterable[str], n_buckets: int = HASH_ENCODING_BUCKETS):
+        self.columns = tuple(columns)
+        self.n_buckets = n_buckets
+
+    @property
+    def params(self):
+        return {"columns": list(self.columns), "n_buckets": self.n_buckets}
+
+    @property
+    def read_columns(self):
+        return self.columns
+
+    write_columns = read_columns
+
+    def transform(self, df: pd.DataFrame, state: Any) -> pd.DataFrame:
+        for col in self.columns:
+            if col in df.columns:
+                # Hachage vectorisé et déterministe (même bucket d'un processus à l'autre)
+                hashes = pd.util.hash_array(_as_labels(df[col]).to_numpy(dtype=object))
+                df[col] = (hashes % np.uint64(self.n_buckets)).astype("int64")
+        return df
+
+
+class FrequencyEncodeOperation(Operation):
+    """Frequency encoding : chaque valeur est remplacée par son nombre d'occurrences (ou sa proportion)"""
+
+    stateful = True
+    kind = "frequency"
+    column_local = True
+
+    def __init__(self, columns: Iterable[str], normalize: bool = True, max_values: int = ENCODING_MAX_VALUES):
+        self.columns = tuple(columns)
+        self.normalize = normalize
+        self.max_values = max_values
+
+    @property
+    def params(self):
+        return {"columns": list(self.columns), "normalize": self.normalize, "max_values": self.max_values}
+
+    @property
+    def read_columns(self):
+        return self.columns
+
+    write_columns = read_columns
+
+    def fit(self, df: pd.DataFrame) -> Any:
+        accumulator = self.accumulator()
+        accumulator.update(df)
+        return accumulator.finalize()
+
+    def accumulator(self) -> Accumulator:
+        return _FinalizedAccumulator(
+            _ValueStatsAccumulator(self.columns, self.max_values),
+            lambda stats: stats.frequencies()
+        )
+
+    def transform(self, df: pd.DataFrame, state: Any) -> pd.DataFrame:
+        for col, counts in state["counts"].items():
+            if col in df.columns:
+                encoded = _as_labels(df[col]).map(counts).astype("float64").fillna(state["defaults"][col])
+                if self.normalize:
+                    encoded = encoded / max(state["rows"], 1)
+                df[col] = encoded.to_numpy()
+        return df
+
+
+class TargetEncodeOperation(Operation):
+    """
+    Target encoding : chaque valeur est remplacée par la moyenne lissée de la cible
+    sur ses lignes, (somme + lissage * moyenne globale) / (effectif + lissage)
+    """
+
+    stateful = True
+    kind = "target"
+
+    def __init__(
+        self,
+        columns: Iterable[str],
+        target: str,
+        smoothing: float = TARGET_ENCODING_SMOOTHING,
+        max_values: int = ENCODING_MAX_VALUES
+    ):
+        self.columns = tuple(columns)
+        self.target = target
+        self.smoothing = smoothing
+        self.max_values = max_values
+
+    @property
+    def params(self):
+        return {"columns": list(self.columns), "target": self.target, "smoothing": self.smoothing, "max_values": self.max_values}
+
+    @property
+    def read_columns(self):
+        return self.columns + (self.target,)
+
+    @property
+    def write_columns(self):
+        return self.columns
+
+    def fit(self, df: pd.DataFrame) -> Any:
+        accumulator = self.accumulator()
+        accumulator.update(df)
+        return accumulator.finalize()
+
+    def accumulator(self) -> Accumulator:
+        return _FinalizedAccumulator(
+            _ValueStatsAccumulator(self.columns, self.max_values, target=self.target),
+            lambda stats: stats.target_means(self.smoothing)
+        )
+
+    def transform(self, df: pd.DataFrame, state: Any) -> pd.DataFrame:
+        for col, encoding in state["encodings"].items():
+            if col in df.columns:
+                # Valeurs inconnues (ou écartées) : moyenne globale de la cible
+                encoded = _as_labels(df[col]).map(encoding).astype("float64").fillna(state["prior"])
+                df[col] = encoded.to_numpy()
+        return df
+
+
+class ScaleOperation(Operation):
+    """Mise à l'échelle standard ou min-max (mêmes résultats que StandardScaler/MinMaxScaler)"""
+
+    stateful = True
+    kind = "scale"
+    column_local = True
+
+    def __init__(self, method: str, columns: Optional[Iterable[str]]):
+        self.method = "minmax" if method == "minmax" else "standard"
+        self.columns = _as_tuple(columns)
+
+    @property
+    def params(self):
+        return {"method": self.method, "columns": self.columns and list(self.columns)}
+
+    @property
+    def read_columns(self):
+        return self.columns
+
+    write_columns = read_columns
+
+    def fit(self, df: pd.DataFrame) -> Any:
+        numeric_cols = _resolve_columns(df, self.columns)
+        values = df[numeric_cols].to_numpy(dtype="float64")
+        if not numeric_cols or not len(values):
+            return _scale_state(self.method, numeric_cols, [np.nan] * len(numeric_cols), [1.0] * len(numeric_cols))
+        if self.method == "minmax":
+            low = np.nanmin(values, axis=0)
+            span = np.nanmax(values, axis=0) - low
+        else:
+            low = np.nanmean(values, axis=0)
+            span = np.nanstd(values, axis=0)
+        return _scale_state(self.method, numeric_cols, low, span)
+
+    def accumulator(self) -> Accumulator:
+        return _ScaleAccumulator(self.method, self.columns)
+
+    def merge_block_states(self, df: pd.DataFrame, states: List[Any]) -> Any:
+        merged = _merge_block_states(states)
+        if self.columns is None:
+            # Colonnes numériques : les blocs contigus suivent déjà l'ordre de df
+            return merged
+        # Colonnes explicites : même ordre qu'un ajustement sur le DataFrame complet
+        position = {col: i for i, col in enumerate(merged["columns"])}
+        order = [position[col] for col in _resolve_columns(df, self.columns) if col in position]
+        for key in ("columns", "offset", "scale"):
+            merged[key] = [merged[key][i] for i in order]
+        return merged
+
+    def transform(self, df: pd.DataFrame, state: Any) -> pd.DataFrame:
+        present = [i for i, col in enumerate(state["columns"]) if col in df.columns]
+        if present:
+            cols = [state["columns"][i] for i in present]
+            offset = np.asarray(state["offset"])[present]
+            scale = np.asarray(state["scale"])[present]
+            df[cols] = (df[cols].to_numpy(dtype="float64") - offset) / scale
+        return df
+
+
+def _downcast_kind(series: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return "bool"
+    if pd.api.types.is_integer_dtype(series.dtype) and not pd.api.types.is_extension_array_dtype(series.dtype):
+        return "int"
+    if pd.api.types.is_float_dtype(series.dtype) and not pd.api.types.is_extension_array_dtype(series.dtype):
+        return "float"
+    if _is_text(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+        return "text"
+    return "other"
+
+
+class DowncastOperation(Operation):
+    """
+    Réduction de la largeur des types : entiers sur la plus petite largeur signée
+    suffisante, flottants en float32 (sans perte, ou systématiquement), textes
+    de faible cardinalité en category
+    """
+
+    stateful = True
+    kind = "downcast"
+    column_local = True
+
+    def __init__(
+        self,
+        columns: Optional[Iterable[str]] = None,
+        max_categories: int = DOWNCAST_MAX_CATEGORIES,
+        max_category_ratio: float = DOWNCAST_MAX_CATEGORY_RATIO,
+        float_precision: str = "exact"
+    ):
+        self.columns = _as_tuple(columns)
+        self.max_categories = max_categories
+        self.max_category_ratio = max_category_ratio
+        self.float_precision = float_precision
+
+    @property
+    def params(self):
+        return {
+            "columns": self.columns and list(self.columns),
+            "max_categories": self.max_categories,
+            "max_category_ratio": self.max_category_ratio,
+            "float_precision": self.float_precision,
+        }
+
+    @property
+    def read_columns(self):
+        return self.columns
+
+    write_columns = read_columns
+
+    def fit(self, df: pd.DataFrame) -> Any:
+        accumulator = self.accumulator()
+        accumulator.update(df)
+        return accumulator.finalize()
+
+    def accumulator(self) -> Accumulator:
+        return _DowncastAccumulator(self.columns, self.max_categories, self.max_category_ratio, self.float_precision)
+
+    def transform(self, df: pd.DataFrame, state: Any) -> pd.DataFrame:
+        for col, dtype in state["dtypes"].items():
+            if col not in df.columns:
+                continue
+            series = df[col]
+            kind = _downcast_kind(series)
+            if dtype == "category" and kind == "text":
+                categories = state["categories"][col]
+                # Valeurs absentes lors de l'ajustement (nouvelles données) : conservées
+                unknown = series[series.notna() & ~series.isin(categories)].unique()
+                df[col] = pd.Categorical(series, categories=categories + _sorted_values(unknown))
+            elif dtype == "float32" and kind in ("int", "float"):
+                df[col] = series.astype("float32")
+            elif dtype in INTEGER_DOWNCAST_DTYPES and kind == "int":
+                info = np.iinfo(dtype)
+                # Nouvelles données hors de l'intervalle ajusté : largeur d'origine conservée
+                if series.empty or (info.min <= series.min() and series.max() <= info.max):
+                    df[col] = series.astype(dtype)
+        return df
+
+
+class ProjectionOperation(Operation):
+    """Suppressions et renommages de colonnes adjacents fusionnés en une seule projection"""
+
+    kind = "projection"
+
+    def __init__(self, actions: Iterable[Tuple[str, Any]]):
+        # actions: ("drop", (col, ...)) ou ("rename", ((ancien, nouveau), ...))
+        self.actions = tuple(
+            (action, tuple(arg) if action == "drop" else tuple(tuple(pair) for pair in arg))
+            for action, arg in actions
+        )
+
+    @property
+    def params(self):
+        return {"actions": [[action, [list(a) if isinstance(a, tuple) else a for a in arg]] for action, arg in self.actions]}
+
+    def transform(self, df: pd.DataFrame, state: Any) -> pd.DataFrame:
+        positions = list(range(df.shape[1]))
+        labels = list(df.columns)
+        for kind, arg in self.actions:
+            if kind == "drop":
+                to_drop = set(arg)
+                kept = [(pos, label) for pos, label in zip(positions, labels) if label not in to_drop]
+                positions = [pos for pos, _ in kept]
+                labels = [label for _, label in kept]
+            else:
+                mapping = dict(arg)
+                labels = [mapping.get(label, label) for label in labels]
+
+        if len(positions) != df.shape[1]:
+            df = df.iloc[:, positions]
+        if labels != list(df.columns):
+            df = df.copy(deep=False)
+            df.columns = labels
+        return df
+
+    def propagate(self, tracker: DependencyTracker) -> None:
+        for kind, arg in self.actions:
+            if kind == "drop":
+                tracker.columns.difference_update(arg)
+            else:
+                mapping = dict(arg)
+                tracker.columns = {mapping.get(col, col) for col in tracker.columns}
+
+
+class FilterOperation(Operation):
+    """Filtrage des lignes selon une condition simple"""
+
+    affects_rows = True
+    kind = "filter"
+
+    def __init__(self, column: str, op: str, value: Any):
+        self.column = column
+        self.op = op
+        self.value = value
+
+    @property
+    def params(self):
+        return {"column": self.column, "op": self.op, "value": self.value}
+
+    @property
+    def read_columns(self):
+        return (self.column,)
+
+    def transform(self, df: pd.DataFrame, state: Any) -> pd.DataFrame:
+        if self.column not in df.columns:
+            return df
+        return df[FILTER_OPERATORS[self.op](df[self.column], self.value)]
+
+
+# ===== Compilation =====
+
+class ReadPushdown:
+    """
+    Colonnes à ne pas lire et filtres applicables dès la lecture de la source
+
+    Les opérations correspondantes restent dans le plan : appliquées à nouveau sur
+    les données déjà réduites, elles n'ont plus d'effet.
+    """
+
+    def __init__(self, skip_columns: Iterable[str] = (), filters: Iterable[FilterOperation] = ()):
+        self.skip_columns = frozenset(skip_columns)
+        self.filters = tuple(filters)
+
+    @property
+    def usecols(self):
+        """Argument usecols de pd.read_csv (None : toutes les colonnes)"""
+        if not self.skip_columns:
+            return None
+        return lambda col: col not in self.skip_columns
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Appliquer les filtres à un chunk fraîchement lu"""
+        for op in self.filters:
+            df = op.transform(df, None)
+        return df
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "skipped_columns": sorted(self.skip_columns),
+            "filters": [op.params for op in self.filters],
+        }
+
+
+class PipelinePlan:
+    """Plan d'exécution compilé et immuable d'un pipeline"""
+
+    def __init__(self, operations: Tuple[Operation, ...], ignored_steps: Tuple[str, ...] = ()):
+        self.operations = operations
+        self.ignored_steps = ignored_steps
+
+    def canonical_json(self) -> str:
+        """
+        Représentation canonique du plan
+
+        Deux pipelines équivalents (ordre des clés, étapes fusionnées ou ignorées)
+        ont la même représentation : elle sert de clé au cache des datasets préparés.
+        """
+        steps = [{"op": op.kind, "params": op.params} for op in self.operations]
+        return json.dumps(steps, sort_keys=True, separators=(",", ":"), default=_to_python)
+
+    def fit_stages(self) -> List[List[int]]:
+        """
+        Regrouper les opérations à ajuster en étapes de passes successives
+
+        Une opération rejoint l'étape courante tant qu'elle ne lit ni colonnes ni
+        lignes modifiées par une opération de cette même étape : toutes ses
+        statistiques peuvent alors être calculées pendant la même passe.
+
+        Returns:
+            Liste d'étapes, chacune étant la liste des indices des opérations à ajuster
+        """
+        stages: List[List[int]] = []
+        current: List[int] = []
+        tracker = DependencyTracker()
+        for index, op in enumerate(self.operations):
+            if op.stateful:
+                if current and tracker.touches(op.read_columns):
+                    stages.append(current)
+                    current, tracker = [], DependencyTracker()
+                current.append(index)
+                tracker.mark(op.write_columns)
+                if op.affects_rows:
+                    tracker.rows = True
+            else:
+                op.propagate(tracker)
+        if current:
+            stages.append(current)
+        return stages
+
+    def read_pushdown(self) -> ReadPushdown:
+        """
+        Colonnes et lignes du fichier source inutiles au résultat du plan
+
+        Une colonne supprimée par drop_columns n'est pas lue si aucune opération
+        dont le résultat en dépend par ailleurs (filtre, suppression de lignes,
+        one-hot, cible d'un target encoding) ne la lit avant sa suppression, ni
+        aucune opération ajustée : son état (moyennes, échelles, types...) doit
+        rester celui d'une lecture complète. Une opération ajustée sur toutes les
+        colonnes (columns=None) fige donc les suppressions qui la suivent. Les filtres simples placés avant
+        toute opération sensible à l'ensemble des lignes (imputation, scaling,
+        encodage...) sont appliqués à la lecture. Les renommages intermédiaires
+        sont suivis jusqu'aux noms de colonnes de la source.
+        """
+        # Nom courant -> nom dans la source (None : colonne disparue)
+        aliases: Dict[str, Optional[str]] = {}
+        pinned: set = set()
+        pin_all = False
+        skip: set = set()
+        filters: List[FilterOperation] = []
+        leading = True
+
+        def source(name: str) -> Optional[str]:
+            return aliases.get(name, name)
+
+        for op in self.operations:
+            if isinstance(op, ProjectionOperation):
+                for kind, arg in op.actions:
+                    if kind == "drop":
+                        for name in arg:
+                            origin = source(name)
+                            if origin is not None and not pin_all and origin not in pinned:
+                                skip.add(origin)
+                            aliases[name] = None
+                    else:
+                        renamed = {new: source(old) for old, new in arg}
+                        for old, _ in arg:
+                            aliases[old] = None
+                        aliases.update(renamed)
+                continue
+            if isinstance(op, FilterOperation) and leading:
+                origin = source(op.column)
+                if origin is not None:
+                    filters.append(FilterOperation(origin, op.op, op.value))
+            elif not isinstance(op, (FilterOperation, DropNaOperation)):
+                leading = False
+            if op.stateful or op.affects_rows or isinstance(op, OneHotOperation):
+                if op.read_columns is None:
+                    pin_all = True
+                else:
+                    pinned.update(source(col) for col in op.read_columns)
+            elif op.read_columns is not None and op.write_columns is not None:
+                # Colonnes lues pour calculer d'autres colonnes (ex: cible du target encoding)
+                pinned.update(source(col) for col in set(op.read_columns) - set(op.write_columns))
+            if isinstance(op, OneHotOperation):
+                aliases.update({col: None for col in op.columns})
+        return ReadPushdown(skip, filters)
+
+    def fit_transform(
+        self,
+        df: pd.DataFrame,
+        workers: int = 1,
+        metrics: Optional[PrepareMetrics] = None
+    ) -> Tuple[pd.DataFrame, List[Any]]:
+        """
+        Ajuster et appliquer le plan en mémoire, en renvoyant l'état de chaque opération
+
+        Args:
+            df: DataFrame à transformer
+            workers: Nombre de threads ; au-delà de 1, les suites d'opérations
+                colonne par colonne sont exécutées en parallèle par blocs de colonnes
+            metrics: Mesures de la préparation, complétées étape par étape
+
+        Returns:
+            Tuple (DataFrame transformé, état de chaque opération)
+        """
+        # Copie superficielle : les opérations remplacent des colonnes entières sans
+        # jamais écrire dans les buffers d'origine, inutile de copier les données
+        df = df.copy(deep=False)
+        states = []
+        position = 0
+        while position < len(self.operations):
+            end = position
+            while end < len(self.operations) and self.operations[end].column_local:
+                end += 1
+            if workers > 1 and end - position > 0 and df.shape[1] > 1:
+                # Suite exécutée par blocs : mesurée comme une seule étape
+                run = self.operations[position:end]
+                df, run_states = _measured(
+                    metrics, position, "+".join(op.kind for op in run), df,
+                    lambda: _fit_transform_blocks(run, df, workers)
+                )
+                states.extend(run_states)
+                position = end
+                continue
+            op = self.operations[position]
+            df, state = _measured(metrics, position, op.kind, df, lambda: _fit_transform_one(op, df))
+            states.append(state)
+            position += 1
+        return df, states
+
+    def execute(self, df: pd.DataFrame, metrics: Optional[PrepareMetrics] = None) -> pd.DataFrame:
+        return self.fit_transform(df, metrics=metrics)[0]
+
+
+def _fit_transform_one(op: Operation, df: pd.DataFrame) -> Tuple[pd.DataFrame, Any]:
+    state = op.fit(df)
+    return op.transform(df, state), state
+
+
+def _measured(metrics: Optional[PrepareMetrics], index: int, name: str, df: pd.DataFrame, run):
+    """Exécuter run, mesuré comme une étape si des mesures sont demandées"""
+    return run() if metrics is None else metrics.measure_step(index, name, df, run)
+
+
+def _fit_transform_blocks(operations: Tuple[Operation, ...], df: pd.DataFrame, workers: int) -> Tuple[pd.DataFrame, List[Any]]:
+    """
+    Suite d'opérations colonne par colonne exécutée en parallèle sur des blocs de colonnes
+
+    Les threads partagent la mémoire du processus : chaque bloc est une vue sur les
+    colonnes de df (copy-on-write), aucune donnée n'est copiée ni sérialisée. numpy et
+    pandas relâchent le GIL pendant la plupart des calculs. Les blocs sont contigus,
+    leur concaténation conserve donc l'ordre des colonnes, et les états sont fusionnés
+    pour être identiques à ceux d'une exécution séquentielle.
+    """
+    blocks = _column_blocks(df.shape[1], workers)
+
+    def run(positions: List[int]) -> Tuple[pd.DataFrame, List[Any]]:
+        block = df.iloc[:, positions]
+        block_states = []
+        for op in operations:
+            block, state = _fit_transform_one(op, block)
+            block_states.append(state)
+        return block, block_states
+
+    with ThreadPoolExecutor(max_workers=len(blocks)) as pool:
+        results = list(pool.map(run, blocks))
+
+    states = [
+        op.merge_block_states(df, [block_states[index] for _, block_states in results])
+        for index, op in enumerate(operations)
+    ]
+    out = pd.concat([block for block, _ in results], axis=1) if len(results) > 1 else results[0][0]
+    return out, states
+
+
+OPERATION_TYPES = {
+    cls.kind: cls for cls in (
+        FillNaOperation, PropagateFillOperation, DropNaOperation, OneHotOperation,
+        LabelEncodeOperation, ScaleOperation, ProjectionOperation, FilterOperation,
+        DowncastOperation, HashEncodeOperation, FrequencyEncodeOperation, TargetEncodeOperation,
+    )
+}
+
+
+class FittedPipeline:
+    """
+    Pipeline ajusté : opérations et statistiques apprises, sérialisables en JSON
+
+    Permet d'appliquer exactement les mêmes transformations à de nouvelles
+    données (inférence, évaluation) sans recalculer aucune statistique.
+    """
+
+    FORMAT = "microlearn-fitted-pipeline"
+    VERSION = 1
+
+    def __init__(
+        self,
+        operations: Tuple[Operation, ...],
+        states: List[Any],
+        input_columns: List[str],
+        output_columns: List[str],
+        pipeline: Optional[Dict[str, Any]] = None
+    ):
+        self.operations = operations
+        self.states = states
+        self.input_columns = input_columns
+        self.output_columns = output_columns
+        self.pipeline = pipeline
+
+    def transform(self, df: pd.DataFrame, drop_rows: bool = True) -> pd.DataFrame:
+        """
+        Appliquer le pipeline ajusté sans réajustement
+
+        Args:
+            df: Données à transformer
+            drop_rows: Si False, les filtres et suppressions de lignes sont ignorés
+                (inférence : une prédiction par ligne reçue)
+        """
+        df = df.copy(deep=False)
+        for op, state in zip(self.operations, self.states):
+            if op.affects_rows and not drop_rows:
+                continue
+            # backward_fill : l'état chunké ne concerne que le dataset d'origine
+            df = op.transform(df, None if isinstance(op, PropagateFillOperation) else state)
+        return df
+
+    def transform_stream(self, chunks: Iterable[pd.DataFrame], drop_rows: bool = True) -> Iterator[pd.DataFrame]:
+        """
+        Appliquer le pipeline ajusté chunk par chunk, sans réajustement
+
+        Les propagations (forward_fill) se poursuivent d'un chunk au suivant.
+
+        Args:
+            chunks: Chunks à transformer
+            drop_rows: Si False, les filtres et suppressions de lignes sont ignorés
+
+        Returns:
+            Itérateur sur les chunks transformés
+        """
+        stream: Iterable[pd.DataFrame] = (chunk.copy(deep=False) for chunk in chunks)
+        for op, state in zip(self.operations, self.states):
+            if op.affects_rows and not drop_rows:
+                continue
+            stream = op.transform_stream(stream, None if isinstance(op, PropagateFillOperation) else state)
+        return iter(stream)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "format": self.FORMAT,
+            "version": self.VERSION,
+            "pipeline": self.pipeline,
+            "input_columns": self.input_columns,
+            "output_columns": self.output_columns,
+            "steps": [
+                {"op": op.kind, "params": op.params, "state": None if isinstance(op, PropagateFillOperation) else state}
+                for op, state in zip(self.operations, self.states)
+            ],
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), separators=(",", ":"), default=_to_python)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FittedPipeline":
+        if data.get("format") != cls.FORMAT or data.get("version") != cls.VERSION:
+            raise PipelineValidationError("Format de pipeline ajusté non supporté")
+        operations, states = [], []
+        for step in data["steps"]:
+            if step["op"] not in OPERATION_TYPES:
+                raise PipelineValidationError(f"Opération inconnue '{step['op']}'")
+            operations.append(OPERATION_TYPES[step["op"]](**step["params"]))
+            states.append(step["state"])
+        return cls(tuple(operations), states, data["input_columns"], data["output_columns"], data.get("pipeline"))
+
+    @classmethod
+    def from_json(cls, payload: Union[str, bytes]) -> "FittedPipeline":
+        return cls.from_dict(json.loads(payload))
+
+
+def _columns_arg(step: Dict[str, Any], index: int) -> Optional[Tuple[str, ...]]:
+    columns = step.get("columns")
+    if columns is None:
+        return None
+    if not isinstance(columns, (list, tuple)):
+        raise PipelineValidationError(f"Étape {index}: 'columns' doit être une liste")
+    return tuple(columns)
+
+
+def _max_values_arg(step: Dict[str, Any], index: int) -> int:
+    max_values = step.get("max_values", ENCODING_MAX_VALUES)
+    if not isinstance(max_values, int) or isinstance(max_values, bool) or max_values < 1:
+        raise PipelineValidationError(f"Étape {index}: 'max_values' doit être un entier strictement positif")
+    return max_values
+
+
+def _compile_steps(steps: List[Any]) -> PipelinePlan:
+    operations: List[Operation] = []
+    ignored: List[str] = []
+
+    for index, step in enumerate(steps):
+        if not isinstance(step, dict):
+            raise PipelineValidationError(f"Étape {index}: un objet est attendu")
+        step_name = str(step.get("name", "")).lower()
+        previous = operations[-1] if operations else None
+
+        # Imputation des valeurs manquantes
+        if step_name == "imputation":
+            strategy = str(step.get("strategy", "mean")).lower()
+            if strategy not in IMPUTATION_STRATEGIES:
+                raise PipelineValidationError(f"Étape {index}: stratégie d'imputation inconnue '{strategy}'")
+            columns = _columns_arg(step, index)
+            if strategy in COLUMNWISE_STRATEGIES:
+                if isinstance(previous, FillNaOperation):
+                    operations[-1] = FillNaOperation(previous.specs + ((strategy, columns),))
+                else:
+                    operations.append(FillNaOperation(((strategy, columns),)))
             elif strategy == "drop":
-                df = df.dropna(subset=cols_to_impute)
-        
-        # One-hot encoding
+                operations.append(DropNaOperation(columns))
+            else:
+                operations.append(PropagateFillOperation(strategy, columns))
+
+        # One-hot encoding (dense, creux, ou creux au-delà d'un nombre de catégories)
         elif step_name == "one_hot_encoding":
-            columns = step.get("columns", [])
+            columns = _columns_arg(step, index)
+            sparse = step.get("sparse", False)
+            if sparse not in (True, False, "auto"):
+                raise PipelineValidationError(f"Étape {index}: 'sparse' doit valoir true, false ou \"auto\"")
             if columns:
-                cols_to_encode = [col for col in columns if col in df.columns]
-                df = pd.get_dummies(df, columns=cols_to_encode, prefix=cols_to_encode)
-        
+                operations.append(OneHotOperation(columns, sparse))
+
         # Label encoding
         elif step_name == "label_encoding":
-            columns = step.get("columns", [])
+            columns = _columns_arg(step, index)
             if columns:
-                le = LabelEncoder()
-                for col in columns:
-                    if col in df.columns and df[col].dtype == "object":
-                        df[col] = le.fit_transform(df[col].astype(str))
-        
+                if isinstance(previous, LabelEncodeOperation):
+                    merged = previous.columns + tuple(c for c in columns if c not in previous.columns)
+                    operations[-1] = LabelEncodeOperation(merged)
+                else:
+                    operations.append(LabelEncodeOperation(columns))
+
+        # Encodages à mémoire bornée des colonnes à forte cardinalité
+        elif step_name == "hash_encoding":
+            columns = _columns_arg(step, index)
+            n_buckets = step.get("n_buckets", HASH_ENCODING_BUCKETS)
+            if not isinstance(n_buckets, int) or isinstance(n_buckets, bool) or n_buckets < 1:
+                raise PipelineValidationError(f"Étape {index}: 'n_buckets' doit être un entier strictement positif")
+            if columns:
+                operations.append(HashEncodeOperation(columns, n_buckets))
+
+        elif step_name == "frequency_encoding":
+            columns = _columns_arg(step, index)
+            if columns:
+                operations.append(FrequencyEncodeOperation(columns, bool(step.get("normalize", True)), _max_values_arg(step, index)))
+
+        elif step_name == "target_encoding":
+            columns = _columns_arg(step, index)
+            target = step.get("target")
+            if not isinstance(target, str) or not target:
+                raise PipelineValidationError(f"Étape {index}: 'target' (colonne cible) est requis")
+            smoothing = step.get("smoothing", TARGET_ENCODING_SMOOTHING)
+            if not isinstance(smoothing, (int, float)) or isinstance(smoothing, bool) or smoothing < 0:
+                raise PipelineValidationError(f"Étape {index}: 'smoothing' doit être un nombre positif")
+            if columns:
+                if target in columns:
+                    raise PipelineValidationError(f"Étape {index}: la cible '{target}' ne peut pas être encodée")
+                operations.append(TargetEncodeOperation(columns, target, float(smoothing), _max_values_arg(step, index)))
+
         # Scaling/Normalisation
         elif step_name == "scaling":
-            method = step.get("method", "standard").lower()
-            columns = step.get("columns")
-            
-            if columns:
-                numeric_cols = [col for col in columns if col in df.columns]
+            method = str(step.get("method", "standard")).lower()
+            operations.append(ScaleOperation(method, _columns_arg(step, index)))
+
+        # Suppression et renommage de colonnes
+        elif step_name in ("drop_columns", "rename_columns"):
+            if step_name == "drop_columns":
+                action = ("drop", _columns_arg(step, index) or ())
             else:
-                numeric_cols = df.select_dtypes(include=["float64", "int64"]).columns.tolist()
-            
-            if numeric_cols:
-                if method == "standard":
-                    scaler = StandardScaler()
-                elif method == "minmax":
-                    scaler = MinMaxScaler()
-                else:
-                    scaler = StandardScaler()
-                
-                df[numeric_cols] = scaler.fit_transform(df[numeric_cols])
-        
-        # Suppression de colonnes
-        elif step_name == "drop_columns":
-            columns = step.get("columns", [])
-            cols_to_drop = [col for col in columns if col in df.columns]
-            df = df.drop(columns=cols_to_drop)
-        
-        # Renommage de colonnes
-        elif step_name == "rename_columns":
-            mapping = step.get("mapping", {})
-            df = df.rename(columns=mapping)
-        
+                mapping = step.get("mapping", {})
+                if not isinstance(mapping, dict):
+                    raise PipelineValidationError(f"Étape {index}: 'mapping' doit être un objet")
+                action = ("rename", tuple(mapping.items()))
+            if isinstance(previous, ProjectionOperation):
+                operations[-1] = ProjectionOperation(previous.actions + (action,))
+            else:
+                operations.append(ProjectionOperation((action,)))
+
         # Filtrage des lignes
         elif step_name == "filter_rows":
             condition = step.get("condition")
             if condition:
                 # Condition simple: {"column": "age", "operator": ">", "value": 18}
+                if not isinstance(condition, dict):
+                    raise PipelineValidationError(f"Étape {index}: 'condition' doit être un objet")
                 column = condition.get("column")
-                operator = condition.get("operator")
-                value = condition.get("value")
-                
-                if column and column in df.columns:
-                    if operator == ">":
-                        df = df[df[column] > value]
-                    elif operator == ">=":
-                        df = df[df[column] >= value]
-                    elif operator == "<":
-                        df = df[df[column] < value]
-                    elif operator == "<=":
-                        df = df[df[column] <= value]
-                    elif operator == "==":
-                        df = df[df[column] == value]
-                    elif operator == "!=":
-                        df = df[df[column] != value]
-    
-    return df
+                op = condition.get("operator")
+                if op not in FILTER_OPERATORS:
+                    raise PipelineValidationError(f"Étape {index}: opérateur de filtrage inconnu '{op}'")
+                if column:
+                    operations.append(FilterOperation(column, op, condition.get("value")))
+
+        # Réduction de la largeur des types
+        elif step_name == "downcast":
+            max_categories = step.get("max_categories", DOWNCAST_MAX_CATEGORIES)
+            if not isinstance(max_categories, int) or max_categories < 0:
+                raise PipelineValidationError(f"Étape {index}: 'max_categories' doit être un entier positif")
+            ratio = step.get("max_category_ratio", DOWNCAST_MAX_CATEGORY_RATIO)
+            if not isinstance(ratio, (int, float)) or not 0 < ratio <= 1:
+                raise PipelineValidationError(f"Étape {index}: 'max_category_ratio' doit être compris entre 0 et 1")
+            precision = str(step.get("float_precision", "exact")).lower()
+            if precision not in FLOAT_PRECISIONS:
+                raise PipelineValidationError(f"Étape {index}: précision flottante inconnue '{precision}'")
+            operations.append(DowncastOperation(_columns_arg(step, index), max_categories, float(ratio), precision))
+
+        else:
+            ignored.append(step_name)
+
+    return PipelinePlan(tuple(operations), tuple(ignored))
+
+
+@lru_cache(maxsize=PIPELINE_CACHE_SIZE)
+def _compile_cached(pipeline_key: str) -> PipelinePlan:
+    pipeline = json.loads(pipeline_key)
+    steps = pipeline.get("steps", []) if isinstance(pipeline, dict) else None
+    if not isinstance(steps, list):
+        raise PipelineValidationError("Le pipeline doit contenir une liste 'steps'")
+    return _compile_steps(steps)
+
+
+def compile_pipeline(pipeline: Dict[str, Any]) -> PipelinePlan:
+    """
+    Valider un pipeline et le compiler en plan d'exécution
+
+    Les plans sont mis en cache par JSON canonique : un même pipeline n'est
+    validé et compilé qu'une seule fois.
+
+    Args:
+        pipeline: Dictionnaire contenant les étapes de transformation
+
+    Returns:
+        Plan d'exécution compilé
+    """
+    try:
+        pipeline_key = json.dumps(pipeline, sort_keys=True)
+    except TypeError as e:
+        raise PipelineValidationError(f"Pipeline non sérialisable: {e}")
+    return _compile_cached(pipeline_key)
+
+
+def with_downcast(plan: PipelinePlan) -> PipelinePlan:
+    """Plan complété par une réduction automatique des types de toutes les colonnes (passe finale)"""
+    if plan.operations and isinstance(plan.operations[-1], DowncastOperation):
+        return plan
+    return PipelinePlan(plan.operations + (DowncastOperation(),), plan.ignored_steps)
+
+
+def fit_pipeline(
+    df: pd.DataFrame,
+    pipeline: Union[Dict[str, Any], PipelinePlan],
+    workers: int = PIPELINE_WORKERS,
+    metrics: Optional[PrepareMetrics] = None
+) -> Tuple[pd.DataFrame, FittedPipeline]:
+    """
+    Appliquer un pipeline en conservant les statistiques ajustées
+
+    Args:
+        df: DataFrame pandas à transformer
+        pipeline: Dictionnaire contenant les étapes de transformation, ou plan déjà compilé
+        workers: Nombre de threads pour l'exécution par blocs de colonnes (1 = séquentiel)
+        metrics: Mesures complétées avec la durée, les dimensions et le pic mémoire de chaque étape
+
+    Returns:
+        Tuple (DataFrame transformé, pipeline ajusté réutilisable avec transform)
+    """
+    plan = pipeline if isinstance(pipeline, PipelinePlan) else compile_pipeline(pipeline)
+    df_out, states = plan.fit_transform(df, workers, metrics)
+    fitted = FittedPipeline(
+        plan.operations, states, list(df.columns), list(df_out.columns),
+        None if isinstance(pipeline, PipelinePlan) else pipeline
+    )
+    return df_out, fitted
+
+
+def transform(df: pd.DataFrame, fitted: FittedPipeline, drop_rows: bool = True) -> pd.DataFrame:
+    """
+    Appliquer un pipeline ajusté à de nouvelles données, sans recalculer de statistiques
+
+    Args:
+        df: DataFrame pandas à transformer
+        fitted: Pipeline ajusté (fit_pipeline ou FittedPipeline.from_json)
+        drop_rows: Si False, les filtres et suppressions de lignes sont ignorés
+
+    Returns:
+        DataFrame transformé
+    """
+    return fitted.transform(df, drop_rows=drop_rows)
+
+
+def apply_pipeline(
+    df: pd.DataFrame,
+    pipeline: Union[Dict[str, Any], PipelinePlan],
+    metrics: Optional[PrepareMetrics] = None
+) -> pd.DataFrame:
+    """
+    Appliquer un pipeline de transformations sur un DataFrame
+
+    Args:
+        df: DataFrame pandas à transformer
+        pipeline: Dictionnaire contenant les étapes de transformation, ou plan déjà compilé
+        metrics: Mesures complétées avec la durée, les dimensions et le pic mémoire de chaque étape
+
+    Returns:
+        DataFrame transformé
+    """
+    plan = pipeline if isinstance(pipeline, PipelinePlan) else compile_pipeline(pipeline)
+    return plan.execute(df, metrics)
@@ -0,0 +1,176 @@
+"""
+Cache adressé par contenu des datasets préparés
+
+Une préparation est identifiée par l'ETag de l'objet source, la représentation
+canonique du plan compilé et le format de sortie. Le dataset nettoyé, le pipeline
+ajusté et la table PostgreSQL d'une préparation déjà effectuée sont réutilisés
+tant qu'ils existent ; le ramasse-miettes supprime les sorties qui ne sont plus
+référencées (entrées supplantées, source modifiée, expirées, surnuméraires).
+
+Les noms de la table et du dataset nettoyé contiennent la clé : une nouvelle
+préparation sous un dataset_id déjà utilisé n'écrase pas les sorties d'une
+autre clé, elle remplace l'entrée de ce dataset_id et libère ses sorties.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from app.core.pipeline import PipelinePlan
+from app.core.database import (
+    find_prepared_dataset, list_prepared_datasets, table_exists, touch_dataset, delete_dataset, count_path_references
+)
+from app.core.minio_client import object_exists, delete_object, stat_minio_object
+
+# Réutiliser les préparations identiques ("false" pour toujours recalculer)
+PREPARE_CACHE_ENABLED = os.getenv("PREPARE_CACHE_ENABLED", "true").lower() == "true"
+# Durée de conservation (jours) depuis la dernière utilisation ; 0 : pas d'expiration
+PREPARE_CACHE_TTL_DAYS = float(os.getenv("PREPARE_CACHE_TTL_DAYS", "0"))
+# Nombre maximal de préparations conservées (les moins récemment utilisées sont supprimées) ; 0 : illimité
+PREPARE_CACHE_MAX_ENTRIES = int(os.getenv("PREPARE_CACHE_MAX_ENTRIES", "0"))
+# Supprimer les préparations dont l'objet source a changé ou a disparu
+PREPARE_CACHE_GC_STALE = os.getenv("PREPARE_CACHE_GC_STALE", "true").lower() == "true"
+
+
+def now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def cache_key(source_etag: str, plan: PipelinePlan, output_format: str) -> str:
+    """Clé de cache d'une préparation"""
+    payload = json.dumps({"etag": source_etag, "plan": plan.canonical_json(), "format": output_format}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def lookup(key: str, dataset_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Chercher une préparation réutilisable
+
+    L'entrée n'est renvoyée que si sa table et son dataset nettoyé existent encore ;
+    sa date de dernière utilisation est alors mise à jour.
+
+    Args:
+        key: Clé de cache
+        dataset_id: Identifiant imposé par l'appelant (seule une entrée de même identifiant convient)
+
+    Returns:
+        Entrée de dataset_metadata, ou None
+    """
+    record = find_prepared_dataset(key, dataset_id)
+    if record is None:
+        return None
+    if not table_exists(record["table_name"]) or not object_exists(record["cleaned_path"]):
+        return None
+    touch_dataset(record["dataset_id"], now())
+    return record
+
+
+def release(records: List[Dict[str, Any]]) -> List[str]:
+    """
+    Libérer les sorties d'entrées retirées de dataset_metadata (remplacées par une
+    préparation de même dataset_id) : table et objets MinIO qui ne sont plus
+    référencés par aucune entrée
+
+    Returns:
+        Objets MinIO supprimés
+    """
+    deleted = []
+    for record in records:
+        delete_dataset(record["dataset_id"], record.get("table_name"), record.get("created_at"))
+        for path in (record.get("cleaned_path"), record.get("fitted_pipeline_path")):
+            if path and path not in deleted and count_path_references(path) == 0:
+                delete_object(path)
+                deleted.append(path)
+    return deleted
+
+
+def _entry(record: Dict[str, Any]) -> tuple:
+    """Identité d'une entrée de dataset_metadata"""
+    return record["dataset_id"], record.get("created_at")
+
+
+def _source_etags(records: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+    etags = {}
+    for path in {record["original_path"] for record in records}:
+        try:
+            etags[path] = stat_minio_object(path).etag
+        except Exception:
+            # Source supprimée (ou illisible) : ses préparations ne sont plus référencées
+            etags[path] = None
+    return etags
+
+
+def _eviction_reasons(records: List[Dict[str, Any]]) -> Dict[tuple, str]:
+    """Entrées à supprimer (par identité _entry), avec la raison de chaque suppression"""
+    reasons: Dict[tuple, str] = {}
+    by_recency = sorted(records, key=lambda r: r.get("last_used_at") or r.get("created_at") or "", reverse=True)
+
+    # Entrées supplantées par une préparation plus récente de même clé ou de même dataset_id
+    latest_keys, latest_ids = set(), set()
+    for record in sorted(records, key=lambda r: r.get("created_at") or "", reverse=True):
+        if record["cache_key"] in latest_keys or record["dataset_id"] in latest_ids:
+            reasons[_entry(record)] = "superseded"
+        latest_keys.add(record["cache_key"])
+        latest_ids.add(record["dataset_id"])
+
+    if PREPARE_CACHE_GC_STALE:
+        etags = _source_etags(records)
+        for record in records:
+            if etags[record["original_path"]] != record["source_etag"]:
+                reasons.setdefault(_entry(record), "stale_source")
+
+    if PREPARE_CACHE_TTL_DAYS > 0:
+        limit = (datetime.now(timezone.utc) - timedelta(days=PREPARE_CACHE_TTL_DAYS)).isoformat()
+        for record in records:
+            if (record.get("last_used_at") or record.get("created_at") or "") < limit:
+                reasons.setdefault(_entry(record), "expired")
+
+    if PREPARE_CACHE_MAX_ENTRIES > 0:
+        kept = [record for record in by_recency if _entry(record) not in reasons]
+        for record in kept[PREPARE_CACHE_MAX_ENTRIES:]:
+            reasons[_entry(record)] = "capacity"
+    return reasons
+
+
+def collect_garbage(dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Supprimer les préparations qui ne sont plus référencées
+
+    Pour chaque entrée évincée : son entrée de dataset_metadata, sa table si
+    aucune entrée conservée ne la partage et, s'ils ne sont plus référencés par
+    une entrée conservée, dataset nettoyé et pipeline ajusté dans MinIO.
+
+    Args:
+        dry_run: Si True, renvoie les entrées qui seraient supprimées sans rien supprimer
+
+    Returns:
+        Entrées évincées (identifiant, raison) et objets MinIO supprimés
+    """
+    records = list_prepared_datasets()
+    reasons = _eviction_reasons(records)
+    evicted = [record for record in records if _entry(record) in reasons]
+    kept_paths = {
+        path
+        for record in records if _entry(record) not in reasons
+        for path in (record["cleaned_path"], record["fitted_pipeline_path"])
+    }
+    orphan_paths = sorted({
+        path
+        for record in evicted
+        for path in (record["cleaned_path"], record["fitted_pipeline_path"])
+        if path and path not in kept_paths
+    })
+
+    if not dry_run:
+        for record in evicted:
+            delete_dataset(record["dataset_id"], record["table_name"], record["created_at"])
+        for path in orphan_paths:
+            delete_object(path)
+
+    return {
+        "dry_run": dry_run,
+        "evicted": [{"dataset_id": record["dataset_id"], "reason": reasons[_entry(record)]} for record in evicted],
+        "deleted_objects": orphan_paths,
+        "kept": len(records) - len(evicted)
+    }
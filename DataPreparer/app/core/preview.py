@@ -0,0 +1,122 @@
+"""
+Échantillon borné d'un fichier source pour l'aperçu d'un pipeline
+
+Seuls quelques blocs d'octets sont lus par requêtes de plage, quelle que soit la
+taille du fichier : le début du fichier ("head"), ou un bloc tiré au hasard dans
+chaque tranche du fichier ("reservoir" : échantillonnage uniforme parmi les
+lignes complètes de ces blocs). Rien n'est téléchargé en entier ni écrit.
+"""
+import io
+import os
+import random
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+
+# Octets lus au plus pour un aperçu (répartis entre les blocs en mode "reservoir")
+PREVIEW_MAX_BYTES = int(os.getenv("PREVIEW_MAX_BYTES", str(1024 * 1024)))
+# Nombre de blocs lus en mode "reservoir"
+PREVIEW_BLOCKS = int(os.getenv("PREVIEW_BLOCKS", "8"))
+# Nombre maximal de lignes d'un aperçu
+PREVIEW_MAX_ROWS = int(os.getenv("PREVIEW_MAX_ROWS", "10000"))
+
+SAMPLING_METHODS = {"head", "reservoir"}
+
+
+def _read_range(open_source: Callable, offset: int, length: int) -> bytes:
+    with open_source(offset, length) as f:
+        return f.read(length)
+
+
+def _complete_lines(block: bytes, at_start: bool, at_end: bool) -> List[bytes]:
+    """Lignes entières d'un bloc (la première et la dernière peuvent être coupées)"""
+    if not at_start:
+        cut = block.find(b"\n")
+        block = b"" if cut < 0 else block[cut + 1:]
+    if not at_end:
+        cut = block.rfind(b"\n")
+        block = b"" if cut < 0 else block[:cut + 1]
+    return block.splitlines(keepends=True)
+
+
+def _block_offsets(size: int, block_size: int, seed: int) -> List[int]:
+    """Un bloc par tranche du fichier, à une position aléatoire dans la tranche (sans chevauchement)"""
+    rng = random.Random(seed)
+    stratum = size // PREVIEW_BLOCKS
+    return [
+        index * stratum + rng.randint(0, max(stratum - block_size, 0))
+        for index in range(PREVIEW_BLOCKS)
+    ]
+
+
+def _header_line(open_source: Callable, size: int) -> bytes:
+    lines = _read_range(open_source, 0, min(size, 64 * 1024)).splitlines(keepends=True)
+    return lines[0] if lines else b""
+
+
+def _sample_lines(open_source: Callable, size: int, rows: int, seed: int) -> Tuple[bytes, List[bytes]]:
+    if size <= PREVIEW_MAX_BYTES:
+        blocks = [(0, size)]
+    else:
+        block_size = PREVIEW_MAX_BYTES // PREVIEW_BLOCKS
+        blocks = [(offset, min(block_size, size - offset)) for offset in _block_offsets(size, block_size, seed)]
+    header, lines = b"", []
+    for offset, length in blocks:
+        block_lines = _complete_lines(_read_range(open_source, offset, length), offset == 0, offset + length >= size)
+        if offset == 0 and block_lines:
+            header, block_lines = block_lines[0], block_lines[1:]
+        lines += block_lines
+    if not header:
+        # Aucun bloc tiré au début du fichier : en-tête lu à part
+        header = _header_line(open_source, size)
+    # Lignes tirées uniformément, puis remises dans l'ordre du fichier
+    chosen = sorted(random.Random(seed).sample(range(len(lines)), min(rows, len(lines))))
+    return header, [lines[index] for index in chosen]
+
+
+def read_sample(open_source: Callable, size: int, ext: str, encoding: str, rows: int, method: str = "head", seed: int = 0) -> pd.DataFrame:
+    """
+    Lire un échantillon borné d'un fichier source
+
+    Args:
+        open_source: Fonction ouvrant un flux binaire à partir de (position, nombre d'octets)
+        size: Taille du fichier en octets
+        ext: Extension du fichier (.csv ou .json)
+        encoding: Encodage du fichier
+        rows: Nombre de lignes de l'échantillon
+        method: "head" (premières lignes) ou "reservoir" (lignes tirées au hasard)
+        seed: Graine du tirage (même échantillon d'un aperçu à l'autre)
+
+    Returns:
+        DataFrame de rows lignes au plus
+    """
+    if ext == ".json":
+        # Un tableau JSON ne se lit pas par morceaux : seuls les petits fichiers sont prévisualisables
+        if size > PREVIEW_MAX_BYTES:
+            raise ValueError(f"Aperçu JSON limité aux fichiers de moins de {PREVIEW_MAX_BYTES} octets")
+        df = pd.read_json(io.BytesIO(_read_range(open_source, 0, size)), encoding=encoding)
+        return df.sample(n=min(rows, len(df)), random_state=seed).sort_index() if method == "reservoir" else df.head(rows)
+
+    if method == "head":
+        length = min(size, PREVIEW_MAX_BYTES)
+        data = b"".join(_complete_lines(_read_range(open_source, 0, length), True, length >= size))
+        return pd.read_csv(io.BytesIO(data), encoding=encoding, nrows=rows)
+    header, lines = _sample_lines(open_source, size, rows, seed)
+    return pd.read_csv(io.BytesIO(header + b"".join(lines)), encoding=encoding)
+
+
+def schema_diff(before: Dict[str, str], after: Dict[str, str]) -> Dict[str, object]:
+    """
+    Différences de schéma entre l'entrée et la sortie d'un pipeline
+
+    Returns:
+        Colonnes ajoutées, supprimées et dont le dtype a changé
+    """
+    return {
+        "added": [col for col in after if col not in before],
+        "removed": [col for col in before if col not in after],
+        "changed": {
+            col: {"before": before[col], "after": after[col]}
+            for col in before if col in after and before[col] != after[col]
+        },
+    }
@@ -0,0 +1,185 @@
+"""
+Profil des colonnes d'un dataset nettoyé
+
+Le profil est accumulé chunk par chunk pendant la passe qui écrit les données
+(aucune relecture) : dtype, valeurs manquantes, nombre approximatif de valeurs
+distinctes (HyperLogLog), min/max/moyenne des colonnes numériques et longueur
+moyenne des chaînes. Il permet aux services en aval de décider sans relire le dataset.
+"""
+import math
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Optional
+
+# Précision HyperLogLog : 2^12 registres (erreur relative ~1,6 %)
+HLL_PRECISION = 12
+
+
+class HyperLogLog:
+    """Estimateur du nombre de valeurs distinctes, en mémoire constante"""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values: np.ndarray) -> None:
+        if len(values) == 0:
+            return
+        hashes = pd.util.hash_array(values)
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype(np.int64)
+        rest = hashes & np.uint64((1 << width) - 1)
+        # Rang du premier bit à 1 dans les bits restants (width + 1 si tous nuls)
+        rank = np.full(len(rest), width + 1, dtype=np.int64)
+        nonzero = rest > 0
+        rank[nonzero] = width - np.floor(np.log2(rest[nonzero].astype(np.float64))).astype(np.int64)
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Petites cardinalités : comptage linéaire
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+
+class _ColumnStats:
+    def __init__(self, dtype):
+        self.dtype = str(dtype)
+        self.kind = _kind(dtype)
+        self.count = 0
+        self.nulls = 0
+        self.distinct = HyperLogLog()
+        self.minimum = None
+        self.maximum = None
+        self.total = 0.0
+        self.length_total = 0
+
+    def update(self, series: pd.Series) -> None:
+        valid = series.dropna()
+        self.count += len(valid)
+        self.nulls += len(series) - len(valid)
+        if valid.empty:
+            return
+        self.distinct.update(valid.to_numpy())
+        if self.kind in ("numeric", "datetime"):
+            low, high = valid.min(), valid.max()
+            self.minimum = low if self.minimum is None else min(self.minimum, low)
+            self.maximum = high if self.maximum is None else max(self.maximum, high)
+        if self.kind == "numeric":
+            self.total += float(valid.sum())
+        elif self.kind == "text":
+            self.length_total += int(valid.astype(str).str.len().sum())
+
+    def finalize(self) -> Dict[str, Any]:
+        profile = {
+            "dtype": self.dtype,
+            "count": self.count,
+            "null_count": self.nulls,
+            "distinct_count": min(self.distinct.estimate(), self.count),
+        }
+        if self.kind == "numeric":
+            profile["min"] = _to_python(self.minimum)
+            profile["max"] = _to_python(self.maximum)
+            profile["mean"] = self.total / self.count if self.count else None
+        elif self.kind == "datetime":
+            profile["min"] = None if self.minimum is None else pd.Timestamp(self.minimum).isoformat()
+            profile["max"] = None if self.maximum is None else pd.Timestamp(self.maximum).isoformat()
+        elif self.kind == "text":
+            profile["mean_length"] = self.length_total / self.count if self.count else None
+        return profile
+
+
+def _kind(dtype) -> str:
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype):
+        return "numeric"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "datetime"
+    if dtype == "object" or pd.api.types.is_string_dtype(dtype):
+        return "text"
+    return "other"
+
+
+def _to_python(value: Any) -> Optional[Any]:
+    if value is None:
+        return None
+    if isinstance(value, (np.bool_, bool)):
+        return bool(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    return float(value)
+
+
+class DatasetProfiler:
+    """Accumulateur du profil des colonnes, alimenté chunk par chunk"""
+
+    def __init__(self):
+        self.rows = 0
+        self.columns: Dict[str, _ColumnStats] = {}
+
+    def update(self, df: pd.DataFrame) -> None:
+        self.rows += len(df)
+        for col in df.columns:
+            key = str(col)
+            if key not in self.columns:
+                self.columns[key] = _ColumnStats(df[col].dtype)
+            self.columns[key].update(df[col])
+
+    def finalize(self) -> Dict[str, Any]:
+        """
+        Profil du dataset
+
+        Returns:
+            Nombre de lignes et, par colonne : dtype, count, null_count,
+            distinct_count (approximatif), min/max/mean (numériques), min/max
+            (dates), mean_length (textes)
+        """
+        return {"rows": self.rows, "columns": {col: stats.finalize() for col, stats in self.columns.items()}}
+
+
+def _weighted_mean(a: Optional[float], a_count: int, b: Optional[float], b_count: int) -> Optional[float]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (a * a_count + b * b_count) / (a_count + b_count) if a_count + b_count else None
+
+
+def _merge_column(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(previous)
+    merged["count"] = previous["count"] + current["count"]
+    merged["null_count"] = previous["null_count"] + current["null_count"]
+    # Registres HyperLogLog non conservés : borne basse (le plus grand des deux)
+    merged["distinct_count"] = max(previous["distinct_count"], current["distinct_count"])
+    for key, pick in (("min", min), ("max", max)):
+        if key in previous or key in current:
+            values = [profile[key] for profile in (previous, current) if profile.get(key) is not None]
+            merged[key] = pick(values) if values else None
+    for key in ("mean", "mean_length"):
+        if key in previous or key in current:
+            merged[key] = _weighted_mean(previous.get(key), previous["count"], current.get(key), current["count"])
+    return merged
+
+
+def merge_profiles(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Profil d'un dataset auquel des lignes ont été ajoutées
+
+    Les comptes, min/max et moyennes sont combinés exactement ; le nombre de
+    valeurs distinctes est le plus grand des deux (les registres HyperLogLog ne
+    sont pas conservés dans le profil).
+
+    Args:
+        previous: Profil du dataset existant
+        current: Profil des lignes ajoutées
+
+    Returns:
+        Profil de l'ensemble
+    """
+    columns = dict(previous.get("columns", {}))
+    for col, stats in current.get("columns", {}).items():
+        columns[col] = _merge_column(columns[col], stats) if col in columns else stats
+    return {"rows": previous.get("rows", 0) + current.get("rows", 0), "columns": columns}
@@ -0,0 +1,240 @@
+"""
+Réception en flux d'un fichier envoyé en multipart/form-data
+
+Le corps de la requête est analysé au fil de l'eau (python-multipart) : les
+octets du fichier sont hachés et examinés (lignes, colonnes), puis transmis par
+une file bornée au thread qui alimente l'upload multipart vers MinIO. Ni le
+fichier ni le corps de la requête ne sont jamais entiers en mémoire ou sur disque,
+et aucun appel bloquant n'est exécuté sur la boucle d'événements.
+"""
+import asyncio
+import csv
+import hashlib
+import io
+import os
+import queue
+from typing import Any, Dict, List, Optional
+
+from starlette.requests import Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from app.core.minio_client import upload_raw_stream_to_minio
+
+# Nombre de blocs en attente entre la réception et l'upload (contre-pression)
+UPLOAD_QUEUE_BLOCKS = int(os.getenv("UPLOAD_QUEUE_BLOCKS", "16"))
+# Octets conservés au début du fichier pour lire l'en-tête CSV
+SNIFF_HEADER_MAX_BYTES = 64 * 1024
+
+# Marqueurs de la file de blocs : fin du fichier, abandon de la réception
+END_OF_FILE = object()
+ABORTED = object()
+
+
+class UploadError(ValueError):
+    """Requête d'upload invalide (pas de multipart, champ fichier absent...)"""
+
+
+class UploadSniffer:
+    """Empreinte SHA-256, taille et forme (lignes/colonnes CSV) calculées au fil des octets"""
+
+    def __init__(self, filename: str):
+        self.ext = os.path.splitext(filename)[1].lower()
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.newlines = 0
+        self.head = b""
+        self.last_byte = b""
+
+    def update(self, data: bytes) -> None:
+        self.sha256.update(data)
+        self.size += len(data)
+        self.newlines += data.count(b"\n")
+        if len(self.head) < SNIFF_HEADER_MAX_BYTES and b"\n" not in self.head:
+            self.head += data[:SNIFF_HEADER_MAX_BYTES - len(self.head)]
+        if data:
+            self.last_byte = data[-1:]
+
+    def _csv_shape(self):
+        lines = self.newlines + (0 if self.last_byte == b"\n" else 1)
+        header = self.head.split(b"\n", 1)[0].rstrip(b"\r").decode("utf-8", errors="replace").lstrip("\ufeff")
+        # Même séparateur que la lecture pandas de /prepare ; les retours à la ligne
+        # entre guillemets sont comptés comme des lignes (estimation)
+        return max(lines - 1, 0), next(csv.reader([header]))
+
+    def summary(self) -> Dict[str, Any]:
+        rows, columns = None, None
+        if self.ext == ".csv" and self.size:
+            rows, columns = self._csv_shape()
+        return {
+            "size": self.size,
+            "sha256": self.sha256.hexdigest(),
+            "rows": rows,
+            "columns": columns
+        }
+
+
+class BlockQueueStream(io.RawIOBase):
+    """
+    Flux en lecture alimenté par une file bornée de blocs
+
+    put() est appelé par le producteur (réception HTTP) et bloque tant que la
+    file est pleine ; readinto() est appelé par l'upload MinIO dans son thread.
+    """
+
+    def __init__(self, maxsize: int = UPLOAD_QUEUE_BLOCKS):
+        self.blocks: "queue.Queue[Any]" = queue.Queue(maxsize)
+        self.pending = b""
+        self.failed = False
+
+    def readable(self) -> bool:
+        return True
+
+    def put(self, block: Any) -> None:
+        """Ajouter un bloc d'octets ou END_OF_FILE"""
+        while not self.failed:
+            try:
+                self.blocks.put(block, timeout=1)
+                return
+            except queue.Full:
+                continue
+        raise IOError("Upload MinIO interrompu")
+
+    def abort(self) -> None:
+        """Signaler l'abandon au lecteur sans jamais bloquer l'appelant"""
+        while True:
+            try:
+                self.blocks.get_nowait()
+            except queue.Empty:
+                break
+        self.blocks.put_nowait(ABORTED)
+
+    def readinto(self, buffer) -> int:
+        while not self.pending:
+            block = self.blocks.get()
+            if block is ABORTED:
+                raise IOError("Réception du fichier interrompue")
+            if block is END_OF_FILE:
+                return 0
+            self.pending = block
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+
+class _FilePartCollector:
+    """Callbacks python-multipart : ne retient que les données du champ fichier attendu"""
+
+    def __init__(self, field: str):
+        self.field = field.encode()
+        self.headers: Dict[bytes, bytes] = {}
+        self.header_field = b""
+        self.header_value = b""
+        self.active = False
+        self.done = False
+        self.filename: Optional[str] = None
+        self.pending: List[bytes] = []
+
+    def callbacks(self) -> Dict[str, Any]:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": lambda data, start, end: self._append("header_field", data[start:end]),
+            "on_header_value": lambda data, start, end: self._append("header_value", data[start:end]),
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def _append(self, name: str, data: bytes) -> None:
+        setattr(self, name, getattr(self, name) + bytes(data))
+
+    def on_part_begin(self) -> None:
+        self.headers = {}
+
+    def on_header_end(self) -> None:
+        self.headers[self.header_field.lower()] = self.header_value
+        self.header_field, self.header_value = b"", b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+        self.active = not self.done and options.get(b"name") == self.field and bool(filename)
+        if self.active:
+            self.filename = os.path.basename(filename.decode("utf-8", errors="replace").replace("\\", "/"))
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self.active and end > start:
+            self.pending.append(bytes(data[start:end]))
+
+    def on_part_end(self) -> None:
+        if self.active:
+            self.active = False
+            self.done = True
+
+    def drain(self) -> List[bytes]:
+        blocks, self.pending = self.pending, []
+        return blocks
+
+
+async def stream_upload(request: Request, field: str = "file") -> Dict[str, Any]:
+    """
+    Recevoir le fichier d'une requête multipart et l'envoyer en flux vers MinIO
+
+    Args:
+        request: Requête Starlette dont le corps n'a pas encore été lu
+        field: Nom du champ de formulaire contenant le fichier
+
+    Returns:
+        Chemin MinIO, nom du fichier, taille, empreinte SHA-256, lignes et colonnes
+        (CSV uniquement, None sinon)
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise UploadError("Requête multipart/form-data attendue")
+
+    collector = _FilePartCollector(field)
+    parser = MultipartParser(options[b"boundary"], collector.callbacks())
+    stream = BlockQueueStream()
+    loop = asyncio.get_running_loop()
+    upload = None
+    sniffer = None
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if collector.filename and upload is None:
+                sniffer = UploadSniffer(collector.filename)
+                upload = loop.run_in_executor(None, _upload, stream, collector.filename)
+            for block in collector.drain():
+                sniffer.update(block)
+                await asyncio.to_thread(stream.put, block)
+        parser.finalize()
+        if upload is None or not collector.done:
+            raise UploadError(f"Champ fichier '{field}' absent ou incomplet")
+        await asyncio.to_thread(stream.put, END_OF_FILE)
+        minio_path = await upload
+    except BaseException as error:
+        if upload is not None:
+            if not upload.done():
+                # Débloquer le thread d'upload : MinIO annule l'upload multipart
+                stream.abort()
+            outcome = (await asyncio.gather(upload, return_exceptions=True))[0]
+            if stream.failed and isinstance(outcome, Exception):
+                # L'échec vient de MinIO : remonter sa cause plutôt que l'arrêt de la file
+                raise outcome from error
+        raise
+
+    return {"minio_path": minio_path, "filename": collector.filename, **sniffer.summary()}
+
+
+def _upload(stream: BlockQueueStream, filename: str) -> str:
+    try:
+        return upload_raw_stream_to_minio(stream, filename)
+    except BaseException:
+        stream.failed = True
+        raise
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.prepare import router as prepare_router
+from app.core.jobs import shutdown_pool
 
 app = FastAPI(title="DataPreparer Service", version="1.0.0")
 
@@ -15,6 +16,11 @@ app.add_middleware(
 
 app.include_router(prepare_router, prefix="/api/v1", tags=["prepare"])
 
+@app.on_event("shutdown")
+def shutdown():
+    # Arrêter les processus de préparation en tâche de fond
+    shutdown_pool()
+
 @app.get("/")
 def root():
     return {"service": "DataPreparer", "status": "running"}
@@ -0,0 +1,341 @@
+"""
+Benchmark hors ligne du pipeline de DataPreparer (app/core/pipeline.py)
+
+Génère des datasets tabulaires synthétiques (lignes, colonnes, taux de valeurs
+manquantes et cardinalités configurables), exécute chaque étape isolément puis des
+pipelines complets, en mémoire et chunk par chunk, et mesure le débit (lignes/s,
+Mo/s) et le pic mémoire. Aucun service (MinIO, PostgreSQL) n'est nécessaire.
+
+Les résultats sont écrits en JSON ; avec --baseline, ils sont comparés à un
+résultat précédent et le script échoue (code 1) au-delà du seuil de régression.
+
+Exemples (depuis le dossier DataPreparer) :
+    python benchmark_pipeline.py --rows 1000000 --output bench.json
+    python benchmark_pipeline.py --rows 1000000 --baseline bench.json --max-regression 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core.chunked import fit_chunked, transform_chunked
+from app.core.pipeline import compile_pipeline, fit_pipeline
+
+BENCHMARK_FORMAT = "microlearn-pipeline-benchmark"
+BENCHMARK_VERSION = 1
+
+TARGET_COLUMN = "target"
+
+
+# ===== Données synthétiques =====
+
+def generate_dataset(
+    rows: int,
+    numeric_columns: int = 8,
+    categorical_columns: int = 4,
+    null_rate: float = 0.05,
+    cardinalities: Optional[List[int]] = None,
+    seed: int = 0
+) -> pd.DataFrame:
+    """
+    Générer un dataset tabulaire synthétique reproductible
+
+    Args:
+        rows: Nombre de lignes
+        numeric_columns: Nombre de colonnes numériques (num_0, num_1, ...), une sur deux entière
+        categorical_columns: Nombre de colonnes textuelles (cat_0, cat_1, ...)
+        null_rate: Proportion de valeurs manquantes dans chaque colonne (hors cible)
+        cardinalities: Nombre de valeurs distinctes de chaque colonne textuelle (réutilisé cycliquement)
+        seed: Graine du générateur
+
+    Returns:
+        DataFrame avec une cible binaire (colonne target)
+    """
+    rng = np.random.default_rng(seed)
+    cardinalities = cardinalities or [10, 1000]
+    data: Dict[str, Any] = {}
+    for i in range(numeric_columns):
+        values = rng.normal(loc=i, scale=1 + i, size=rows)
+        if i % 2:
+            values = np.round(values * 100)
+        if null_rate:
+            values[rng.random(rows) < null_rate] = np.nan
+        data[f"num_{i}"] = values
+    for i in range(categorical_columns):
+        cardinality = cardinalities[i % len(cardinalities)]
+        labels = np.array([f"v{j}" for j in range(cardinality)], dtype=object)
+        values = labels[rng.integers(0, cardinality, size=rows)]
+        if null_rate:
+            values[rng.random(rows) < null_rate] = None
+        data[f"cat_{i}"] = values
+    data[TARGET_COLUMN] = rng.integers(0, 2, size=rows)
+    return pd.DataFrame(data)
+
+
+# ===== Pipelines mesurés =====
+
+def step_benchmarks(df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """Une étape par pipeline, appliquée aux colonnes qu'elle concerne"""
+    numeric = [col for col in df.columns if col.startswith("num_")]
+    categorical = [col for col in df.columns if col.startswith("cat_")]
+    low_cardinality = [col for col in categorical if df[col].nunique() <= 100]
+    steps = {
+        "imputation_mean": {"name": "imputation", "strategy": "mean", "columns": numeric},
+        "imputation_median": {"name": "imputation", "strategy": "median", "columns": numeric},
+        "imputation_mode": {"name": "imputation", "strategy": "mode", "columns": categorical},
+        "imputation_forward_fill": {"name": "imputation", "strategy": "forward_fill", "columns": numeric},
+        "imputation_drop": {"name": "imputation", "strategy": "drop"},
+        "scaling_standard": {"name": "scaling", "method": "standard", "columns": numeric},
+        "scaling_minmax": {"name": "scaling", "method": "minmax", "columns": numeric},
+        "one_hot_encoding": {"name": "one_hot_encoding", "columns": low_cardinality},
+        "one_hot_encoding_sparse": {"name": "one_hot_encoding", "columns": categorical, "sparse": True},
+        "label_encoding": {"name": "label_encoding", "columns": categorical},
+        "hash_encoding": {"name": "hash_encoding", "columns": categorical},
+        "frequency_encoding": {"name": "frequency_encoding", "columns": categorical},
+        "target_encoding": {"name": "target_encoding", "columns": categorical, "target": TARGET_COLUMN},
+        "downcast": {"name": "downcast"},
+        "filter_rows": {"name": "filter_rows", "condition": {"column": "num_0", "operator": ">", "value": 0}},
+        "drop_columns": {"name": "drop_columns", "columns": categorical},
+    }
+    return {name: {"steps": [step]} for name, step in steps.items()}
+
+
+def pipeline_benchmarks(df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    """Pipelines complets représentatifs des préparations courantes"""
+    numeric = [col for col in df.columns if col.startswith("num_")]
+    categorical = [col for col in df.columns if col.startswith("cat_")]
+    return {
+        "clean_scale_encode": {"steps": [
+            {"name": "imputation", "strategy": "median", "columns": numeric},
+            {"name": "imputation", "strategy": "mode", "columns": categorical},
+            {"name": "scaling", "method": "standard", "columns": numeric},
+            {"name": "label_encoding", "columns": categorical},
+        ]},
+        "filter_encode_downcast": {"steps": [
+            {"name": "filter_rows", "condition": {"column": "num_0", "operator": ">", "value": 0}},
+            {"name": "imputation", "strategy": "mean", "columns": numeric},
+            {"name": "frequency_encoding", "columns": categorical},
+            {"name": "downcast"},
+        ]},
+        "high_cardinality": {"steps": [
+            {"name": "imputation", "strategy": "drop", "columns": categorical},
+            {"name": "target_encoding", "columns": categorical, "target": TARGET_COLUMN},
+            {"name": "scaling", "method": "minmax"},
+        ]},
+    }
+
+
+# ===== Mesures =====
+
+def _run_memory(df: pd.DataFrame, pipeline: Dict[str, Any], workers: int) -> pd.DataFrame:
+    return fit_pipeline(df, compile_pipeline(pipeline), workers)[0]
+
+
+def _run_chunked(df: pd.DataFrame, pipeline: Dict[str, Any], chunk_size: int) -> int:
+    plan = compile_pipeline(pipeline)
+
+    def read_chunks():
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+
+    states = fit_chunked(plan, read_chunks)
+    return sum(len(chunk) for chunk in transform_chunked(plan, read_chunks(), states))
+
+
+def _peak_memory(run: Callable[[], Any]) -> int:
+    """Pic des allocations (Python et numpy) pendant run, hors données d'entrée"""
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        run()
+        return max(tracemalloc.get_traced_memory()[1] - start, 0)
+    finally:
+        tracemalloc.stop()
+
+
+def measure(name: str, kind: str, mode: str, df: pd.DataFrame, run: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """
+    Mesurer un pipeline : durées de repeat exécutions, puis une exécution tracée pour le pic mémoire
+
+    Returns:
+        Résultat sérialisable (durées, débits, pic mémoire)
+    """
+    input_bytes = int(df.memory_usage(deep=True).sum())
+    run()  # Échauffement (caches du plan compilé, imports paresseux)
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - start)
+    median = statistics.median(durations)
+    return {
+        "name": name,
+        "kind": kind,
+        "mode": mode,
+        "rows": len(df),
+        "columns": df.shape[1],
+        "input_bytes": input_bytes,
+        "seconds_min": round(min(durations), 6),
+        "seconds_median": round(median, 6),
+        "rows_per_second": round(len(df) / median) if median else None,
+        "mb_per_second": round(input_bytes / 1e6 / median, 2) if median else None,
+        # tracemalloc ne voit pas les buffers Arrow (chaînes pyarrow) : pic sous-estimé pour les textes
+        "peak_memory_bytes": _peak_memory(run),
+    }
+
+
+def environment() -> Dict[str, Any]:
+    """Versions et machine, pour ne comparer que des résultats comparables"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    df = generate_dataset(args.rows, args.numeric_columns, args.categorical_columns, args.null_rate, args.cardinalities, args.seed)
+    benchmarks = []
+    if args.suite in ("steps", "all"):
+        benchmarks += [(name, "step", pipeline) for name, pipeline in step_benchmarks(df).items()]
+    if args.suite in ("pipelines", "all"):
+        benchmarks += [(name, "pipeline", pipeline) for name, pipeline in pipeline_benchmarks(df).items()]
+    if args.only:
+        benchmarks = [benchmark for benchmark in benchmarks if benchmark[0] in args.only]
+
+    results = []
+    for name, kind, pipeline in benchmarks:
+        runs = [("memory", lambda pipeline=pipeline: _run_memory(df, pipeline, args.workers))]
+        if args.chunk_size:
+            runs.append(("chunked", lambda pipeline=pipeline: _run_chunked(df, pipeline, args.chunk_size)))
+        for mode, run in runs:
+            result = measure(name, kind, mode, df, run, args.repeat)
+            results.append(result)
+            print(
+                f"{name:<28} {mode:<8} {result['seconds_median']:>9.4f} s  {result['rows_per_second'] or 0:>12,} lignes/s  "
+                f"{result['mb_per_second'] or 0:>8.1f} Mo/s  {result['peak_memory_bytes'] / 1e6:>8.1f} Mo",
+                file=sys.stderr
+            )
+    return {
+        "format": BENCHMARK_FORMAT,
+        "version": BENCHMARK_VERSION,
+        "environment": environment(),
+        "config": {
+            "rows": args.rows,
+            "numeric_columns": args.numeric_columns,
+            "categorical_columns": args.categorical_columns,
+            "null_rate": args.null_rate,
+            "cardinalities": args.cardinalities,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "chunk_size": args.chunk_size,
+            "workers": args.workers,
+        },
+        "results": results,
+    }
+
+
+# ===== Comparaison avec un résultat de référence =====
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[Dict[str, Any]]:
+    """
+    Comparer deux résultats de benchmark (même nom et même mode)
+
+    Args:
+        current: Résultat courant
+        baseline: Résultat de référence
+        max_regression: Hausse relative tolérée de la durée médiane et du pic mémoire (0.2 = +20 %)
+
+    Returns:
+        Régressions détectées (benchmark, mesure, référence, valeur courante, ratio)
+    """
+    if baseline.get("format") != BENCHMARK_FORMAT or baseline.get("version") != BENCHMARK_VERSION:
+        raise ValueError("Format de benchmark de référence non supporté")
+    if baseline.get("config") != current.get("config"):
+        print("Attention : configuration différente de celle de la référence", file=sys.stderr)
+    reference = {(result["name"], result["mode"]): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        previous = reference.get((result["name"], result["mode"]))
+        if previous is None:
+            continue
+        for metric in ("seconds_median", "peak_memory_bytes"):
+            if not previous[metric]:
+                continue
+            ratio = result[metric] / previous[metric]
+            if ratio > 1 + max_regression:
+                regressions.append({
+                    "name": result["name"], "mode": result["mode"], "metric": metric,
+                    "baseline": previous[metric], "current": result[metric], "ratio": round(ratio, 3),
+                })
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark hors ligne du pipeline de DataPreparer")
+    parser.add_argument("--rows", type=int, default=200_000, help="Nombre de lignes du dataset synthétique")
+    parser.add_argument("--numeric-columns", type=int, default=8)
+    parser.add_argument("--categorical-columns", type=int, default=4)
+    parser.add_argument("--null-rate", type=float, default=0.05, help="Proportion de valeurs manquantes par colonne")
+    parser.add_argument("--cardinalities", type=int, nargs="+", default=[10, 1000],
+                        help="Cardinalités des colonnes textuelles (réutilisées cycliquement)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--suite", choices=["steps", "pipelines", "all"], default="all")
+    parser.add_argument("--only", nargs="+", help="Noms des benchmarks à exécuter")
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre d'exécutions mesurées par benchmark")
+    parser.add_argument("--chunk-size", type=int, default=0, help="Mesurer aussi le mode chunké (0 : désactivé)")
+    parser.add_argument("--workers", type=int, default=1, help="Threads de l'exécution par blocs de colonnes")
+    parser.add_argument("--output", help="Fichier JSON des résultats (défaut : sortie standard)")
+    parser.add_argument("--baseline", help="Résultat de référence à comparer")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Hausse relative tolérée (0.2 = +20 %%)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # Référence lue avant l'écriture des résultats (--output peut désigner le même fichier)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    results = run_benchmarks(args)
+    payload = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.max_regression)
+        for regression in regressions:
+            print(
+                f"RÉGRESSION {regression['name']} ({regression['mode']}) {regression['metric']}: "
+                f"{regression['baseline']} -> {regression['current']} (x{regression['ratio']})",
+                file=sys.stderr
+            )
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
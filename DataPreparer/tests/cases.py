@@ -0,0 +1,75 @@
+"""
+Dataset et pipelines communs aux tests : un pipeline par type d'opération
+
+Le dataset est lu par chunks de CHUNK_SIZE lignes ; certaines valeurs manquantes
+n'apparaissent qu'après le premier chunk (colonne entière lue en int64 dans le
+premier chunk, en float64 ensuite).
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+ROWS = 3000
+CHUNK_SIZE = 1000
+
+PIPELINES = {
+    "fillna_mean": [{"name": "imputation", "strategy": "mean", "columns": ["age", "income"]}],
+    "fillna_median": [{"name": "imputation", "strategy": "median"}],
+    "fillna_mode": [{"name": "imputation", "strategy": "mode", "columns": ["city"]}],
+    "forward_fill": [{"name": "imputation", "strategy": "forward_fill", "columns": ["income", "city"]}],
+    "backward_fill": [{"name": "imputation", "strategy": "backward_fill", "columns": ["age", "city"]}],
+    "dropna": [{"name": "imputation", "strategy": "drop", "columns": ["age", "city"]}],
+    "one_hot": [{"name": "one_hot_encoding", "columns": ["city"]}],
+    "one_hot_sparse": [{"name": "one_hot_encoding", "columns": ["city", "segment"], "sparse": "auto"}],
+    "label": [{"name": "label_encoding", "columns": ["city", "segment"]}],
+    "hash": [{"name": "hash_encoding", "columns": ["segment"], "n_buckets": 16}],
+    "frequency": [{"name": "frequency_encoding", "columns": ["segment", "city"]}],
+    "target": [{"name": "target_encoding", "columns": ["segment"], "target": "target"}],
+    "scale_standard": [{"name": "scaling"}],
+    "scale_minmax": [{"name": "scaling", "method": "minmax", "columns": ["income", "score"]}],
+    "projection": [
+        {"name": "drop_columns", "columns": ["flag"]},
+        {"name": "rename_columns", "mapping": {"income": "revenue"}},
+    ],
+    "filter": [{"name": "filter_rows", "condition": {"column": "score", "operator": ">=", "value": 50}}],
+    "downcast": [
+        {"name": "imputation", "strategy": "mean", "columns": ["age"]},
+        {"name": "downcast"},
+    ],
+    "combined": [
+        {"name": "filter_rows", "condition": {"column": "score", "operator": "<", "value": 90}},
+        {"name": "imputation", "strategy": "mean", "columns": ["age"]},
+        {"name": "imputation", "strategy": "mode", "columns": ["city"]},
+        {"name": "one_hot_encoding", "columns": ["city"]},
+        {"name": "scaling", "columns": ["age", "income"]},
+        {"name": "drop_columns", "columns": ["segment"]},
+        {"name": "downcast", "float_precision": "float32"},
+    ],
+}
+
+
+def make_dataset(rows: int = ROWS, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "age": rng.integers(18, 80, rows).astype(object),
+        "income": rng.normal(3000, 800, rows).round(2),
+        "city": rng.choice(["Paris", "Lyon", "Lille", "Nantes", "Nice"], rows).astype(object),
+        "segment": [f"s{value}" for value in rng.integers(0, 120, rows)],
+        "score": rng.integers(0, 100, rows),
+        "flag": rng.random(rows) < 0.3,
+        "target": rng.integers(0, 2, rows),
+    })
+    df.loc[rng.random(rows) < 0.1, "income"] = np.nan
+    # Valeurs manquantes absentes du premier chunk
+    df.loc[[rows * 5 // 6, rows * 11 // 12], "age"] = np.nan
+    df.loc[[rows // 2, rows - 1], "city"] = np.nan
+    return df
+
+
+def to_csv_bytes(df: pd.DataFrame) -> bytes:
+    return df.to_csv(index=False).encode("utf-8")
+
+
+def read_csv_bytes(data: bytes) -> pd.DataFrame:
+    return pd.read_csv(io.BytesIO(data))
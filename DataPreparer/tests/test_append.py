@@ -0,0 +1,190 @@
+"""Ajout de lignes à un dataset préparé (pipeline ajusté réappliqué sans réajustement)"""
+import contextlib
+import hashlib
+import io
+import json
+import threading
+import time
+import types
+
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+import app.api.prepare as prepare
+from app.core import minio_client
+from app.core.minio_client import _serialize_chunks
+from app.core.pipeline import compile_pipeline, fit_pipeline
+
+DATASET_ID = "sales"
+PIPELINE = {"steps": [{"name": "downcast"}]}
+
+
+class Store:
+    """MinIO, tables PostgreSQL et dataset_metadata simulés en mémoire"""
+
+    def __init__(self):
+        self.objects, self.tables, self.metadata = {}, {}, {}
+
+    def put(self, path, chunks):
+        self.objects[path] = b"".join(_serialize_chunks(chunks, "." + path.rsplit(".", 1)[-1]))
+
+    def read(self, path):
+        return pd.read_parquet(io.BytesIO(self.objects[path]))
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = Store()
+
+    @contextlib.contextmanager
+    def open_minio_stream(path, bucket=None, offset=0, length=0):
+        data = store.objects[path]
+        yield io.BytesIO(data[offset:offset + length] if length else data[offset:])
+
+    @contextlib.contextmanager
+    def bulk_append(table_name):
+        pending = []
+        yield lambda df: pending.append(df) or {"rows": len(df), "seconds": 0.0}
+        store.tables[table_name].extend(pending)
+
+    def read_chunks_from_minio(path, chunk_size, bucket=None):
+        df = store.read(path)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+
+    monkeypatch.setattr(prepare, "open_minio_stream", open_minio_stream)
+    monkeypatch.setattr(prepare, "stat_minio_object", lambda path: types.SimpleNamespace(
+        size=len(store.objects[path]), etag=hashlib.md5(store.objects[path]).hexdigest()
+    ))
+    monkeypatch.setattr(prepare, "MINIO_STREAMING", True)
+    monkeypatch.setattr(prepare, "find_dataset", lambda dataset_id: dict(store.metadata[dataset_id]) if dataset_id in store.metadata else None)
+    monkeypatch.setattr(prepare, "update_dataset_metadata", lambda dataset_id, values: store.metadata[dataset_id].update(values))
+    monkeypatch.setattr(prepare, "count_path_references", lambda path: sum(
+        record["cleaned_path"] == path for record in store.metadata.values()
+    ))
+    monkeypatch.setattr(prepare, "bulk_append", bulk_append)
+    monkeypatch.setattr(prepare, "upload_chunks_to_minio", store.put)
+    monkeypatch.setattr(prepare, "read_chunks_from_minio", read_chunks_from_minio)
+    monkeypatch.setattr(prepare, "delete_object", lambda path: store.objects.pop(path, None))
+    return store
+
+
+def prepared(store, df):
+    """Dataset préparé avec PIPELINE (a ajustée en int8)"""
+    cleaned, fitted = fit_pipeline(df, compile_pipeline(PIPELINE))
+    dtypes = prepare.column_dtypes(cleaned)
+    store.objects["cleaned/sales.pipeline.json"] = fitted.to_json().encode("utf-8")
+    store.put("cleaned/sales.parquet", [cleaned])
+    store.tables["dataset_sales"] = [cleaned]
+    store.metadata[DATASET_ID] = {
+        "dataset_id": DATASET_ID,
+        "table_name": "dataset_sales",
+        "cleaned_path": "cleaned/sales.parquet",
+        "fitted_pipeline_path": "cleaned/sales.pipeline.json",
+        "rows": len(cleaned),
+        "dtypes": json.dumps(dtypes),
+        "appends": "[]",
+        "profile": None,
+    }
+    return dtypes
+
+
+def append(store, name, df):
+    store.objects[name] = df.to_csv(index=False).encode("utf-8")
+    return prepare.run_append(DATASET_ID, prepare.AppendRequest(file_path=name, chunk_size=2))
+
+
+def test_append_keeps_the_fitted_schema(store):
+    dtypes = prepared(store, pd.DataFrame({"a": range(10), "b": [0.5] * 10}))
+    assert dtypes["a"] == "int8"
+    result = append(store, "delta.csv", pd.DataFrame({"a": [100, -5, 7], "b": [1.5, 2.5, 3.5]}))
+    assert result["metadata"]["rows"] == 13
+    table = pd.concat(store.tables["dataset_sales"], ignore_index=True)
+    written = store.read(result["cleaned_dataset_path"])
+    pd.testing.assert_frame_equal(written, table)
+    assert written["a"].tolist() == list(range(10)) + [100, -5, 7]
+    assert prepare.column_dtypes(written) == dtypes
+
+
+def test_out_of_range_delta_is_rejected(store):
+    prepared(store, pd.DataFrame({"a": range(10), "b": [0.5] * 10}))
+    with pytest.raises(HTTPException) as error:
+        append(store, "delta.csv", pd.DataFrame({"a": [1, 2, 300], "b": [1.0, 2.0, 3.0]}))
+    assert error.value.status_code == 400 and "'a'" in error.value.detail
+    # Rien n'est écrit : ni lignes dans la table, ni nouvel objet
+    assert len(store.tables["dataset_sales"]) == 1
+    assert sorted(store.objects) == ["cleaned/sales.parquet", "cleaned/sales.pipeline.json", "delta.csv"]
+    assert store.metadata[DATASET_ID]["rows"] == 10
+
+
+def test_concurrent_appends_are_serialized(store, monkeypatch):
+    prepared(store, pd.DataFrame({"a": range(10), "b": [0.5] * 10}))
+    put = store.put
+
+    def slow_put(path, chunks):
+        # Élargit la fenêtre entre la lecture de l'entrée et sa mise à jour
+        time.sleep(0.2)
+        put(path, chunks)
+
+    monkeypatch.setattr(prepare, "upload_chunks_to_minio", slow_put)
+    deltas = {"delta1.csv": [20, 21], "delta2.csv": [30, 31, 32]}
+    for name, values in deltas.items():
+        store.objects[name] = pd.DataFrame({"a": values, "b": [1.0] * len(values)}).to_csv(index=False).encode("utf-8")
+    threads = [
+        threading.Thread(target=prepare.run_append, args=(DATASET_ID, prepare.AppendRequest(file_path=name)))
+        for name in deltas
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    record = store.metadata[DATASET_ID]
+    assert record["rows"] == 15
+    assert len(json.loads(record["appends"])) == 2
+    written = store.read(record["cleaned_path"])
+    assert sorted(written["a"].tolist()[10:]) == [20, 21, 30, 31, 32]
+    assert sum(len(chunk) for chunk in store.tables["dataset_sales"]) == 15
+
+
+def test_parquet_reread_uses_range_requests(monkeypatch):
+    df = pd.DataFrame({"a": range(1000), "b": [0.5] * 1000})
+    data = b"".join(_serialize_chunks([df.iloc[i:i + 100] for i in range(0, 1000, 100)], ".parquet"))
+    ranges = []
+
+    @contextlib.contextmanager
+    def open_minio_stream(path, bucket=None, offset=0, length=0):
+        ranges.append((offset, length))
+        yield io.BytesIO(data[offset:offset + length] if length else data[offset:])
+
+    monkeypatch.setattr(minio_client, "MINIO_STREAMING", True)
+    monkeypatch.setattr(minio_client, "MINIO_RANGE_READ_SIZE", 1024)
+    monkeypatch.setattr(minio_client, "stat_minio_object", lambda path, bucket=None: types.SimpleNamespace(size=len(data)))
+    monkeypatch.setattr(minio_client, "open_minio_stream", open_minio_stream)
+    monkeypatch.setattr(minio_client, "download_file_from_minio", lambda *args: pytest.fail("téléchargement complet"))
+    chunks = list(minio_client.read_chunks_from_minio("cleaned/sales.parquet", 300))
+    assert [len(chunk) for chunk in chunks] == [300, 300, 300, 100]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), df)
+    assert all(0 < length <= max(1024, len(data)) for _, length in ranges)
+
+
+@pytest.mark.parametrize("values, dtype", [
+    ([1, 127, -128], "int8"),
+    ([0.5, 1e30], "float32"),
+    ([1.0, None], "float32"),
+])
+def test_checked_cast_keeps_representable_values(values, dtype):
+    series = pd.Series(values, dtype="float64" if None in values or isinstance(values[0], float) else "int64")
+    assert prepare.checked_cast(series, dtype).dtype == dtype
+
+
+@pytest.mark.parametrize("values, dtype", [
+    ([1, 300], "int8"),
+    ([1, -40000], "int16"),
+    ([2.5], "int64"),
+    ([1e300], "float32"),
+])
+def test_checked_cast_rejects_lossy_values(values, dtype):
+    with pytest.raises(ValueError):
+        prepare.checked_cast(pd.Series(values), dtype)
@@ -0,0 +1,150 @@
+"""Mode chunké : même dataset nettoyé, au même schéma, qu'une préparation en mémoire"""
+import contextlib
+import io
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+import app.api.prepare as prepare
+from app.core.chunked import SchemaAccumulator
+from app.core import minio_client
+from app.core.minio_client import _serialize_chunks
+from app.core.pipeline import OPERATION_TYPES, compile_pipeline, fit_pipeline
+from app.core.profile import DatasetProfiler
+
+from cases import CHUNK_SIZE, PIPELINES, make_dataset, read_csv_bytes, to_csv_bytes
+
+DATA = to_csv_bytes(make_dataset())
+
+
+def dtype_names(df):
+    return {col: str(dtype) for col, dtype in df.dtypes.items()}
+
+
+@pytest.fixture
+def sinks(monkeypatch):
+    """Chunks envoyés à PostgreSQL et octets écrits dans MinIO, capturés en mémoire"""
+    captured = {"tables": {}, "objects": {}}
+
+    def save_dataframe_to_db(df, table_name, if_exists="replace"):
+        if if_exists == "replace":
+            captured["tables"][table_name] = {"schema": dtype_names(df), "chunks": []}
+        captured["tables"][table_name]["chunks"].append(df)
+        return {"rows": len(df), "seconds": 0.0}
+
+    def upload_chunks_to_minio(path, chunks):
+        captured["objects"][path] = b"".join(_serialize_chunks(chunks, ".parquet"))
+
+    monkeypatch.setattr(prepare, "save_dataframe_to_db", save_dataframe_to_db)
+    monkeypatch.setattr(prepare, "upload_chunks_to_minio", upload_chunks_to_minio)
+    return captured
+
+
+@contextlib.contextmanager
+def open_source(offset=0, length=0):
+    yield io.BytesIO(DATA)
+
+
+def run_chunked(plan, **kwargs):
+    return prepare.prepare_chunked(
+        open_source, "utf-8", plan, CHUNK_SIZE, "cleaned/test.parquet", "dataset_test", DatasetProfiler(), **kwargs
+    )
+
+
+def test_pipelines_cover_every_operation():
+    kinds = {op.kind for steps in PIPELINES.values() for op in compile_pipeline({"steps": steps}).operations}
+    assert kinds == set(OPERATION_TYPES)
+
+
+@pytest.mark.parametrize("name", sorted(PIPELINES))
+def test_chunked_matches_memory(name, sinks):
+    plan = compile_pipeline({"steps": PIPELINES[name]})
+    expected, _ = fit_pipeline(read_csv_bytes(DATA), plan)
+    expected = expected.reset_index(drop=True)
+
+    rows, dtypes, fitted, stats = run_chunked(plan)
+
+    table = sinks["tables"]["dataset_test"]
+    # Table créée à partir du schéma ajusté, avant les lignes ; tous les chunks le respectent
+    assert table["chunks"][0].empty
+    for chunk in table["chunks"]:
+        assert dtype_names(chunk) == table["schema"]
+    loaded = pd.concat(table["chunks"][1:]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(loaded, expected, check_exact=False)
+    assert rows == len(expected)
+    assert dtypes == dtype_names(expected)
+
+    written = pd.read_parquet(io.BytesIO(sinks["objects"]["cleaned/test.parquet"]))
+    pd.testing.assert_frame_equal(written, expected, check_dtype=False, check_categorical=False, check_exact=False)
+
+    # Le pipeline ajusté par chunks est celui ajusté en mémoire
+    pd.testing.assert_frame_equal(
+        fitted.transform(read_csv_bytes(DATA)).reset_index(drop=True), expected, check_exact=False
+    )
+
+
+def test_late_missing_values_refit_on_unified_dtypes(sinks):
+    plan = compile_pipeline({"steps": PIPELINES["fillna_mean"]})
+    rows, dtypes, _, stats = run_chunked(plan)
+    assert dtypes["age"] == "float64"
+    # Passe d'ajustement refaite sur les dtypes unifiés, puis transformation
+    assert stats["passes"] == 3
+
+
+def test_index_columns_checked_before_any_write(sinks):
+    plan = compile_pipeline({"steps": PIPELINES["one_hot"]})
+    with pytest.raises(prepare.HTTPException) as error:
+        run_chunked(plan, indexes=["city"])
+    assert error.value.status_code == 400
+    assert sinks["tables"] == {} and sinks["objects"] == {}
+
+
+@pytest.mark.parametrize("dtypes, expected", [
+    (["int64", "float64"], "float64"),
+    (["float64", "str"], "str"),
+    (["int64", "str"], "str"),
+    (["bool", "object"], "object"),
+    (["bool", "int64"], "object"),
+])
+def test_schema_unification(dtypes, expected):
+    schema = SchemaAccumulator()
+    for dtype in dtypes:
+        schema.update(pd.DataFrame({"x": pd.Series([], dtype=dtype)}))
+    assert not schema.stable
+    assert str(schema.finalize()["x"]) == expected
+
+
+def test_iterator_stream_reads_across_blocks():
+    blocks = [b"abc", b"", b"defgh", b"ij"]
+    stream = io.BufferedReader(minio_client._IteratorStream(iter(blocks)), buffer_size=4)
+    assert stream.read(2) == b"ab"
+    assert stream.read() == b"".join(blocks)[2:]
+    assert stream.read() == b""
+
+
+@pytest.mark.parametrize("ext", [".csv", ".parquet", ".json"])
+def test_streamed_upload_slices_rows(ext, monkeypatch):
+    """En flux, le DataFrame est envoyé en tranches de DEFAULT_CHUNK_SIZE lignes"""
+    df = make_dataset()
+    captured = {}
+
+    def upload_chunks_to_minio(path, chunks, bucket=None):
+        captured["chunks"] = list(chunks)
+        return path
+
+    monkeypatch.setattr(minio_client, "MINIO_STREAMING", True)
+    monkeypatch.setattr(minio_client, "DEFAULT_CHUNK_SIZE", CHUNK_SIZE)
+    monkeypatch.setattr(minio_client, "upload_chunks_to_minio", upload_chunks_to_minio)
+    minio_client.upload_file_to_minio(f"cleaned/data{ext}", df)
+    assert [len(chunk) for chunk in captured["chunks"]][:-1] == [CHUNK_SIZE] * (len(captured["chunks"]) - 1)
+    assert len(captured["chunks"]) == -(-len(df) // CHUNK_SIZE)
+    whole = b"".join(_serialize_chunks([df], ext))
+    sliced = b"".join(_serialize_chunks(captured["chunks"], ext))
+    if ext == ".parquet":
+        assert pq.read_table(io.BytesIO(sliced)).equals(pq.read_table(io.BytesIO(whole)))
+    else:
+        assert sliced == whole
+
+    minio_client.upload_file_to_minio(f"cleaned/empty{ext}", df.iloc[:0])
+    assert [len(chunk) for chunk in captured["chunks"]] == [0]
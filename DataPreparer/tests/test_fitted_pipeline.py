@@ -0,0 +1,102 @@
+"""
+Pipeline ajusté : sérialisation, et parité des copies de l'Evaluator et du Deployer
+
+L'Evaluator et le Deployer appliquent l'artefact <dataset>.pipeline.json avec leur
+propre copie de la transformation (chaque service est construit séparément) : ces
+tests vérifient qu'elles donnent exactement le même résultat que DataPreparer pour
+chaque type d'opération.
+"""
+import filecmp
+import importlib.util
+import os
+import warnings
+
+import pandas as pd
+import pytest
+
+from app.core.pipeline import FittedPipeline, compile_pipeline, fit_pipeline
+
+from cases import PIPELINES, make_dataset, read_csv_bytes, to_csv_bytes
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Modules dupliqués d'un service à l'autre : les copies doivent rester identiques
+COPIES = [
+    ["Deployer/fitted_pipeline.py", "Evaluator/app/core/fitted_pipeline.py"],
+    ["Trainer/app/core/feature_matrix.py", "Evaluator/app/core/feature_matrix.py", "Deployer/feature_matrix.py"],
+    ["Trainer/app/core/dataset_reader.py", "Evaluator/app/core/dataset_reader.py"],
+]
+
+
+def load_copy(name: str, path: str):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+STANDALONE = {
+    "deployer": load_copy("deployer_fitted_pipeline", "Deployer/fitted_pipeline.py"),
+    "evaluator": load_copy("evaluator_fitted_pipeline", "Evaluator/app/core/fitted_pipeline.py"),
+}
+
+
+def unseen_data() -> pd.DataFrame:
+    """Nouvelles données, avec des catégories absentes de l'ajustement"""
+    df = make_dataset(rows=500, seed=1)
+    df["age"] = df["age"].astype(object)
+    df.loc[[3, 7], "city"] = "Brest"
+    df.loc[[5, 9], "segment"] = "s999"
+    return read_csv_bytes(to_csv_bytes(df))
+
+
+def fit(name: str) -> FittedPipeline:
+    _, fitted = fit_pipeline(read_csv_bytes(to_csv_bytes(make_dataset())), compile_pipeline({"steps": PIPELINES[name]}))
+    fitted.pipeline = {"steps": PIPELINES[name]}
+    return fitted
+
+
+@pytest.mark.parametrize("name", sorted(PIPELINES))
+def test_roundtrip(name):
+    fitted = fit(name)
+    restored = FittedPipeline.from_json(fitted.to_json())
+    assert restored.to_dict() == fitted.to_dict()
+    pd.testing.assert_frame_equal(restored.transform(unseen_data()), fitted.transform(unseen_data()))
+
+
+@pytest.mark.parametrize("service", [None] + sorted(STANDALONE))
+@pytest.mark.parametrize("name", ["one_hot", "one_hot_sparse"])
+def test_unknown_categories_encode_as_missing(name, service):
+    fitted = fit(name)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        if service is None:
+            encoded = fitted.transform(unseen_data())
+        else:
+            module = STANDALONE[service]
+            encoded = module.transform(unseen_data(), module.load_fitted_pipeline(fitted.to_json()))
+    brest = (unseen_data()["city"] == "Brest").to_numpy()
+    assert brest.any() and "city_Brest" not in encoded.columns
+    if "city" in encoded.columns:
+        # Encodage creux : colonne conservée en category
+        assert encoded["city"][brest].isna().all()
+    else:
+        assert not encoded.filter(like="city_")[brest].to_numpy().any()
+
+
+@pytest.mark.parametrize("service", sorted(STANDALONE))
+@pytest.mark.parametrize("drop_rows", [True, False])
+@pytest.mark.parametrize("name", sorted(PIPELINES))
+def test_standalone_copy_matches_datapreparer(name, drop_rows, service):
+    fitted = fit(name)
+    module = STANDALONE[service]
+    expected = fitted.transform(unseen_data(), drop_rows=drop_rows)
+    actual = module.transform(unseen_data(), module.load_fitted_pipeline(fitted.to_json()), drop_rows=drop_rows)
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+@pytest.mark.parametrize("paths", COPIES, ids=lambda paths: os.path.basename(paths[0]))
+def test_service_copies_are_identical(paths):
+    first = os.path.join(ROOT, paths[0])
+    for path in paths[1:]:
+        assert filecmp.cmp(first, os.path.join(ROOT, path), shallow=False), f"{path} diffère de {paths[0]}"
@@ -0,0 +1,19 @@
+"""Exécution par blocs de colonnes : mêmes données et mêmes états ajustés qu'en séquentiel"""
+import pandas as pd
+import pytest
+
+from app.core.pipeline import compile_pipeline, fit_pipeline
+
+from cases import PIPELINES, make_dataset, read_csv_bytes, to_csv_bytes
+
+DATA = to_csv_bytes(make_dataset())
+
+
+@pytest.mark.parametrize("workers", [2, 4])
+@pytest.mark.parametrize("name", sorted(PIPELINES))
+def test_column_blocks_match_sequential(name, workers):
+    plan = compile_pipeline({"steps": PIPELINES[name]})
+    expected, sequential = fit_pipeline(read_csv_bytes(DATA), plan, workers=1)
+    actual, parallel = fit_pipeline(read_csv_bytes(DATA), plan, workers=workers)
+    pd.testing.assert_frame_equal(actual, expected)
+    assert parallel.to_dict() == sequential.to_dict()
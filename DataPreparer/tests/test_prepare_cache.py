@@ -0,0 +1,105 @@
+"""Cache des préparations : réutilisation d'un dataset_id et ramasse-miettes"""
+import contextlib
+import hashlib
+import io
+import types
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+import app.api.prepare as prepare
+import app.core.prepare_cache as prepare_cache
+from app.core import database
+from app.core.minio_client import _serialize_chunks
+
+SOURCE = pd.DataFrame({"a": range(20), "b": [float(i % 7) for i in range(20)], "c": ["x", "y"] * 10})
+DROP_B = {"steps": [{"name": "drop_columns", "columns": ["b"]}]}
+DROP_C = {"steps": [{"name": "drop_columns", "columns": ["c"]}]}
+
+
+@pytest.fixture
+def objects(monkeypatch):
+    """Objets MinIO simulés ; dataset_metadata et tables dans la base SQLite des tests"""
+    with database.engine.begin() as conn:
+        for table in database.inspect(conn).get_table_names():
+            conn.execute(text(f'DROP TABLE "{table}"'))
+    objects = {"raw/sales.csv": SOURCE.to_csv(index=False).encode("utf-8")}
+
+    @contextlib.contextmanager
+    def open_minio_stream(path, bucket=None, offset=0, length=0):
+        data = objects[path]
+        yield io.BytesIO(data[offset:offset + length] if length else data[offset:])
+
+    def stat(path):
+        return types.SimpleNamespace(size=len(objects[path]), etag=hashlib.md5(objects[path]).hexdigest())
+
+    def upload_chunks(path, chunks):
+        objects[path] = b"".join(_serialize_chunks(chunks, "." + path.rsplit(".", 1)[-1]))
+
+    def upload_bytes(path, data, content_type=None):
+        objects[path] = data
+
+    for module in (prepare, prepare_cache):
+        monkeypatch.setattr(module, "stat_minio_object", stat)
+        monkeypatch.setattr(module, "delete_object", lambda path: objects.pop(path, None))
+    monkeypatch.setattr(prepare, "MINIO_STREAMING", True)
+    monkeypatch.setattr(prepare, "open_minio_stream", open_minio_stream)
+    monkeypatch.setattr(prepare, "upload_chunks_to_minio", upload_chunks)
+    monkeypatch.setattr(prepare, "upload_file_to_minio", lambda path, df: upload_chunks(path, [df]))
+    monkeypatch.setattr(prepare, "upload_bytes_to_minio", upload_bytes)
+    monkeypatch.setattr(prepare_cache, "object_exists", lambda path: path in objects)
+    return objects
+
+
+def run(pipeline, dataset_id="x"):
+    return prepare.run_prepare(prepare.PrepareRequest(file_path="raw/sales.csv", pipeline=pipeline, dataset_id=dataset_id))
+
+
+def table(name):
+    return pd.read_sql_table(name, database.engine)
+
+
+def entries(dataset_id):
+    return pd.read_sql(text("SELECT * FROM dataset_metadata WHERE dataset_id = :id"), database.engine, params={"id": dataset_id})
+
+
+def test_reused_dataset_id_never_serves_another_pipeline(objects):
+    first = run(DROP_B)
+    second = run(DROP_C)
+    assert second["cache"]["hit"] is False and second["table_name"] != first["table_name"]
+    # Une seule entrée par dataset_id ; table et objets de la préparation remplacée libérés
+    assert len(entries("x")) == 1
+    assert not database.table_exists(first["table_name"])
+    assert first["cleaned_dataset_path"] not in objects and first["fitted_pipeline_path"] not in objects
+
+    again = run(DROP_B)
+    assert again["cache"]["hit"] is False
+    assert list(table(again["table_name"]).columns) == ["a", "c"]
+    assert run(DROP_B)["cache"]["hit"] is True
+
+
+def test_shared_outputs_survive_replacement(objects):
+    other = run(DROP_B, dataset_id="y")
+    run(DROP_B)
+    run(DROP_C)
+    # Dataset nettoyé (adressé par contenu) partagé avec y : conservé
+    assert other["cleaned_dataset_path"] in objects
+    assert prepare_cache.lookup(other["cache"]["key"], "y") is not None
+
+
+def test_gc_only_removes_the_evicted_entry(objects, monkeypatch):
+    """Entrées antérieures au remplacement : même dataset_id, même table"""
+    live = run(DROP_C)
+    key = live["cache"]["key"]
+    legacy = entries("x").iloc[0].to_dict()
+    legacy.update({"cache_key": "k-old", "created_at": "2000-01-01T00:00:00+00:00", "last_used_at": None})
+    pd.DataFrame([legacy]).to_sql("dataset_metadata", database.engine, if_exists="append", index=False)
+
+    # L'entrée antérieure ne sert jamais : sa table a été réécrite
+    assert database.find_prepared_dataset("k-old") is None
+    result = prepare_cache.collect_garbage()
+    assert result["evicted"] == [{"dataset_id": "x", "reason": "superseded"}]
+    assert database.table_exists(live["table_name"])
+    assert entries("x")["cache_key"].tolist() == [key]
+    assert prepare_cache.lookup(key, "x") is not None
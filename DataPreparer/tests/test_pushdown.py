@@ -0,0 +1,55 @@
+"""Lecture réduite (colonnes non lues, filtres à la lecture) : même résultat et même état ajusté"""
+import io
+
+import pandas as pd
+import pytest
+
+from app.core.pipeline import compile_pipeline, fit_pipeline
+
+from cases import PIPELINES, make_dataset, to_csv_bytes
+
+DATA = to_csv_bytes(make_dataset())
+
+CASES = {
+    **PIPELINES,
+    # Suppression avant toute opération ajustée : colonne non lue
+    "drop_then_scale": [{"name": "drop_columns", "columns": ["income"]}, {"name": "scaling"}],
+    # Opération ajustée sur toutes les colonnes puis suppression : colonne lue
+    "scale_then_drop": [{"name": "scaling"}, {"name": "drop_columns", "columns": ["income"]}],
+    "impute_then_drop": [
+        {"name": "imputation", "strategy": "mean", "columns": ["income"]},
+        {"name": "drop_columns", "columns": ["income", "flag"]},
+    ],
+    "filter_then_drop": [
+        {"name": "filter_rows", "condition": {"column": "score", "operator": ">=", "value": 50}},
+        {"name": "drop_columns", "columns": ["segment"]},
+        {"name": "downcast"},
+    ],
+}
+
+
+def fit(steps, pushdown):
+    plan = compile_pipeline({"steps": steps})
+    reduced = plan.read_pushdown() if pushdown else None
+    df = pd.read_csv(io.BytesIO(DATA), usecols=reduced.usecols if reduced else None)
+    if reduced:
+        df = reduced.apply(df)
+    return fit_pipeline(df, plan)
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_pushdown_keeps_fitted_state(name):
+    expected, fitted = fit(CASES[name], pushdown=False)
+    actual, reduced = fit(CASES[name], pushdown=True)
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True))
+    assert reduced.to_dict()["steps"] == fitted.to_dict()["steps"]
+
+
+@pytest.mark.parametrize("name, skipped", [
+    ("drop_then_scale", ["income"]),
+    ("scale_then_drop", []),
+    ("impute_then_drop", ["flag"]),
+    ("filter_then_drop", ["segment"]),
+])
+def test_skipped_columns(name, skipped):
+    assert compile_pipeline({"steps": CASES[name]}).read_pushdown().summary()["skipped_columns"] == skipped
@@ -4,6 +4,9 @@ import io
 import joblib
 import pandas as pd
 from minio import Minio
+from minio.commonconfig import CopySource
+from fitted_pipeline import load_fitted_pipeline, transform
+from feature_matrix import load_feature_layout, build_feature_matrix, feature_layout_path
 
 app = Flask(__name__)
 
@@ -24,6 +27,44 @@ minio_client = Minio(
 # Structure: { "model_id": { "model": object, "last_accessed": timestamp } }
 GLOBAL_MODEL_CACHE = {}
 
+# Pipelines ajustés (DataPreparer) associés aux modèles déployés, None si aucun
+# Structure: { "model_id": dict | None }
+GLOBAL_PIPELINE_CACHE = {}
+
+def get_model_pipeline(model_id):
+    """Charger (une seule fois) le pipeline ajusté associé à un modèle, s'il existe"""
+    if model_id not in GLOBAL_PIPELINE_CACHE:
+        try:
+            response = minio_client.get_object(MINIO_BUCKET, f"models/{model_id}.pipeline.json")
+        except Exception:
+            GLOBAL_PIPELINE_CACHE[model_id] = None
+        else:
+            try:
+                GLOBAL_PIPELINE_CACHE[model_id] = load_fitted_pipeline(response.read())
+            finally:
+                response.close()
+                response.release_conn()
+    return GLOBAL_PIPELINE_CACHE[model_id]
+
+# Schémas de features sauvegardés par le Trainer, None pour les modèles qui n'en ont pas
+# Structure: { "model_id": dict | None }
+GLOBAL_LAYOUT_CACHE = {}
+
+def get_model_feature_layout(model_id):
+    """Charger (une seule fois) le schéma de features d'un modèle, s'il existe"""
+    if model_id not in GLOBAL_LAYOUT_CACHE:
+        try:
+            response = minio_client.get_object(MINIO_BUCKET, feature_layout_path(f"models/{model_id}.joblib"))
+        except Exception:
+            GLOBAL_LAYOUT_CACHE[model_id] = None
+        else:
+            try:
+                GLOBAL_LAYOUT_CACHE[model_id] = load_feature_layout(response.read())
+            finally:
+                response.close()
+                response.release_conn()
+    return GLOBAL_LAYOUT_CACHE[model_id]
+
 @app.route('/')
 def home():
     return jsonify({"service": "Deployer", "status": "active"})
@@ -44,6 +85,18 @@ def deploy_model():
         minio_client.stat_object(MINIO_BUCKET, f"models/{model_id}.joblib")
     except Exception as e:
          return jsonify({"error": f"Model not found in storage: {str(e)}"}), 404
+    GLOBAL_LAYOUT_CACHE.pop(model_id, None)
+
+    # Associer le pipeline ajusté par DataPreparer (ex: cleaned/data.pipeline.json) au modèle
+    pipeline_path = data.get("pipeline_path")
+    if pipeline_path:
+        pipeline_path = pipeline_path.replace("s3://", "")
+        source_bucket, source_key = pipeline_path.split("/", 1) if "/" in pipeline_path else (MINIO_BUCKET, pipeline_path)
+        try:
+            minio_client.copy_object(MINIO_BUCKET, f"models/{model_id}.pipeline.json", CopySource(source_bucket, source_key))
+        except Exception as e:
+            return jsonify({"error": f"Fitted pipeline not found in storage: {str(e)}"}), 404
+        GLOBAL_PIPELINE_CACHE.pop(model_id, None)
 
     endpoint = f"/predict/{model_id}"
     
@@ -80,13 +133,23 @@ def predict(model_id):
         else:
             return jsonify({"error": "Invalid input format. Expected JSON dict or list"}), 400
         
-        # Encodage basique (One-Hot) - Attention: doit matcher l'entraînement !
-        # Idéalement, le pipeline de transformation (ColumnTransformer) devrait être sauvé AVEC le modèle.
-        # Ici on fait au mieux.
-        df = pd.get_dummies(df) 
-        
-        # Alignement des colonnes (si le modèle attend des colonnes spécifiques)
-        # TODO: Gérer l'alignement strict
+        # Pipeline ajusté de DataPreparer : mêmes statistiques qu'à l'entraînement, sans réajustement.
+        # Les filtres de lignes sont ignorés pour renvoyer une prédiction par instance.
+        fitted = get_model_pipeline(model_id)
+        if fitted is not None:
+            df = transform(df, fitted, drop_rows=False)
+
+        layout = get_model_feature_layout(model_id)
+        if layout is not None:
+            # Même matrice qu'à l'entraînement (CSR pour les modèles entraînés en creux)
+            df = build_feature_matrix(df, layout)
+        else:
+            # Encodage basique (One-Hot) des colonnes catégorielles restantes
+            df = pd.get_dummies(df) 
+            
+            # Alignement des colonnes sur celles vues à l'entraînement
+            if hasattr(model, "feature_names_in_"):
+                df = df.reindex(columns=model.feature_names_in_, fill_value=0)
 
         # 3. Prédiction
         prediction = model.predict(df)
@@ -0,0 +1,91 @@
+"""
+Construction de la matrice de features d'un modèle (dense ou creuse)
+
+Les colonnes category (one-hot creux de DataPreparer, colonnes réduites en
+category) sont encodées en one-hot sur leurs catégories : en matrice CSR pour
+les modèles qui acceptent une entrée creuse, en indicatrices denses sinon. Les
+autres colonnes suivent l'encodage historique (pd.get_dummies). Le schéma
+obtenu à l'entraînement est sauvegardé à côté du modèle (<modèle>.features.json)
+pour construire exactement la même matrice à l'évaluation et à l'inférence.
+"""
+import json
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from typing import Any, Dict, Union
+
+FEATURE_LAYOUT_FORMAT = "microlearn-feature-layout"
+FEATURE_LAYOUT_VERSION = 1
+
+
+def _categorical_columns(X: pd.DataFrame):
+    return [col for col in X.columns if isinstance(X[col].dtype, pd.CategoricalDtype)]
+
+
+def fit_feature_layout(X: pd.DataFrame, sparse: bool) -> Dict[str, Any]:
+    """
+    Schéma de la matrice de features construit sur les données d'entraînement
+
+    Args:
+        X: Features d'entraînement
+        sparse: Encoder les colonnes category en matrice CSR
+
+    Returns:
+        Schéma sérialisable (colonnes denses, catégories des colonnes encodées)
+    """
+    categorical = _categorical_columns(X)
+    dense_columns = pd.get_dummies(X.drop(columns=categorical)).columns
+    return {
+        "format": FEATURE_LAYOUT_FORMAT,
+        "version": FEATURE_LAYOUT_VERSION,
+        "sparse": bool(sparse and categorical),
+        "dense_columns": [str(col) for col in dense_columns],
+        "categories": {col: [v.item() if isinstance(v, np.generic) else v for v in X[col].cat.categories] for col in categorical},
+    }
+
+
+def _one_hot_csr(series: pd.Series, categories) -> sp.csr_matrix:
+    codes = pd.Categorical(series, categories=categories).codes
+    rows = np.flatnonzero(codes >= 0)
+    data = np.ones(len(rows), dtype="float64")
+    return sp.csr_matrix((data, (rows, codes[rows])), shape=(len(series), len(categories)))
+
+
+def build_feature_matrix(X: pd.DataFrame, layout: Dict[str, Any]) -> Union[pd.DataFrame, sp.csr_matrix]:
+    """
+    Matrice de features conforme au schéma d'entraînement
+
+    Args:
+        X: Features (colonnes absentes -> 0, catégories inconnues -> aucune indicatrice)
+        layout: Schéma renvoyé par fit_feature_layout
+
+    Returns:
+        Matrice CSR si le schéma est creux, DataFrame sinon
+    """
+    categories = layout["categories"]
+    rest = X.drop(columns=[col for col in categories if col in X.columns])
+    dense = pd.get_dummies(rest).reindex(columns=layout["dense_columns"], fill_value=0)
+    if layout["sparse"]:
+        blocks = [sp.csr_matrix(dense.to_numpy(dtype="float64"))]
+        for col, values in categories.items():
+            series = X[col] if col in X.columns else pd.Series([None] * len(X), index=X.index)
+            blocks.append(_one_hot_csr(series, values))
+        return sp.hstack(blocks, format="csr")
+    indicators = [
+        pd.get_dummies(pd.Categorical(X[col] if col in X.columns else [None] * len(X), categories=values), prefix=col).set_axis(X.index)
+        for col, values in categories.items()
+    ]
+    return pd.concat([dense] + indicators, axis=1) if indicators else dense
+
+
+def feature_layout_path(model_path: str) -> str:
+    """Chemin du schéma de features associé à un modèle (models/<id>.joblib)"""
+    base = model_path[:-len(".joblib")] if model_path.endswith(".joblib") else model_path
+    return f"{base}.features.json"
+
+
+def load_feature_layout(payload: Union[str, bytes]) -> Dict[str, Any]:
+    layout = json.loads(payload)
+    if layout.get("format") != FEATURE_LAYOUT_FORMAT or layout.get("version") != FEATURE_LAYOUT_VERSION:
+        raise ValueError("Format de schéma de features non supporté")
+    return layout
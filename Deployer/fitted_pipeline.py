@@ -0,0 +1,167 @@
+"""
+Application d'un pipeline ajusté par DataPreparer (artefact <dataset>.pipeline.json)
+
+Les statistiques (valeurs d'imputation, moyennes/échelles, catégories, classes)
+sont lues depuis l'artefact : aucune n'est recalculée sur les données reçues.
+"""
+import json
+import operator
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Union
+
+FITTED_PIPELINE_FORMAT = "microlearn-fitted-pipeline"
+FITTED_PIPELINE_VERSION = 1
+
+NUMERIC_DTYPES = ["float64", "float32", "int64", "int32", "int16", "int8"]
+
+FILTER_OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+# Opérations qui suppriment des lignes
+ROW_OPERATIONS = {"dropna", "filter"}
+
+
+def load_fitted_pipeline(payload: Union[str, bytes]) -> Dict[str, Any]:
+    """Charger et valider un artefact de pipeline ajusté"""
+    fitted = json.loads(payload)
+    if fitted.get("format") != FITTED_PIPELINE_FORMAT or fitted.get("version") != FITTED_PIPELINE_VERSION:
+        raise ValueError("Format de pipeline ajusté non supporté")
+    for step in fitted["steps"]:
+        # Index des classes pré-calculés une seule fois par artefact
+        if step["op"] == "label":
+            step["indexes"] = {col: pd.Index(classes) for col, classes in step["state"]["classes"].items()}
+    return fitted
+
+
+def _resolve_columns(df: pd.DataFrame, columns):
+    if columns:
+        return [col for col in columns if col in df.columns]
+    return df.select_dtypes(include=NUMERIC_DTYPES).columns.tolist()
+
+
+def _is_text(series: pd.Series) -> bool:
+    return series.dtype == "object" or pd.api.types.is_string_dtype(series.dtype)
+
+
+def _as_labels(series: pd.Series) -> pd.Series:
+    return series.astype(str).fillna("nan")
+
+
+def _downcast(df: pd.DataFrame, state: Dict[str, Any]) -> pd.DataFrame:
+    """Types réduits ajustés par DataPreparer (les valeurs hors de l'ajustement gardent leur type)"""
+    for col, dtype in state["dtypes"].items():
+        if col not in df.columns:
+            continue
+        series = df[col]
+        if dtype == "category" and _is_text(series):
+            categories = state["categories"][col]
+            unknown = series[series.notna() & ~series.isin(categories)].unique().tolist()
+            df[col] = pd.Categorical(series, categories=categories + sorted(unknown, key=str))
+        elif dtype == "float32" and pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+            df[col] = series.astype("float32")
+        elif dtype.startswith("int") and pd.api.types.is_integer_dtype(series.dtype):
+            info = np.iinfo(dtype)
+            if series.empty or (info.min <= series.min() and series.max() <= info.max):
+                df[col] = series.astype(dtype)
+    return df
+
+
+def transform(df: pd.DataFrame, fitted: Dict[str, Any], drop_rows: bool = True) -> pd.DataFrame:
+    """
+    Appliquer un pipeline ajusté sans réajustement
+
+    Args:
+        df: Données à transformer
+        fitted: Artefact chargé avec load_fitted_pipeline
+        drop_rows: Si False, les filtres et suppressions de lignes sont ignorés
+            (inférence : une prédiction par ligne reçue)
+
+    Returns:
+        DataFrame transformé
+    """
+    df = df.copy(deep=False)
+    for step in fitted["steps"]:
+        op, params, state = step["op"], step["params"], step["state"]
+        if op in ROW_OPERATIONS and not drop_rows:
+            continue
+
+        if op == "fillna":
+            if state["values"]:
+                df = df.fillna(state["values"])
+
+        elif op == "propagate_fill":
+            cols = _resolve_columns(df, params["columns"])
+            if cols:
+                df[cols] = df[cols].ffill() if params["strategy"] == "forward_fill" else df[cols].bfill()
+
+        elif op == "dropna":
+            df = df.dropna(subset=_resolve_columns(df, params["columns"]))
+
+        elif op == "one_hot":
+            categories = state["categories"]
+            cols = [col for col in params["columns"] if col in df.columns and col in categories]
+            for col in cols:
+                # Catégorie inconnue de l'ajustement : valeur manquante
+                df[col] = pd.Categorical.from_codes(pd.Index(categories[col]).get_indexer(df[col]), categories=categories[col])
+            # Colonnes en mode creux : conservées en category (matrice CSR construite au moment de prédire)
+            dense = [col for col in cols if col not in set(state.get("sparse", ()))]
+            if dense:
+                df = pd.get_dummies(df, columns=dense, prefix=dense)
+
+        elif op == "label":
+            for col, index in step["indexes"].items():
+                if col in df.columns and _is_text(df[col]):
+                    # Valeurs inconnues lors de l'ajustement -> -1
+                    df[col] = index.get_indexer(_as_labels(df[col])).astype("int64")
+
+        elif op == "scale":
+            present = [i for i, col in enumerate(state["columns"]) if col in df.columns]
+            if present:
+                cols = [state["columns"][i] for i in present]
+                offset = np.asarray(state["offset"])[present]
+                scale = np.asarray(state["scale"])[present]
+                df[cols] = (df[cols].to_numpy(dtype="float64") - offset) / scale
+
+        elif op == "projection":
+            for action, arg in params["actions"]:
+                if action == "drop":
+                    df = df.drop(columns=[col for col in arg if col in df.columns])
+                else:
+                    df = df.rename(columns=dict(arg))
+
+        elif op == "filter":
+            if params["column"] in df.columns:
+                df = df[FILTER_OPERATORS[params["op"]](df[params["column"]], params["value"])]
+
+        elif op == "hash":
+            for col in params["columns"]:
+                if col in df.columns:
+                    hashes = pd.util.hash_array(_as_labels(df[col]).to_numpy(dtype=object))
+                    df[col] = (hashes % np.uint64(params["n_buckets"])).astype("int64")
+
+        elif op == "frequency":
+            for col, counts in state["counts"].items():
+                if col in df.columns:
+                    encoded = _as_labels(df[col]).map(counts).astype("float64").fillna(state["defaults"][col])
+                    if params["normalize"]:
+                        encoded = encoded / max(state["rows"], 1)
+                    df[col] = encoded.to_numpy()
+
+        elif op == "target":
+            for col, encoding in state["encodings"].items():
+                if col in df.columns:
+                    df[col] = _as_labels(df[col]).map(encoding).astype("float64").fillna(state["prior"]).to_numpy()
+
+        elif op == "downcast":
+            df = _downcast(df, state)
+
+        else:
+            raise ValueError(f"Opération inconnue '{op}'")
+    return df
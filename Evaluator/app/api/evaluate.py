@@ -11,6 +11,9 @@ from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_sc
 from sqlalchemy import create_engine, Column, String, Float, JSON, DateTime, Integer
 from sqlalchemy.orm import sessionmaker, declarative_base
 from datetime import datetime
+from app.core.fitted_pipeline import load_fitted_pipeline, transform
+from app.core.dataset_reader import read_dataset
+from app.core.feature_matrix import load_feature_layout, build_feature_matrix, feature_layout_path
 
 router = APIRouter()
 
@@ -27,6 +30,44 @@ minio_client = Minio(
     secure=False
 )
 
+# Pipelines ajustés (DataPreparer) déjà chargés, par chemin MinIO
+FITTED_PIPELINE_CACHE = {}
+
+def _split_path(path: str):
+    """Séparer bucket et nom d'objet (bucket/file ou juste file)"""
+    path = path.replace("s3://", "")
+    if path.startswith(MINIO_BUCKET + "/"):
+        return MINIO_BUCKET, path[len(MINIO_BUCKET) + 1:]
+    if "/" in path:
+        bucket, key = path.split("/", 1)
+        return bucket, key
+    return MINIO_BUCKET, path
+
+def get_fitted_pipeline(pipeline_path: str):
+    """Charger (une seule fois) un pipeline ajusté depuis MinIO"""
+    if pipeline_path not in FITTED_PIPELINE_CACHE:
+        bucket, key = _split_path(pipeline_path)
+        response = minio_client.get_object(bucket, key)
+        try:
+            FITTED_PIPELINE_CACHE[pipeline_path] = load_fitted_pipeline(response.read())
+        finally:
+            response.close()
+            response.release_conn()
+    return FITTED_PIPELINE_CACHE[pipeline_path]
+
+def get_feature_layout(model_path: str):
+    """Schéma de features sauvegardé par le Trainer avec le modèle, None s'il n'existe pas"""
+    bucket, key = _split_path(feature_layout_path(model_path))
+    try:
+        response = minio_client.get_object(bucket, key)
+    except Exception:
+        return None
+    try:
+        return load_feature_layout(response.read())
+    finally:
+        response.close()
+        response.release_conn()
+
 # --- Configuration PostgreSQL ---
 POSTGRES_USER = os.getenv("POSTGRES_USER", "mluser")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "mlpass")
@@ -57,6 +98,10 @@ class EvaluationRequest(BaseModel):
     dataset_path: str 
     target_column: str
     task_type: str = "classification" 
+    # Pipeline ajusté par DataPreparer, appliqué au dataset avant évaluation (sans réajustement)
+    pipeline_path: Optional[str] = None
+    # Colonnes de features à charger (projection) ; toutes si None
+    feature_columns: Optional[List[str]] = None
 
 @router.post("/evaluate")
 async def evaluate_model(request: EvaluationRequest):
@@ -70,17 +115,34 @@ async def evaluate_model(request: EvaluationRequest):
             raise HTTPException(status_code=404, detail=f"Failed to load model: {str(e)}")
 
         try:
-            data_response = minio_client.get_object(MINIO_BUCKET, request.dataset_path)
-            df = pd.read_csv(io.BytesIO(data_response.read()))
+            columns = None
+            if request.feature_columns:
+                columns = request.feature_columns + [request.target_column]
+            df = read_dataset(minio_client, MINIO_BUCKET, request.dataset_path, columns)
         except Exception as e:
             raise HTTPException(status_code=404, detail=f"Failed to load dataset: {str(e)}")
 
+        if request.pipeline_path:
+            try:
+                fitted = get_fitted_pipeline(request.pipeline_path)
+            except Exception as e:
+                raise HTTPException(status_code=404, detail=f"Failed to load fitted pipeline: {str(e)}")
+            df = transform(df, fitted)
+
         if request.target_column not in df.columns:
             raise HTTPException(status_code=400, detail=f"Target column '{request.target_column}' not found")
 
         X = df.drop(columns=[request.target_column])
         y = df[request.target_column]
-        X = pd.get_dummies(X) 
+        layout = get_feature_layout(request.model_path)
+        if layout is not None:
+            # Même matrice qu'à l'entraînement (CSR pour les modèles entraînés en creux)
+            X = build_feature_matrix(X, layout)
+        else:
+            X = pd.get_dummies(X) 
+            # Alignement sur les colonnes vues à l'entraînement
+            if hasattr(model, "feature_names_in_"):
+                X = X.reindex(columns=model.feature_names_in_, fill_value=0)
         
         # Prédiction
         y_pred = model.predict(X)
@@ -0,0 +1,102 @@
+"""
+Lecture des datasets stockés dans MinIO (Parquet, CSV, JSON)
+
+Les datasets Parquet nettoyés par DataPreparer sont lus par requêtes HTTP Range :
+seuls le footer et les colonnes demandées transitent depuis MinIO, et les dtypes
+enregistrés dans le schéma sont restitués sans inférence. Les autres formats sont
+téléchargés puis parsés intégralement.
+"""
+import io
+import os
+import pandas as pd
+import pyarrow.parquet as pq
+from minio import Minio
+from typing import List, Optional
+
+# Taille des lectures par plage (les petites lectures de pyarrow sont regroupées)
+RANGE_READ_SIZE = int(os.getenv("MINIO_RANGE_READ_SIZE", str(4 * 1024 * 1024)))
+
+
+class MinioObjectFile(io.RawIOBase):
+    """Fichier en lecture seule et à accès aléatoire sur un objet MinIO"""
+
+    def __init__(self, client: Minio, bucket: str, key: str):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.size = client.stat_object(bucket, key).size
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        else:
+            self.position = self.size + offset
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        length = min(len(buffer), self.size - self.position)
+        if length <= 0:
+            return 0
+        response = self.client.get_object(self.bucket, self.key, offset=self.position, length=length)
+        try:
+            data = response.read()
+        finally:
+            response.close()
+            response.release_conn()
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+def read_dataset(client: Minio, bucket: str, key: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Charger un dataset depuis MinIO, le format étant déduit de l'extension
+
+    Args:
+        client: Client MinIO
+        bucket: Bucket du dataset
+        key: Nom de l'objet (.parquet, .csv ou .json)
+        columns: Colonnes à charger (projection) ; toutes si None.
+            Les colonnes absentes du dataset sont ignorées.
+
+    Returns:
+        DataFrame chargé
+    """
+    ext = os.path.splitext(key)[1].lower()
+    if ext == ".parquet":
+        remote = MinioObjectFile(client, bucket, key)
+        if remote.size <= RANGE_READ_SIZE:
+            # Petit objet : une seule requête
+            source = io.BytesIO(remote.read(remote.size))
+        else:
+            source = io.BufferedReader(remote, buffer_size=RANGE_READ_SIZE)
+        with source:
+            parquet_file = pq.ParquetFile(source)
+            if columns is not None:
+                available = set(parquet_file.schema_arrow.names)
+                columns = [col for col in columns if col in available]
+            return parquet_file.read(columns=columns).to_pandas()
+
+    response = client.get_object(bucket, key)
+    try:
+        data = io.BytesIO(response.read())
+    finally:
+        response.close()
+        response.release_conn()
+    if ext == ".json":
+        df = pd.read_json(data)
+        return df[[col for col in columns if col in df.columns]] if columns is not None else df
+    wanted = set(columns) if columns is not None else None
+    return pd.read_csv(data, usecols=(lambda col: col in wanted) if wanted is not None else None)
@@ -4,13 +4,22 @@ API endpoints pour la sélection de modèles
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
-from app.core.model_selector import ModelSelector
-from app.core.database import save_model_selection, get_model_selection
-from app.core.minio_client import download_file_from_minio
+from app.core.model_selector import ModelSelector, TaskType
+from app.core.database import save_model_selection, save_model_selections, get_model_selection, save_training_cost, list_training_costs
+from app.core.cost_model import CostModel
+from app.core.minio_client import download_file_from_minio, stat_minio_object
+from app.core.analysis_cache import analysis_key, scores_key, cached_analysis, cached_scores, lookup_scores, store_scores
+from app.core.registry import registry
+from concurrent.futures import ThreadPoolExecutor
 import os
 
 router = APIRouter()
-model_selector = ModelSelector()
+model_selector = ModelSelector(registry, CostModel(list_training_costs))
+
+# Datasets récupérés et analysés en parallèle par une sélection groupée
+SELECT_BATCH_WORKERS = int(os.getenv("SELECT_BATCH_WORKERS", "4"))
+# Nombre maximal de datasets par sélection groupée
+SELECT_BATCH_MAX_DATASETS = int(os.getenv("SELECT_BATCH_MAX_DATASETS", "100"))
 
 
 class SelectRequest(BaseModel):
@@ -22,6 +31,20 @@ class SelectRequest(BaseModel):
     metric: str = "accuracy"
     max_models: int = 5
     require_gpu: bool = False
+    # Budget : candidats dont l'entraînement estimé dépasse ces limites écartés (None : pas de limite)
+    max_training_seconds: Optional[float] = None
+    max_memory_mb: Optional[float] = None
+
+
+class TrainingCostRequest(BaseModel):
+    """Durée et pic mémoire mesurés d'un entraînement (calibration du modèle de coût)"""
+    model_name: str
+    num_samples: int
+    num_features: int
+    seconds: float
+    peak_memory_bytes: Optional[int] = None
+    sparse: bool = False
+    job_id: Optional[str] = None
 
 
 class SelectResponse(BaseModel):
@@ -31,6 +54,96 @@ class SelectResponse(BaseModel):
     metric: str
     selected_models: List[Dict[str, Any]]
     total_models_evaluated: int
+    cache: Optional[str] = None  # Niveau du cache ayant fourni l'analyse ("memory", "database")
+
+
+def _is_minio_path(dataset_path: str) -> bool:
+    return dataset_path.startswith("s3://") or "/" in dataset_path
+
+
+def _source_etag(dataset_path: str) -> str:
+    """Identifiant de version du dataset : ETag MinIO, ou taille et date de modification d'un fichier local"""
+    if _is_minio_path(dataset_path):
+        return stat_minio_object(dataset_path).etag
+    if not os.path.exists(dataset_path):
+        raise HTTPException(
+            status_code=404,
+            detail=f"Dataset non trouvé: {dataset_path}"
+        )
+    stat = os.stat(dataset_path)
+    return f"{os.path.abspath(dataset_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class BatchSelectRequest(BaseModel):
+    """Requête de sélection de modèles pour plusieurs datasets"""
+    datasets: List[SelectRequest]
+    max_workers: Optional[int] = None  # Analyses simultanées (au plus SELECT_BATCH_WORKERS)
+
+
+def _analyze(dataset_path: str, target_column: Optional[str]) -> Dict[str, Any]:
+    """Télécharger le dataset depuis MinIO si nécessaire et l'analyser"""
+    local_dataset_path = download_file_from_minio(dataset_path) if _is_minio_path(dataset_path) else dataset_path
+    try:
+        return model_selector.analyzer.analyze(local_dataset_path, target_column)
+    finally:
+        # Nettoyer le fichier temporaire
+        if local_dataset_path != dataset_path and os.path.exists(local_dataset_path):
+            os.remove(local_dataset_path)
+
+
+def _dataset_info(request: SelectRequest):
+    """
+    Analyse du dataset d'une requête, réutilisée tant que l'objet n'a pas changé (même ETag)
+    
+    Returns:
+        (clé de l'analyse, caractéristiques du dataset, niveau du cache ou None)
+    """
+    etag = _source_etag(request.dataset_path)
+    key = analysis_key(etag, request.target_column)
+    dataset_info, cache = cached_analysis(
+        key,
+        lambda: _analyze(request.dataset_path, request.target_column),
+        request.dataset_path,
+        etag,
+        request.target_column
+    )
+    return key, dataset_info, cache
+
+
+def _rank(request: SelectRequest, scores: List[Dict[str, Any]], dataset_info: Dict[str, Any], snapshot) -> List[Dict[str, Any]]:
+    """Classement des modèles avec estimations de coût, dans le budget de la requête"""
+    return model_selector.rank_models(
+        scores,
+        max_models=request.max_models,
+        require_gpu=request.require_gpu,
+        snapshot=snapshot,
+        dataset_info=dataset_info,
+        max_training_seconds=request.max_training_seconds,
+        max_memory_bytes=int(request.max_memory_mb * 1024 * 1024) if request.max_memory_mb is not None else None
+    )
+
+
+def _selection_record(request: SelectRequest, selected_models: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "dataset_id": request.dataset_id,
+        "dataset_path": request.dataset_path,
+        "task_type": request.task_type or "auto",
+        "metric": request.metric,
+        "selected_models": selected_models,
+        "config": {
+            "max_models": request.max_models,
+            "require_gpu": request.require_gpu,
+            "target_column": request.target_column,
+            "max_training_seconds": request.max_training_seconds,
+            "max_memory_mb": request.max_memory_mb
+        }
+    }
+
+
+def _error(request: SelectRequest, e: Exception) -> Dict[str, Any]:
+    status_code = e.status_code if isinstance(e, HTTPException) else 500
+    detail = e.detail if isinstance(e, HTTPException) else f"Erreur lors de la sélection de modèles: {str(e)}"
+    return {"dataset_id": request.dataset_id, "status_code": status_code, "detail": detail}
 
 
 @router.post("/select", response_model=SelectResponse)
@@ -45,54 +158,33 @@ def select_models(request: SelectRequest):
         Liste des modèles sélectionnés avec leurs scores de compatibilité
     """
     try:
-        # Télécharger le dataset depuis MinIO si nécessaire
-        if request.dataset_path.startswith("s3://") or "/" in request.dataset_path:
-            local_dataset_path = download_file_from_minio(request.dataset_path)
-        else:
-            # Supposer que c'est un chemin local
-            local_dataset_path = request.dataset_path
-            if not os.path.exists(local_dataset_path):
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Dataset non trouvé: {local_dataset_path}"
-                )
-        
-        # Sélectionner les modèles
-        selected_models = model_selector.select_models(
-            dataset_path=local_dataset_path,
-            target_column=request.target_column,
-            task_type=request.task_type,
-            metric=request.metric,
-            max_models=request.max_models,
-            require_gpu=request.require_gpu
+        key, dataset_info, cache = _dataset_info(request)
+        task_type = (request.task_type or dataset_info["task_type"]).lower()
+        # Même snapshot du registre pour la clé, le calcul et le classement
+        snapshot = registry.snapshot
+        scores, _ = cached_scores(
+            scores_key(key, task_type, snapshot.version),
+            lambda: model_selector.score_models(dataset_info, task_type, snapshot),
+            request.dataset_id
         )
         
-        # Sauvegarder la sélection dans la base de données
-        save_model_selection(
-            dataset_id=request.dataset_id,
-            dataset_path=request.dataset_path,
-            task_type=request.task_type or "auto",
-            metric=request.metric,
-            selected_models=selected_models,
-            config={
-                "max_models": request.max_models,
-                "require_gpu": request.require_gpu,
-                "target_column": request.target_column
-            }
-        )
+        # Sélectionner les modèles (dans le budget de la requête)
+        selected_models = _rank(request, scores, dataset_info, snapshot)
         
-        # Nettoyer le fichier temporaire
-        if local_dataset_path != request.dataset_path and os.path.exists(local_dataset_path):
-            os.remove(local_dataset_path)
+        # Sauvegarder la sélection dans la base de données
+        save_model_selection(**_selection_record(request, selected_models))
         
         return SelectResponse(
             dataset_id=request.dataset_id,
             task_type=request.task_type or "auto",
             metric=request.metric,
             selected_models=selected_models,
-            total_models_evaluated=len(selected_models)
+            total_models_evaluated=len(selected_models),
+            cache=cache
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -108,7 +200,9 @@ def select_models_get(
     task_type: Optional[str] = Query(None, description="Type de tâche (classification/regression)"),
     metric: str = Query("accuracy", description="Métrique à optimiser"),
     max_models: int = Query(5, description="Nombre maximum de modèles à retourner"),
-    require_gpu: bool = Query(False, description="Nécessite GPU")
+    require_gpu: bool = Query(False, description="Nécessite GPU"),
+    max_training_seconds: Optional[float] = Query(None, description="Durée d'entraînement estimée maximale (secondes)"),
+    max_memory_mb: Optional[float] = Query(None, description="Pic mémoire estimé maximal (Mo)")
 ):
     """
     Endpoint GET pour sélectionner des modèles (alternative à POST)
@@ -120,11 +214,160 @@ def select_models_get(
         task_type=task_type,
         metric=metric,
         max_models=max_models,
-        require_gpu=require_gpu
+        require_gpu=require_gpu,
+        max_training_seconds=max_training_seconds,
+        max_memory_mb=max_memory_mb
     )
     return select_models(request)
 
 
+@router.post("/select/batch")
+def select_models_batch(request: BatchSelectRequest):
+    """
+    Sélectionne les modèles de plusieurs datasets
+    
+    Les datasets sont récupérés et analysés en parallèle (au plus
+    SELECT_BATCH_WORKERS à la fois, analyses en cache réutilisées), les scores
+    manquants sont calculés en une passe vectorisée et toutes les sélections
+    sont enregistrées en une seule insertion. L'échec d'un dataset n'interrompt
+    pas les autres.
+    
+    Args:
+        request: Descripteurs des datasets (mêmes champs que POST /select)
+    
+    Returns:
+        Une entrée par dataset, dans l'ordre de la requête : la réponse de
+        POST /select, ou l'erreur rencontrée (status_code, detail) ; persisted
+        indique si les sélections ont été enregistrées (sinon persist_error)
+    """
+    datasets = request.datasets
+    if len(datasets) > SELECT_BATCH_MAX_DATASETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Au plus {SELECT_BATCH_MAX_DATASETS} datasets par sélection groupée"
+        )
+    if request.max_workers is not None and request.max_workers < 1:
+        raise HTTPException(status_code=400, detail="max_workers doit être au moins 1")
+    workers = min(request.max_workers or SELECT_BATCH_WORKERS, SELECT_BATCH_WORKERS)
+    
+    def analyze(item: SelectRequest):
+        try:
+            return _dataset_info(item), None
+        except Exception as e:
+            return None, _error(item, e)
+    
+    # Récupération et analyse en parallélisme borné
+    results: List[Optional[Dict[str, Any]]] = [None] * len(datasets)
+    analyses = {}
+    if datasets:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(datasets)))) as executor:
+            for index, (analysis, error) in enumerate(executor.map(analyze, datasets)):
+                if error is not None:
+                    results[index] = error
+                else:
+                    analyses[index] = analysis
+    
+    # Scores : cache d'abord, puis une passe vectorisée pour les datasets restants
+    snapshot = registry.snapshot
+    scores, keys, missing = {}, {}, []
+    for index, (key, dataset_info, _) in analyses.items():
+        item = datasets[index]
+        task_type = (item.task_type or dataset_info["task_type"]).lower()
+        keys[index] = scores_key(key, task_type, snapshot.version)
+        try:
+            cached, _ = lookup_scores(keys[index])
+        except Exception as e:
+            results[index] = _error(item, e)
+            continue
+        if cached is not None:
+            scores[index] = cached
+        else:
+            missing.append((index, dataset_info, task_type))
+    valid = []
+    for index, dataset_info, task_type in missing:
+        try:
+            TaskType(task_type)
+            valid.append((index, dataset_info, task_type))
+        except ValueError as e:
+            results[index] = _error(datasets[index], e)
+    computed = model_selector.score_models_batch(
+        [dataset_info for _, dataset_info, _ in valid],
+        [task_type for _, _, task_type in valid],
+        snapshot
+    )
+    for (index, _, _), dataset_scores in zip(valid, computed):
+        scores[index] = dataset_scores
+        store_scores(keys[index], datasets[index].dataset_id, dataset_scores)
+    
+    # Classement et enregistrement de toutes les sélections en une insertion
+    records = []
+    for index in sorted(scores):
+        item = datasets[index]
+        try:
+            selected_models = _rank(item, scores[index], analyses[index][1], snapshot)
+        except Exception as e:
+            results[index] = _error(item, e)
+            continue
+        records.append(_selection_record(item, selected_models))
+        results[index] = SelectResponse(
+            dataset_id=item.dataset_id,
+            task_type=item.task_type or "auto",
+            metric=item.metric,
+            selected_models=selected_models,
+            total_models_evaluated=len(selected_models),
+            cache=analyses[index][2]
+        ).model_dump()
+    # Échec de l'enregistrement : les sélections calculées sont tout de même renvoyées
+    persisted, persist_error = True, None
+    if records:
+        try:
+            save_model_selections(records)
+        except Exception as e:
+            persisted = False
+            persist_error = f"Erreur lors de l'enregistrement des sélections: {str(e)}"
+    
+    failed = sum(1 for result in results if "status_code" in result)
+    return {
+        "total": len(datasets),
+        "succeeded": len(datasets) - failed,
+        "failed": failed,
+        "persisted": persisted,
+        "persist_error": persist_error,
+        "results": results
+    }
+
+
+@router.post("/costs")
+def record_training_cost(request: TrainingCostRequest):
+    """
+    Enregistrer la durée et le pic mémoire mesurés d'un entraînement
+    
+    Les mesures calibrent les estimations de coût des sélections suivantes
+    (envoyées par l'Orchestrator à la fin de chaque entraînement).
+    """
+    if request.seconds <= 0 or request.num_samples < 1 or request.num_features < 1:
+        raise HTTPException(
+            status_code=400,
+            detail="seconds, num_samples et num_features doivent être positifs"
+        )
+    # Mesure rattachée à un modèle du registre (nom canonique), jamais à un nom inconnu
+    model = registry.snapshot.get(request.model_name)
+    if model is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Modèle absent du registre: {request.model_name}"
+        )
+    try:
+        record = save_training_cost(**{**request.model_dump(), "model_name": model.name})
+        model_selector.cost_model.invalidate()
+        return record
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de l'enregistrement du coût: {str(e)}"
+        )
+
+
 @router.get("/select/{dataset_id}/history")
 def get_selection_history(dataset_id: str):
     """
@@ -144,16 +387,21 @@ def get_selection_history(dataset_id: str):
 
 
 @router.get("/models")
-def list_all_models():
+def list_all_models(category: Optional[str] = Query(None, description="Catégorie (classical, ensemble...)")):
     """
     Liste tous les modèles disponibles dans le registre
     """
     try:
-        models = model_selector.list_all_models()
+        models = model_selector.list_all_models(category)
         return {
             "total_models": len(models),
             "models": models
         }
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Catégorie inconnue: {category}"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
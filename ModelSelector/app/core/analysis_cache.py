@@ -0,0 +1,161 @@
+"""
+Cache des analyses de datasets et des scores de compatibilité
+
+Deux niveaux : un LRU en mémoire du processus, puis PostgreSQL (tables
+dataset_analyses et model_compatibilities). Une analyse est identifiée par
+l'ETag de l'objet MinIO (taille et date de modification pour un fichier local),
+la colonne cible et ANALYZER_VERSION ; les scores par la clé de l'analyse, le
+type de tâche, SCORING_VERSION et la version du registre des modèles. Une sélection répétée sur un objet inchangé ne
+lit donc que ses métadonnées (stat) : ni téléchargement ni analyse.
+
+Les écritures en base sont faites au mieux : un échec est journalisé et le
+résultat calculé est tout de même renvoyé (et conservé en mémoire).
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.database import (
+    get_dataset_analysis, save_dataset_analysis,
+    get_model_compatibilities, save_model_compatibilities
+)
+from app.core.model_selector import ANALYZER_VERSION, SCORING_VERSION
+
+# Réutiliser les analyses et les scores déjà calculés ("false" pour toujours recalculer)
+ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() == "true"
+# Nombre d'entrées conservées en mémoire (analyses et scores confondus)
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "256"))
+
+logger = logging.getLogger(__name__)
+
+_cache: "OrderedDict[str, Any]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _get(key: str) -> Optional[Any]:
+    with _cache_lock:
+        if key not in _cache:
+            return None
+        _cache.move_to_end(key)
+        # Copie : l'appelant peut modifier le résultat sans altérer le cache
+        return copy.deepcopy(_cache[key])
+
+
+def _put(key: str, value: Any) -> None:
+    with _cache_lock:
+        _cache[key] = copy.deepcopy(value)
+        _cache.move_to_end(key)
+        while len(_cache) > ANALYSIS_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _digest(payload: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def analysis_key(etag: str, target_column: Optional[str]) -> str:
+    """Clé de cache de l'analyse d'un dataset"""
+    return _digest({"etag": etag, "target": target_column, "analyzer": ANALYZER_VERSION})
+
+
+def scores_key(analysis: str, task_type: str, registry_version: str) -> str:
+    """Clé de cache des scores de compatibilité pour une analyse, un type de tâche et un registre"""
+    return _digest({"analysis": analysis, "task_type": task_type, "scoring": SCORING_VERSION, "registry": registry_version})
+
+
+def cached_analysis(
+    key: str,
+    analyze: Callable[[], Dict[str, Any]],
+    dataset_path: str,
+    etag: str,
+    target_column: Optional[str]
+) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    Analyse d'un dataset, calculée seulement si elle n'est dans aucun des deux niveaux
+
+    Args:
+        key: Clé renvoyée par analysis_key
+        analyze: Fonction téléchargeant et analysant le dataset
+        dataset_path: Chemin du dataset (enregistré avec l'analyse)
+        etag: ETag de l'objet analysé
+        target_column: Colonne cible
+
+    Returns:
+        (caractéristiques du dataset, niveau qui les a fournies : "memory",
+        "database" ou None si elles viennent d'être calculées)
+    """
+    if ANALYSIS_CACHE_ENABLED:
+        info = _get(key)
+        if info is not None:
+            return info, "memory"
+        info = get_dataset_analysis(key)
+        if info is not None:
+            _put(key, info)
+            return info, "database"
+
+    info = analyze()
+    if ANALYSIS_CACHE_ENABLED:
+        _put(key, info)
+        try:
+            save_dataset_analysis(key, dataset_path, etag, target_column, info)
+        except Exception as e:
+            logger.warning("Analyse non enregistrée (%s): %s", dataset_path, e)
+    return info, None
+
+
+def lookup_scores(key: str) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+    """
+    Scores enregistrés sous une clé, dans l'un des deux niveaux
+
+    Returns:
+        (scores ou None, niveau qui les a fournis : "memory" ou "database")
+    """
+    if not ANALYSIS_CACHE_ENABLED:
+        return None, None
+    scores = _get(key)
+    if scores is not None:
+        return scores, "memory"
+    scores = get_model_compatibilities(key)
+    if scores:
+        _put(key, scores)
+        return scores, "database"
+    return None, None
+
+
+def store_scores(key: str, dataset_id: str, scores: List[Dict[str, Any]]) -> None:
+    """Enregistrer des scores calculés dans les deux niveaux (au mieux : un échec en base est journalisé)"""
+    if ANALYSIS_CACHE_ENABLED:
+        _put(key, scores)
+        try:
+            save_model_compatibilities(dataset_id, key, scores)
+        except Exception as e:
+            logger.warning("Scores non enregistrés (%s): %s", dataset_id, e)
+
+
+def cached_scores(
+    key: str,
+    score: Callable[[], List[Dict[str, Any]]],
+    dataset_id: str
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Scores de compatibilité de tous les modèles, calculés seulement s'ils ne sont dans aucun niveau
+
+    Args:
+        key: Clé renvoyée par scores_key
+        score: Fonction calculant les scores (ModelSelector.score_models)
+        dataset_id: Identifiant du dataset (enregistré avec les scores)
+
+    Returns:
+        (scores, niveau qui les a fournis : "memory", "database" ou None)
+    """
+    scores, level = lookup_scores(key)
+    if scores is not None:
+        return scores, level
+    scores = score()
+    store_scores(key, dataset_id, scores)
+    return scores, None
@@ -0,0 +1,175 @@
+"""
+Estimation du coût d'entraînement d'un modèle candidat
+
+Durée et pic mémoire suivent une loi de puissance des caractéristiques du
+dataset : secondes = coefficient * n^a * d^b et octets = facteur * 8 * n * d
+(+ mémoire fixe), avec n le nombre de lignes et d le nombre de features. Les
+exposants a priori reprennent la complexité de chaque algorithme (SVM et
+KNeighbors quadratiques en n, ensembles proportionnels au nombre d'arbres...).
+
+Les coefficients sont calibrés sur les entraînements passés du même modèle
+(table training_costs, alimentée par l'Orchestrator à partir des mesures du
+Trainer) : le rapport observé/estimé médian, en échelle logarithmique, corrige
+le coefficient a priori, d'autant plus fortement que les mesures sont nombreuses.
+"""
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Poids (en nombre d'entraînements) de l'estimation a priori face aux mesures
+COST_PRIOR_WEIGHT = float(os.getenv("COST_PRIOR_WEIGHT", "2"))
+# Durée (secondes) pendant laquelle les mesures chargées sont réutilisées
+COST_MODEL_REFRESH_INTERVAL = float(os.getenv("COST_MODEL_REFRESH_INTERVAL", "60"))
+# Part de la mémoire d'une matrice dense occupée par une entrée creuse (datasets sans colonne numérique)
+COST_SPARSE_MEMORY_FACTOR = float(os.getenv("COST_SPARSE_MEMORY_FACTOR", "0.5"))
+
+# Loi a priori par modèle : (coefficient, exposant de n, exposant de d, facteur mémoire, mémoire fixe en octets)
+PRIOR_COSTS = {
+    "LinearRegression": (1e-8, 1.0, 2.0, 2.0, 0),
+    "Ridge": (1e-8, 1.0, 2.0, 2.0, 0),
+    "Lasso": (5e-7, 1.0, 1.0, 2.0, 0),
+    "LogisticRegression": (1e-6, 1.0, 1.0, 3.0, 0),
+    "NaiveBayes": (1e-8, 1.0, 1.0, 1.5, 0),
+    "DecisionTree": (2e-7, 1.1, 1.0, 2.0, 0),
+    "RandomForest": (2e-5, 1.1, 0.5, 3.0, 0),
+    "GradientBoosting": (1e-5, 1.0, 1.0, 3.0, 0),
+    "AdaBoost": (2e-6, 1.0, 1.0, 2.0, 0),
+    "XGBoost": (1e-6, 1.0, 1.0, 2.0, 0),
+    # Noyau : quadratique en n, cache de noyau de 200 Mo (valeur par défaut de scikit-learn)
+    "SVM": (1e-8, 2.0, 1.0, 2.0, 200 * 1024 * 1024),
+    # Évaluation : distances entre exemples de test et d'entraînement
+    "KNeighbors": (2e-10, 2.0, 1.0, 2.0, 0),
+    "CNN": (5e-5, 1.0, 1.0, 2.0, 0),
+    "LSTM": (5e-5, 1.0, 1.0, 2.0, 0),
+}
+# Loi a priori des modèles du catalogue absents de PRIOR_COSTS, selon leur catégorie
+PRIOR_COSTS_BY_CATEGORY = {
+    "classical": (1e-7, 1.0, 1.0, 2.0, 0),
+    "ensemble": (1e-6, 1.1, 1.0, 3.0, 0),
+    "deep_learning": (5e-5, 1.0, 1.0, 2.0, 0),
+    "neural_network": (5e-5, 1.0, 1.0, 2.0, 0),
+}
+
+
+class CostModel:
+    """Estimations de durée et de mémoire d'entraînement, calibrées sur les mesures passées"""
+
+    def __init__(self, load_runs: Optional[Callable[[], List[Dict[str, Any]]]] = None):
+        """
+        Args:
+            load_runs: Fonction renvoyant les entraînements mesurés (dicts model_name,
+                num_samples, num_features, sparse, seconds, peak_memory_bytes) ;
+                None : estimations a priori uniquement
+        """
+        self.load_runs = load_runs
+        self._runs_by_model: Dict[str, List[Dict[str, Any]]] = {}
+        self._corrections: Dict[tuple, Dict[str, Any]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _prior(model) -> tuple:
+        return PRIOR_COSTS.get(model.name) or PRIOR_COSTS_BY_CATEGORY.get(model.category.value, PRIOR_COSTS_BY_CATEGORY["classical"])
+
+    @staticmethod
+    def _prior_estimate(prior: tuple, num_samples: int, num_features: int, sparse: bool, supports_sparse: bool):
+        coefficient, exponent_n, exponent_d, memory_factor, memory_fixed = prior
+        n, d = max(num_samples, 1), max(num_features, 1)
+        seconds = coefficient * n ** exponent_n * d ** exponent_d
+        memory = memory_factor * 8 * n * d
+        if sparse and supports_sparse:
+            memory *= COST_SPARSE_MEMORY_FACTOR
+        return seconds, memory + memory_fixed
+
+    def invalidate(self) -> None:
+        """Recharger les mesures à la prochaine estimation"""
+        with self._lock:
+            self._loaded_at = None
+
+    def _runs(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Mesures par modèle, rechargées au plus toutes les COST_MODEL_REFRESH_INTERVAL secondes"""
+        if self.load_runs is None:
+            return {}
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= COST_MODEL_REFRESH_INTERVAL:
+                runs: Dict[str, List[Dict[str, Any]]] = {}
+                for run in self.load_runs():
+                    runs.setdefault(run["model_name"], []).append(run)
+                self._runs_by_model = runs
+                self._corrections = {}
+                self._loaded_at = time.monotonic()
+            return self._runs_by_model
+
+    def _correction(self, model) -> Dict[str, Any]:
+        """Facteurs correctifs d'un modèle (mémorisés jusqu'au prochain rechargement des mesures)"""
+        runs = self._runs().get(model.name)
+        if not runs:
+            return {"seconds": 1.0, "memory": 1.0, "runs": 0}
+        prior = self._prior(model)
+        key = (model.name, prior, model.supports_sparse)
+        correction = self._corrections.get(key)
+        if correction is None:
+            seconds_residuals, memory_residuals = [], []
+            for run in runs:
+                seconds, memory = self._prior_estimate(
+                    prior, run["num_samples"], run["num_features"], bool(run.get("sparse")), model.supports_sparse
+                )
+                if run.get("seconds"):
+                    seconds_residuals.append(math.log(run["seconds"] / seconds))
+                if run.get("peak_memory_bytes"):
+                    memory_residuals.append(math.log(run["peak_memory_bytes"] / memory))
+            correction = {
+                "seconds": _shrunk_factor(seconds_residuals),
+                "memory": _shrunk_factor(memory_residuals),
+                "runs": len(runs),
+            }
+            self._corrections[key] = correction
+        return correction
+
+    def estimate_all(self, models: List[Any], dataset_info: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Estimations de plusieurs modèles pour un dataset
+
+        Args:
+            models: Modèles candidats (ModelCandidate)
+            dataset_info: Caractéristiques du dataset (num_samples, num_features, sparse)
+
+        Returns:
+            Par nom de modèle : estimated_training_seconds, estimated_peak_memory_bytes
+            et cost_calibration_runs (nombre d'entraînements mesurés pris en compte)
+        """
+        estimates = {}
+        for model in models:
+            seconds, memory = self._prior_estimate(
+                self._prior(model), dataset_info["num_samples"], dataset_info["num_features"],
+                bool(dataset_info.get("sparse")), model.supports_sparse
+            )
+            correction = self._correction(model)
+            estimates[model.name] = {
+                "estimated_training_seconds": round(seconds * correction["seconds"], 3),
+                "estimated_peak_memory_bytes": int(memory * correction["memory"]),
+                "cost_calibration_runs": correction["runs"],
+            }
+        return estimates
+
+
+def _shrunk_factor(log_residuals: List[float]) -> float:
+    """Facteur correctif : médiane des écarts logarithmiques, rapprochée de 1 quand les mesures sont peu nombreuses"""
+    if not log_residuals:
+        return 1.0
+    values = sorted(log_residuals)
+    middle = len(values) // 2
+    median = values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+    weight = len(values) / (len(values) + COST_PRIOR_WEIGHT)
+    return math.exp(weight * median)
+
+
+def fits_budget(estimate: Dict[str, Any], max_training_seconds: Optional[float], max_memory_bytes: Optional[int]) -> bool:
+    """Vrai si l'estimation respecte le budget (None : pas de limite)"""
+    if max_training_seconds is not None and estimate["estimated_training_seconds"] > max_training_seconds:
+        return False
+    if max_memory_bytes is not None and estimate["estimated_peak_memory_bytes"] > max_memory_bytes:
+        return False
+    return True
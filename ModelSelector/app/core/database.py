@@ -1,7 +1,7 @@
 """
 Module de gestion de la base de données pour ModelSelector
 """
-from sqlalchemy import create_engine, Column, String, Integer, JSON, DateTime, Float, Text
+from sqlalchemy import create_engine, Column, String, Integer, BigInteger, Boolean, JSON, DateTime, Float, Text, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -52,8 +52,36 @@ class ModelCompatibility(Base):
     id = Column(String, primary_key=True, index=True)
     dataset_id = Column(String, index=True)
     model_name = Column(String, index=True)
-    compatibility_score = Column(Float)
+    compatibility_score = Column(Float)  # None : modèle incompatible (raison dans reason)
     reason = Column(Text)
+    cache_key = Column(String, index=True)  # Clé des scores (analyse, type de tâche, versions)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class DatasetAnalysis(Base):
+    """Cache des analyses de datasets (clé : ETag de l'objet, cible et version de l'analyseur)"""
+    __tablename__ = "dataset_analyses"
+
+    id = Column(String, primary_key=True, index=True)
+    dataset_path = Column(String)
+    etag = Column(String)
+    target_column = Column(String, nullable=True)
+    dataset_info = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class TrainingCost(Base):
+    """Durée et pic mémoire mesurés d'un entraînement (calibration du modèle de coût)"""
+    __tablename__ = "training_costs"
+
+    id = Column(String, primary_key=True, index=True)
+    model_name = Column(String, index=True)
+    num_samples = Column(BigInteger)
+    num_features = Column(Integer)
+    sparse = Column(Boolean, default=False)
+    seconds = Column(Float)
+    peak_memory_bytes = Column(BigInteger, nullable=True)
+    job_id = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
@@ -75,6 +103,16 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 def init_db():
     """Initialiser les tables de la base de données"""
     Base.metadata.create_all(bind=engine)
+    _add_compatibility_columns()
+
+
+def _add_compatibility_columns():
+    """Ajouter cache_key à une table model_compatibilities créée avant le cache"""
+    existing = {col["name"] for col in inspect(engine).get_columns("model_compatibilities")}
+    if "cache_key" not in existing:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE model_compatibilities ADD COLUMN IF NOT EXISTS cache_key VARCHAR"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_model_compatibilities_cache_key ON model_compatibilities (cache_key)"))
 
 
 def save_model_selection(dataset_id: str, dataset_path: str, task_type: str, 
@@ -99,6 +137,37 @@ def save_model_selection(dataset_id: str, dataset_path: str, task_type: str,
         db.close()
 
 
+def save_model_selections(selections: list) -> int:
+    """
+    Sauvegarder plusieurs sélections de modèles en une seule insertion
+
+    Args:
+        selections: Liste de dicts portant les arguments de save_model_selection
+
+    Returns:
+        Nombre de lignes insérées
+    """
+    if not selections:
+        return 0
+    timestamp = datetime.utcnow().timestamp()
+    rows = [
+        {
+            "id": f"selection_{timestamp}_{index}",
+            "dataset_id": selection["dataset_id"],
+            "dataset_path": selection["dataset_path"],
+            "task_type": selection["task_type"],
+            "metric": selection["metric"],
+            "selected_models": selection["selected_models"],
+            "selection_config": selection["config"],
+            "created_at": datetime.utcnow()
+        }
+        for index, selection in enumerate(selections)
+    ]
+    with engine.begin() as conn:
+        conn.execute(ModelSelection.__table__.insert(), rows)
+    return len(rows)
+
+
 def get_model_selection(dataset_id: str) -> list:
     """Récupérer les sélections de modèles pour un dataset"""
     db = SessionLocal()
@@ -123,7 +192,7 @@ def get_model_selection(dataset_id: str) -> list:
 
 
 def save_model_compatibility(dataset_id: str, model_name: str, 
-                            score: float, reason: str) -> ModelCompatibility:
+                            score: float, reason: str, cache_key: str = None) -> ModelCompatibility:
     """Sauvegarder une compatibilité modèle/dataset"""
     db = SessionLocal()
     try:
@@ -132,7 +201,8 @@ def save_model_compatibility(dataset_id: str, model_name: str,
             dataset_id=dataset_id,
             model_name=model_name,
             compatibility_score=score,
-            reason=reason
+            reason=reason,
+            cache_key=cache_key
         )
         db.add(compatibility)
         db.commit()
@@ -163,6 +233,118 @@ def get_model_compatibility(dataset_id: str, model_name: str) -> dict:
         db.close()
 
 
+def save_model_compatibilities(dataset_id: str, cache_key: str, scores: list) -> None:
+    """
+    Sauvegarder en une transaction les compatibilités de tous les modèles pour une clé de scores
+
+    Args:
+        dataset_id: Identifiant du dataset (informatif)
+        cache_key: Clé des scores
+        scores: Liste de {"name", "compatibility_score", "reason"}
+    """
+    db = SessionLocal()
+    try:
+        for score in scores:
+            # Identifiant déterministe : un calcul concurrent de la même clé remplace la ligne
+            db.merge(ModelCompatibility(
+                id=f"comp_{cache_key[:32]}_{score['name']}",
+                dataset_id=dataset_id,
+                model_name=score["name"],
+                compatibility_score=score["compatibility_score"],
+                reason=score["reason"],
+                cache_key=cache_key
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def get_model_compatibilities(cache_key: str) -> list:
+    """Compatibilités enregistrées pour une clé de scores (liste vide si absentes)"""
+    db = SessionLocal()
+    try:
+        rows = db.query(ModelCompatibility).filter(ModelCompatibility.cache_key == cache_key).all()
+        return [
+            {
+                "name": row.model_name,
+                "compatibility_score": row.compatibility_score,
+                "reason": row.reason
+            }
+            for row in rows
+        ]
+    finally:
+        db.close()
+
+
+def save_dataset_analysis(key: str, dataset_path: str, etag: str,
+                          target_column: str, dataset_info: dict) -> None:
+    """Sauvegarder l'analyse d'un dataset sous sa clé de cache"""
+    db = SessionLocal()
+    try:
+        db.merge(DatasetAnalysis(
+            id=key,
+            dataset_path=dataset_path,
+            etag=etag,
+            target_column=target_column,
+            dataset_info=dataset_info
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def get_dataset_analysis(key: str) -> dict:
+    """Récupérer l'analyse enregistrée sous une clé de cache (None si absente)"""
+    db = SessionLocal()
+    try:
+        analysis = db.query(DatasetAnalysis).filter(DatasetAnalysis.id == key).first()
+        return analysis.dataset_info if analysis else None
+    finally:
+        db.close()
+
+
+def save_training_cost(model_name: str, num_samples: int, num_features: int, seconds: float,
+                       peak_memory_bytes: int = None, sparse: bool = False, job_id: str = None) -> dict:
+    """Enregistrer la durée et le pic mémoire mesurés d'un entraînement"""
+    db = SessionLocal()
+    try:
+        cost = TrainingCost(
+            id=f"cost_{model_name}_{job_id or datetime.utcnow().timestamp()}",
+            model_name=model_name,
+            num_samples=num_samples,
+            num_features=num_features,
+            sparse=sparse,
+            seconds=seconds,
+            peak_memory_bytes=peak_memory_bytes,
+            job_id=job_id
+        )
+        db.merge(cost)  # Même job signalé deux fois : une seule mesure
+        db.commit()
+        return {"id": cost.id, "model_name": model_name}
+    finally:
+        db.close()
+
+
+def list_training_costs(limit: int = 5000) -> list:
+    """Entraînements mesurés les plus récents, tous modèles confondus"""
+    db = SessionLocal()
+    try:
+        costs = db.query(TrainingCost).order_by(TrainingCost.created_at.desc()).limit(limit).all()
+        return [
+            {
+                "model_name": c.model_name,
+                "num_samples": c.num_samples,
+                "num_features": c.num_features,
+                "sparse": bool(c.sparse),
+                "seconds": c.seconds,
+                "peak_memory_bytes": c.peak_memory_bytes
+            }
+            for c in costs
+        ]
+    finally:
+        db.close()
+
+
 def save_model_to_catalogue(model_data: dict) -> ModelCatalogue:
     """Ajouter un modèle au catalogue"""
     db = SessionLocal()
@@ -181,7 +363,7 @@ def save_model_to_catalogue(model_data: dict) -> ModelCatalogue:
             recommended_for_tabular=str(model_data.get("recommended_for_tabular", True)),
             default_hyperparameters=model_data.get("hyperparameters", {})
         )
-        db.merge(model)  # Utiliser merge pour éviter les doublons
+        model = db.merge(model)  # Utiliser merge pour éviter les doublons
         db.commit()
         db.refresh(model)
         return model
@@ -189,6 +371,22 @@ def save_model_to_catalogue(model_data: dict) -> ModelCatalogue:
         db.close()
 
 
+def _catalogue_to_dict(model: ModelCatalogue) -> dict:
+    return {
+        "name": model.model_name,
+        "category": model.category,
+        "task_types": model.task_types,
+        "supports_sparse": model.supports_sparse.lower() == "true",
+        "requires_gpu": model.requires_gpu.lower() == "true",
+        "min_samples": model.min_samples,
+        "max_features": model.max_features,
+        "recommended_for_text": model.recommended_for_text.lower() == "true",
+        "recommended_for_images": model.recommended_for_images.lower() == "true",
+        "recommended_for_tabular": model.recommended_for_tabular.lower() == "true",
+        "hyperparameters": model.default_hyperparameters
+    }
+
+
 def get_model_from_catalogue(model_name: str) -> dict:
     """Récupérer un modèle du catalogue"""
     db = SessionLocal()
@@ -198,24 +396,22 @@ def get_model_from_catalogue(model_name: str) -> dict:
         ).first()
         
         if model:
-            return {
-                "name": model.model_name,
-                "category": model.category,
-                "task_types": model.task_types,
-                "supports_sparse": model.supports_sparse.lower() == "true",
-                "requires_gpu": model.requires_gpu.lower() == "true",
-                "min_samples": model.min_samples,
-                "max_features": model.max_features,
-                "recommended_for_text": model.recommended_for_text.lower() == "true",
-                "recommended_for_images": model.recommended_for_images.lower() == "true",
-                "recommended_for_tabular": model.recommended_for_tabular.lower() == "true",
-                "hyperparameters": model.default_hyperparameters
-            }
+            return _catalogue_to_dict(model)
         return None
     finally:
         db.close()
 
 
+def list_catalogue() -> list:
+    """Tous les modèles du catalogue, dans l'ordre d'insertion"""
+    db = SessionLocal()
+    try:
+        models = db.query(ModelCatalogue).order_by(ModelCatalogue.created_at, ModelCatalogue.id).all()
+        return [_catalogue_to_dict(model) for model in models]
+    finally:
+        db.close()
+
+
 # Initialiser la base de données au démarrage
 init_db()
 
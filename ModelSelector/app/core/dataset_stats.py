@@ -0,0 +1,141 @@
+"""
+Statistiques d'un dataset accumulées chunk par chunk, en mémoire bornée
+
+Chaque colonne garde un résumé de taille fixe : type, valeurs non nulles,
+longueur totale des chaînes, maximum des valeurs numériques, et un compteur de
+valeurs distinctes (ensemble exact tant qu'il reste petit, puis HyperLogLog).
+La mémoire ne dépend que du nombre de colonnes et de la taille d'un chunk, pas
+du nombre de lignes.
+"""
+import math
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+
+# Précision HyperLogLog : 2^12 registres (erreur relative ~1,6 %)
+HLL_PRECISION = 12
+# Nombre de valeurs distinctes comptées exactement avant de passer à l'estimation
+EXACT_DISTINCT_LIMIT = 1024
+
+
+class HyperLogLog:
+    """Estimateur du nombre de valeurs distinctes, en mémoire constante"""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values: np.ndarray) -> None:
+        if len(values) == 0:
+            return
+        hashes = pd.util.hash_array(values)
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype(np.int64)
+        rest = hashes & np.uint64((1 << width) - 1)
+        # Rang du premier bit à 1 dans les bits restants (width + 1 si tous nuls)
+        rank = np.full(len(rest), width + 1, dtype=np.int64)
+        nonzero = rest > 0
+        rank[nonzero] = width - np.floor(np.log2(rest[nonzero].astype(np.float64))).astype(np.int64)
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Petites cardinalités : comptage linéaire
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+
+class DistinctCounter:
+    """Nombre de valeurs distinctes : exact jusqu'à EXACT_DISTINCT_LIMIT, estimé au-delà"""
+
+    def __init__(self):
+        self.values = set()
+        self.sketch = HyperLogLog()
+
+    @property
+    def exact(self) -> bool:
+        return self.values is not None
+
+    def update(self, values: np.ndarray) -> None:
+        self.sketch.update(values)
+        if self.values is not None:
+            self.values.update(pd.unique(values).tolist())
+            if len(self.values) > EXACT_DISTINCT_LIMIT:
+                self.values = None
+
+    def count(self) -> int:
+        return len(self.values) if self.values is not None else self.sketch.estimate()
+
+
+def _kind(dtype) -> str:
+    if pd.api.types.is_bool_dtype(dtype):
+        return "bool"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "numeric"
+    if isinstance(dtype, pd.CategoricalDtype):
+        return "category"
+    if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+        return "text"
+    return "other"
+
+
+class ColumnStats:
+    """Résumé de taille fixe d'une colonne"""
+
+    def __init__(self, dtype, distinct: bool = False):
+        self.dtype = dtype
+        self.kind = _kind(dtype)
+        self.count = 0
+        self.length_total = 0
+        self.length_count = 0
+        self.maximum = None
+        self.distinct = DistinctCounter() if distinct else None
+
+    def update(self, series: pd.Series, lengths: bool = False, maximum: bool = False) -> None:
+        """
+        Ajouter un chunk de la colonne
+
+        Args:
+            series: Valeurs du chunk
+            lengths: Accumuler la longueur des chaînes
+            maximum: Accumuler le maximum des valeurs numériques
+        """
+        kind = _kind(series.dtype)
+        if kind != self.kind:
+            # Types différents d'un chunk à l'autre (ex. entiers puis texte) :
+            # la colonne lue d'un bloc aurait été de type object
+            self.kind, self.dtype = "text", np.dtype(object)
+        elif series.dtype != self.dtype and pd.api.types.is_float_dtype(series.dtype):
+            # Entiers puis flottants : float64 pour la colonne entière
+            self.dtype = series.dtype
+        values = series.dropna()
+        self.count += len(values)
+        if len(values) == 0:
+            return
+        if self.distinct is not None:
+            self.distinct.update(values.to_numpy())
+        if lengths and kind == "text":
+            lens = values.astype(str).str.len()
+            self.length_total += int(lens.sum())
+            self.length_count += len(lens)
+        if maximum and kind == "numeric":
+            chunk_max = values.max()
+            if self.maximum is None or chunk_max > self.maximum:
+                self.maximum = chunk_max
+
+    @property
+    def mean_length(self) -> Optional[float]:
+        return self.length_total / self.length_count if self.length_count else None
+
+    @property
+    def is_float_or_int64(self) -> bool:
+        """Même test que la détection de tâche sur un DataFrame chargé entièrement"""
+        return str(self.dtype) in ("float64", "int64")
+
+
+def columns_by_kind(stats: Dict[str, ColumnStats], *kinds: str) -> list:
+    return [name for name, column in stats.items() if column.kind in kinds]
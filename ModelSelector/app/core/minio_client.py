@@ -22,6 +22,26 @@ client = Minio(
 )
 
 
+def _split_path(path: str, bucket: Optional[str] = None):
+    """Séparer bucket et nom d'objet (s3://bucket/file, bucket/file ou juste file)"""
+    bucket_name = bucket or MINIO_BUCKET
+    path = path.replace("s3://", "")
+    if "/" in path:
+        if path.startswith(bucket_name + "/"):
+            return bucket_name, path[len(bucket_name) + 1:]
+        return tuple(path.split("/", 1))
+    return bucket_name, path
+
+
+def stat_minio_object(path: str, bucket: Optional[str] = None):
+    """Métadonnées d'un objet MinIO (taille, ETag...) sans le télécharger"""
+    bucket_name, file_path = _split_path(path, bucket)
+    try:
+        return client.stat_object(bucket_name, file_path)
+    except S3Error as e:
+        raise Exception(f"Erreur lors de la lecture depuis MinIO: {e}")
+
+
 def download_file_from_minio(path: str, bucket: Optional[str] = None) -> str:
     """
     Télécharger un fichier depuis MinIO
@@ -33,17 +53,7 @@ def download_file_from_minio(path: str, bucket: Optional[str] = None) -> str:
     Returns:
         Chemin local du fichier téléchargé
     """
-    bucket_name = bucket or MINIO_BUCKET
-    
-    # Nettoyer le path
-    path = path.replace("s3://", "")
-    if "/" in path:
-        if path.startswith(bucket_name + "/"):
-            file_path = path[len(bucket_name) + 1:]
-        else:
-            bucket_name, file_path = path.split("/", 1)
-    else:
-        file_path = path
+    bucket_name, file_path = _split_path(path, bucket)
     
     # Créer un fichier temporaire
     _, ext = os.path.splitext(file_path)
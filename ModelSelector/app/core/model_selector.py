@@ -1,10 +1,31 @@
 """
 Module de sélection automatique de modèles basé sur les caractéristiques du dataset
 """
+import copy
+import hashlib
+import io
+import json
+import os
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional, Any
+import pyarrow.parquet as pq
+from types import MappingProxyType
+from typing import Dict, List, Optional, Any, Tuple
 from enum import Enum
+from app.core.dataset_stats import ColumnStats, columns_by_kind
+from app.core.cost_model import CostModel, fits_budget
+
+# Nombre de lignes lues à la fois pendant l'analyse d'un dataset
+ANALYZE_CHUNK_SIZE = int(os.getenv("ANALYZE_CHUNK_SIZE", "50000"))
+# Nombre maximal de lignes analysées (0 : tout le dataset)
+ANALYZE_MAX_ROWS = int(os.getenv("ANALYZE_MAX_ROWS", "1000000"))
+# Blocs de lignes répartis sur un CSV de plus de ANALYZE_MAX_ROWS lignes
+ANALYZE_CSV_BLOCKS = int(os.getenv("ANALYZE_CSV_BLOCKS", "8"))
+# Versions de l'analyse et du calcul des scores, incluses dans les clés de cache :
+# à incrémenter quand le résultat de DatasetAnalyzer.analyze ou de
+# ModelSelector.score_models change pour un même dataset
+ANALYZER_VERSION = "4"
+SCORING_VERSION = "1"
 
 
 class TaskType(str, Enum):
@@ -65,14 +86,85 @@ class ModelCandidate:
             "recommended_for_text": self.recommended_for_text,
             "recommended_for_images": self.recommended_for_images,
             "recommended_for_tabular": self.recommended_for_tabular,
-            "hyperparameters": self.hyperparameters,
+            "hyperparameters": copy.deepcopy(self.hyperparameters),
             "compatibility_score": self.compatibility_score,
             "reason": self.reason
         }
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ModelCandidate":
+        """Modèle candidat à partir d'une entrée du catalogue (voir database.list_catalogue)"""
+        return cls(
+            name=data["name"],
+            category=ModelCategory(data["category"]),
+            task_types=[TaskType(t) for t in data.get("task_types") or []],
+            supports_sparse=data.get("supports_sparse", False),
+            requires_gpu=data.get("requires_gpu", False),
+            min_samples=data.get("min_samples") or 0,
+            max_features=data.get("max_features"),
+            recommended_for_text=data.get("recommended_for_text", False),
+            recommended_for_images=data.get("recommended_for_images", False),
+            recommended_for_tabular=data.get("recommended_for_tabular", True),
+            hyperparameters=data.get("hyperparameters")
+        )
+
+
+class RegistrySnapshot:
+    """
+    Ensemble immuable de modèles, indexé par nom, type de tâche et catégorie
+
+    Construit une fois (au démarrage ou au rechargement du catalogue) puis
+    partagé entre les requêtes : les modèles ne sont jamais modifiés, les
+    scores sont portés par les dictionnaires renvoyés par ModelSelector. La
+    version (empreinte du contenu) entre dans les clés du cache des scores.
+    """
+
+    def __init__(self, models: List[ModelCandidate]):
+        self.models: Tuple[ModelCandidate, ...] = tuple(models)
+        self._by_name = MappingProxyType({model.name.lower(): model for model in self.models})
+        self._positions = MappingProxyType({model.name: index for index, model in enumerate(self.models)})
+        self._by_task = MappingProxyType({
+            task_type: tuple(model for model in self.models if task_type in model.task_types)
+            for task_type in TaskType
+        })
+        self._by_category = MappingProxyType({
+            category: tuple(model for model in self.models if model.category == category)
+            for category in ModelCategory
+        })
+        content = sorted((model.to_dict() for model in self.models), key=lambda model: model["name"])
+        self.version = hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+    def __len__(self) -> int:
+        return len(self.models)
+
+    def get(self, name: str) -> Optional[ModelCandidate]:
+        """Modèle par nom (insensible à la casse)"""
+        return self._by_name.get(name.lower())
+
+    def position(self, name: str) -> Optional[int]:
+        """Rang du modèle dans le registre (ordre de départage à score égal)"""
+        return self._positions.get(name)
+
+    def for_task(self, task_type: TaskType) -> Tuple[ModelCandidate, ...]:
+        """Modèles supportant un type de tâche, dans l'ordre du registre"""
+        return self._by_task[task_type]
+
+    def for_category(self, category: ModelCategory) -> Tuple[ModelCandidate, ...]:
+        """Modèles d'une catégorie, dans l'ordre du registre"""
+        return self._by_category[category]
+
 
 class ModelRegistry:
-    """Registre des modèles disponibles avec leurs métadonnées"""
+    """
+    Registre des modèles disponibles avec leurs métadonnées
+
+    get_all_models décrit le catalogue intégré ; snapshot est la vue indexée
+    utilisée pour la sélection (voir registry.CatalogueRegistry pour la version
+    synchronisée avec la table model_catalogue).
+    """
+    
+    def __init__(self):
+        self.snapshot = RegistrySnapshot(self.get_all_models())
     
     @staticmethod
     def get_all_models() -> List[ModelCandidate]:
@@ -253,7 +345,17 @@ class ModelRegistry:
 
 
 class DatasetAnalyzer:
-    """Analyse un dataset pour déterminer ses caractéristiques"""
+    """
+    Analyse un dataset pour déterminer ses caractéristiques
+
+    Le dataset est lu par chunks de ANALYZE_CHUNK_SIZE lignes et résumé colonne
+    par colonne (dataset_stats) : la mémoire est bornée par la taille d'un chunk,
+    quelle que soit la taille du fichier. Au-delà de ANALYZE_MAX_ROWS lignes,
+    l'analyse porte sur un échantillon réparti sur tout le fichier : des blocs de
+    lignes lus au début de tranches d'octets régulièrement espacées pour un CSV
+    (le nombre total de lignes est alors estimé d'après la taille du fichier),
+    des row groups pour un Parquet.
+    """
     
     @staticmethod
     def analyze(dataset_path: str, target_column: Optional[str] = None) -> Dict[str, Any]:
@@ -261,45 +363,244 @@ class DatasetAnalyzer:
         Analyse un dataset et retourne ses caractéristiques
         
         Args:
-            dataset_path: Chemin vers le dataset (CSV)
+            dataset_path: Chemin vers le dataset (CSV ou Parquet)
             target_column: Nom de la colonne cible (optionnel)
         
         Returns:
-            Dictionnaire avec les caractéristiques du dataset
+            Dictionnaire avec les caractéristiques du dataset, la taille de
+            l'échantillon analysé (sample_size) et la part du dataset qu'il
+            représente (confidence, 1.0 si tout a été lu)
+        """
+        if os.path.splitext(dataset_path)[1].lower() == ".parquet":
+            return DatasetAnalyzer._analyze_parquet(dataset_path, target_column)
+        return DatasetAnalyzer._analyze_csv(dataset_path, target_column)
+    
+    @staticmethod
+    def _analyze_csv(dataset_path: str, target_column: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Analyse un CSV par chunks
+
+        Le fichier est lu séquentiellement par pandas jusqu'à ANALYZE_MAX_ROWS
+        lignes : un fichier sous la limite est ainsi lu en entier. Au-delà,
+        l'analyse porte sur ANALYZE_CSV_BLOCKS blocs de lignes lus au début de
+        tranches d'octets régulièrement espacées, comme l'aperçu du DataPreparer.
+        Si un bloc ne peut être lu (champ entre guillemets sur plusieurs lignes
+        coupé par une tranche), l'analyse des premières lignes est conservée.
         """
         try:
-            df = pd.read_csv(dataset_path)
+            size = os.path.getsize(dataset_path)
+            stats, sample_size, num_samples, complete = DatasetAnalyzer._read_csv_head(dataset_path, target_column, size)
         except Exception as e:
             raise ValueError(f"Impossible de charger le dataset: {e}")
         
+        if not complete:
+            blocks = max(ANALYZE_CSV_BLOCKS, 1)
+            block_stats: Dict[str, ColumnStats] = {}
+            try:
+                with open(dataset_path, "rb") as f:
+                    header = f.readline()
+                    block_size, estimate, _ = DatasetAnalyzer._read_csv_blocks(
+                        f, header, block_stats, target_column, blocks, -(-ANALYZE_MAX_ROWS // blocks), size
+                    )
+            except (pd.errors.ParserError, UnicodeDecodeError, ValueError):
+                pass
+            else:
+                # Le fichier compte au moins les lignes lues séquentiellement
+                stats, sample_size, num_samples = block_stats, block_size, max(estimate, num_samples)
+        return DatasetAnalyzer._describe(stats, num_samples, sample_size, target_column)
+    
+    @staticmethod
+    def _read_csv_head(dataset_path: str, target_column: Optional[str], size: int) -> Tuple[Dict[str, ColumnStats], int, int, bool]:
+        """
+        Analyser les premières lignes d'un CSV (au plus ANALYZE_MAX_ROWS)
+
+        Returns:
+            (résumés des colonnes, lignes analysées, nombre de lignes du fichier -
+            estimé d'après la position de lecture si la fin n'a pas été atteinte -,
+            True si tout le fichier a été lu)
+        """
+        stats: Dict[str, ColumnStats] = {}
+        sample_size, rows_read, position, complete = 0, 0, 0, True
+        with open(dataset_path, "rb") as f:
+            for chunk in pd.read_csv(f, chunksize=ANALYZE_CHUNK_SIZE):
+                position = f.tell()
+                rows_read += len(chunk)
+                if ANALYZE_MAX_ROWS and sample_size + len(chunk) >= ANALYZE_MAX_ROWS:
+                    complete = len(chunk) == ANALYZE_MAX_ROWS - sample_size and position >= size
+                    chunk = chunk.iloc[:ANALYZE_MAX_ROWS - sample_size]
+                DatasetAnalyzer._update(stats, chunk, target_column, images=True)
+                sample_size += len(chunk)
+                if not complete:
+                    break
+        # Fin de fichier non atteinte : nombre de lignes estimé d'après la position
+        # de lecture (tampon du parser compris : estimation par défaut)
+        num_samples = sample_size if complete or not position else max(int(rows_read * size / position), rows_read)
+        return stats, sample_size, num_samples, complete
+    
+    @staticmethod
+    def _read_csv_blocks(f, header: bytes, stats: Dict[str, ColumnStats], target_column: Optional[str],
+                         blocks: int, block_rows: Optional[int], size: int) -> Tuple[int, int, bool]:
+        """
+        Analyser un bloc de lignes au début de chaque tranche d'octets du fichier
+
+        Returns:
+            (lignes analysées, nombre de lignes du fichier - estimé d'après la
+            longueur moyenne des lignes lues dans chaque tranche incomplète -,
+            True si toutes les tranches ont été lues entièrement)
+        """
+        stratum = (size - len(header)) // blocks
+        sample_size, num_samples, complete = 0, 0.0, True
+        for index in range(blocks):
+            offset = len(header) + index * stratum
+            end = size if index == blocks - 1 else offset + stratum
+            # Fin de la ligne coupée par le début de la tranche (lue avec la tranche précédente)
+            f.seek(offset - 1)
+            f.readline()
+            rows, read, position = DatasetAnalyzer._read_csv_lines(f, header, stats, target_column, block_rows, end)
+            sample_size += rows
+            if position >= end:
+                num_samples += rows
+            else:
+                complete = False
+                num_samples += rows * (end - offset) / read
+        return sample_size, max(int(round(num_samples)), sample_size), complete
+    
+    @staticmethod
+    def _read_csv_lines(f, header: bytes, stats: Dict[str, ColumnStats], target_column: Optional[str],
+                        max_rows: Optional[int], end: int) -> Tuple[int, int, int]:
+        """
+        Analyser les lignes qui commencent entre la position courante et end
+
+        Args:
+            f: Fichier CSV ouvert en binaire, positionné au début d'une ligne
+            header: Ligne d'en-tête du fichier
+            max_rows: Nombre maximal de lignes lues (None : pas de limite)
+            end: Position à partir de laquelle plus aucune ligne n'est commencée
+
+        Returns:
+            (lignes analysées, octets lus, position atteinte)
+        """
+        start = position = f.tell()
+        rows, lines = 0, []
+        while (max_rows is None or rows + len(lines) < max_rows) and position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            lines.append(line)
+            if len(lines) == ANALYZE_CHUNK_SIZE:
+                rows += DatasetAnalyzer._update_csv(stats, header, lines, target_column)
+                lines = []
+        if lines:
+            rows += DatasetAnalyzer._update_csv(stats, header, lines, target_column)
+        return rows, position - start, position
+    
+    @staticmethod
+    def _update_csv(stats: Dict[str, ColumnStats], header: bytes, lines: List[bytes], target_column: Optional[str]) -> int:
+        """Ajouter des lignes CSV aux résumés des colonnes (renvoie le nombre de lignes lues)"""
+        chunk = pd.read_csv(io.BytesIO(header + b"".join(lines)))
+        DatasetAnalyzer._update(stats, chunk, target_column, images=True)
+        return len(chunk)
+    
+    @staticmethod
+    def _analyze_parquet(dataset_path: str, target_column: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Analyse un dataset Parquet sans le charger entièrement
+        
+        Le nombre de lignes et les dtypes sont lus dans le footer ; seules la cible
+        et les colonnes textuelles (et numériques si le test « images » s'applique)
+        sont lues, par chunks et dans des row groups répartis sur le fichier si le
+        dataset dépasse ANALYZE_MAX_ROWS lignes.
+        """
+        try:
+            parquet_file = pq.ParquetFile(dataset_path)
+            # DataFrame vide portant les dtypes enregistrés dans le schéma
+            schema = parquet_file.schema_arrow.empty_table().to_pandas()
+        except Exception as e:
+            raise ValueError(f"Impossible de charger le dataset: {e}")
+        
+        stats = {col: ColumnStats(dtype, distinct=col == target_column) for col, dtype in schema.dtypes.items()}
+        num_features = len(schema.columns) - (1 if target_column else 0)
+        numeric = columns_by_kind(stats, "numeric")
+        images = num_features > 100 and len(numeric) == num_features
+        columns = columns_by_kind(stats, "text")
+        if target_column in schema.columns:
+            columns.append(target_column)
+        if images:
+            columns.extend(numeric)
+        
+        metadata = parquet_file.metadata
+        row_groups = DatasetAnalyzer._sample_row_groups(
+            [metadata.row_group(index).num_rows for index in range(metadata.num_row_groups)]
+        )
+        sample_size = 0
+        if columns and row_groups:
+            batches = parquet_file.iter_batches(
+                batch_size=ANALYZE_CHUNK_SIZE,
+                row_groups=row_groups,
+                columns=list(dict.fromkeys(columns))
+            )
+            for batch in batches:
+                chunk = batch.to_pandas()
+                DatasetAnalyzer._update(stats, chunk, target_column, images=images)
+                sample_size += len(chunk)
+        else:
+            sample_size = sum(metadata.row_group(index).num_rows for index in row_groups)
+        return DatasetAnalyzer._describe(stats, metadata.num_rows, sample_size, target_column)
+    
+    @staticmethod
+    def _sample_row_groups(sizes: List[int]) -> List[int]:
+        """Row groups régulièrement espacés totalisant environ ANALYZE_MAX_ROWS lignes (au moins un)"""
+        if not ANALYZE_MAX_ROWS or sum(sizes) <= ANALYZE_MAX_ROWS:
+            return list(range(len(sizes)))
+        count = max(1, int(ANALYZE_MAX_ROWS * len(sizes) / sum(sizes)))
+        return np.unique(np.linspace(0, len(sizes) - 1, num=count).round().astype(int)).tolist()
+    
+    @staticmethod
+    def _update(stats: Dict[str, ColumnStats], chunk: pd.DataFrame, target_column: Optional[str], images: bool) -> None:
+        """Ajouter un chunk aux résumés des colonnes"""
+        for col in chunk.columns:
+            if col not in stats:
+                stats[col] = ColumnStats(chunk[col].dtype, distinct=col == target_column)
+            stats[col].update(chunk[col], lengths=True, maximum=images)
+    
+    @staticmethod
+    def _describe(stats: Dict[str, ColumnStats], num_samples: int, sample_size: int, target_column: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Caractéristiques d'un dataset
+        
+        Args:
+            stats: Résumé de chaque colonne (au minimum la cible et les colonnes textuelles lues)
+            num_samples: Nombre de lignes du dataset (estimé si le CSV n'a pas été lu jusqu'au bout)
+            sample_size: Nombre de lignes analysées
+            target_column: Nom de la colonne cible (optionnel)
+        """
         # Déterminer le type de tâche
         task_type = TaskType.CLASSIFICATION
-        if target_column and target_column in df.columns:
-            target = df[target_column]
-            if target.dtype in ['float64', 'int64']:
-                unique_values = target.nunique()
-                if unique_values > 20 or unique_values / len(target) > 0.9:
+        if target_column and target_column in stats:
+            target = stats[target_column]
+            if target.is_float_or_int64 and sample_size:
+                unique_values = target.distinct.count()
+                if unique_values > 20 or unique_values / sample_size > 0.9:
                     task_type = TaskType.REGRESSION
                 else:
                     task_type = TaskType.CLASSIFICATION
         
         # Caractéristiques
-        num_samples = len(df)
-        num_features = len(df.columns) - (1 if target_column else 0)
-        num_numeric = len(df.select_dtypes(include=[np.number]).columns)
-        num_categorical = len(df.select_dtypes(include=['object', 'category']).columns)
+        num_features = len(stats) - (1 if target_column else 0)
+        num_numeric = len(columns_by_kind(stats, "numeric"))
+        num_categorical = len(columns_by_kind(stats, "text", "category"))
         
         # Vérifier si c'est des données textuelles (colonnes avec beaucoup de texte)
-        has_text_data = False
-        for col in df.select_dtypes(include=['object']).columns:
-            if df[col].str.len().mean() > 50:
-                has_text_data = True
-                break
+        has_text_data = any(
+            (column.mean_length or 0) > 50 for column in stats.values() if column.kind == "text"
+        )
         
         # Vérifier si c'est potentiellement des images (nombreuses colonnes avec valeurs 0-255)
         has_image_data = False
         if num_features > 100 and num_numeric == num_features:
-            if df.select_dtypes(include=[np.number]).max().max() <= 255:
+            maxima = [column.maximum for column in stats.values() if column.maximum is not None]
+            if not maxima or max(maxima) <= 255:
                 has_image_data = True
         
         return {
@@ -311,16 +612,19 @@ class DatasetAnalyzer:
             "has_text_data": has_text_data,
             "has_image_data": has_image_data,
             "sparse": num_numeric == 0,
-            "target_column": target_column
+            "target_column": target_column,
+            "sample_size": sample_size,
+            "confidence": round(min(sample_size / num_samples, 1.0), 4) if num_samples else 1.0
         }
 
 
 class ModelSelector:
     """Sélectionne les modèles les plus adaptés à un dataset"""
     
-    def __init__(self):
-        self.registry = ModelRegistry()
+    def __init__(self, registry: Optional[ModelRegistry] = None, cost_model: Optional[CostModel] = None):
+        self.registry = registry or ModelRegistry()
         self.analyzer = DatasetAnalyzer()
+        self.cost_model = cost_model or CostModel()
     
     def select_models(
         self,
@@ -329,7 +633,9 @@ class ModelSelector:
         task_type: Optional[str] = None,
         metric: str = "accuracy",
         max_models: int = 5,
-        require_gpu: bool = False
+        require_gpu: bool = False,
+        max_training_seconds: Optional[float] = None,
+        max_memory_bytes: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """
         Sélectionne les modèles les plus adaptés
@@ -341,105 +647,215 @@ class ModelSelector:
             metric: Métrique à optimiser
             max_models: Nombre maximum de modèles à retourner
             require_gpu: Si True, ne retourne que les modèles nécessitant GPU
+            max_training_seconds: Durée d'entraînement estimée maximale (None : pas de limite)
+            max_memory_bytes: Pic mémoire estimé maximal en octets (None : pas de limite)
         
         Returns:
-            Liste des modèles candidats avec scores de compatibilité
+            Liste des modèles candidats avec scores de compatibilité et estimations de coût
         """
         # Analyser le dataset
         dataset_info = self.analyzer.analyze(dataset_path, target_column)
+        return self.rank_models(
+            self.score_models(dataset_info, task_type),
+            max_models,
+            require_gpu,
+            dataset_info=dataset_info,
+            max_training_seconds=max_training_seconds,
+            max_memory_bytes=max_memory_bytes
+        )
+    
+    def score_models(
+        self,
+        dataset_info: Dict[str, Any],
+        task_type: Optional[str] = None,
+        snapshot: Optional[RegistrySnapshot] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Score de compatibilité des modèles du registre supportant le type de tâche
+        
+        Ne dépend que de l'analyse, du type de tâche et de la version du registre :
+        le résultat peut être mis en cache (voir analysis_cache) et réutilisé quels
+        que soient max_models et require_gpu.
+        
+        Args:
+            dataset_info: Caractéristiques renvoyées par DatasetAnalyzer.analyze
+            task_type: Type de tâche imposé - celui détecté si None
+            snapshot: Registre à utiliser (celui en vigueur si None)
+        
+        Returns:
+            Liste de {"name", "compatibility_score", "reason"} dans l'ordre du registre ;
+            compatibility_score vaut None pour un modèle incompatible
+        """
+        return self.score_models_batch([dataset_info], [task_type], snapshot)[0]
+    
+    def score_models_batch(
+        self,
+        dataset_infos: List[Dict[str, Any]],
+        task_types: List[Optional[str]],
+        snapshot: Optional[RegistrySnapshot] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Scores de compatibilité de plusieurs datasets en une passe vectorisée
+        
+        Seuls les modèles supportant l'un des types de tâche du lot (index
+        for_task du registre) sont évalués ; les règles le sont sur des matrices
+        datasets x modèles (numpy) et seules les raisons sont assemblées modèle
+        par modèle.
+        
+        Args:
+            dataset_infos: Caractéristiques de chaque dataset
+            task_types: Type de tâche imposé pour chaque dataset (None : celui détecté)
+            snapshot: Registre à utiliser (celui en vigueur si None)
+        
+        Returns:
+            Pour chaque dataset, le résultat qu'aurait renvoyé score_models
+        """
+        snapshot = snapshot or self.registry.snapshot
+        if not dataset_infos:
+            return []
         
         # Utiliser le task_type fourni ou celui détecté
-        if task_type:
-            dataset_info["task_type"] = task_type.lower()
+        tasks = [
+            TaskType(task_type.lower() if task_type else info["task_type"])
+            for info, task_type in zip(dataset_infos, task_types)
+        ]
         
-        task_type_enum = TaskType(dataset_info["task_type"])
+        # Modèles éligibles pour au moins un dataset du lot, dans l'ordre du registre
+        eligible = {model.name: model for task in dict.fromkeys(tasks) for model in snapshot.for_task(task)}
+        models = sorted(eligible.values(), key=lambda model: snapshot.position(model.name))
         
-        # Obtenir tous les modèles
-        all_models = self.registry.get_all_models()
+        # Caractéristiques des datasets (lignes) et des modèles (colonnes)
+        num_samples = np.array([info["num_samples"] for info in dataset_infos])[:, None]
+        num_features = np.array([info["num_features"] for info in dataset_infos])[:, None]
+        text = np.array([info["has_text_data"] for info in dataset_infos], dtype=bool)[:, None]
+        images = np.array([info["has_image_data"] for info in dataset_infos], dtype=bool)[:, None]
         
-        # Filtrer et scorer les modèles
-        candidates = []
+        def attribute(name: str) -> np.ndarray:
+            return np.array([bool(getattr(model, name)) for model in models], dtype=bool)[None, :]
+        
+        category = np.array([model.category.value for model in models])[None, :]
+        ensemble = category == ModelCategory.ENSEMBLE.value
+        classical = category == ModelCategory.CLASSICAL.value
+        deep = category == ModelCategory.DEEP_LEARNING.value
+        supports_task = np.array([[task in model.task_types for model in models] for task in tasks], dtype=bool)
+        min_samples = np.array([model.min_samples for model in models])[None, :]
+        max_features = np.array([model.max_features or 0 for model in models])[None, :]
+        
+        # Vérifier la compatibilité de base
+        too_few_samples = num_samples < min_samples
+        too_many_features = (max_features > 0) & (num_features > max_features)
+        
+        # Règles de score, dans l'ordre où leurs raisons sont présentées
+        rules = [
+            (2.0, "Recommandé pour données textuelles", text & attribute("recommended_for_text")),
+            (2.0, "Recommandé pour données images", images & attribute("recommended_for_images")),
+            (2.0, "Recommandé pour données tabulaires", ~text & ~images & attribute("recommended_for_tabular")),
+            (1.0, "Adapté aux gros datasets", (num_samples >= 10000) & (ensemble | deep)),
+            (1.0, "Adapté aux petits datasets", (num_samples < 1000) & classical),
+            (0.5, "Supporte les datasets avec nombreuses features", (num_features > 100) & attribute("supports_sparse")),
+            (1.5, "Modèle d'ensemble performant", ensemble),
+            (0.5, "Modèle classique rapide", classical),
+            (1.0, "Modèle très performant pour données tabulaires",
+             np.array([model.name in ["XGBoost", "RandomForest"] for model in models], dtype=bool)[None, :]),
+        ]
+        shape = supports_task.shape
+        masks = [np.broadcast_to(mask, shape) for _, _, mask in rules]
+        scores = sum(weight * mask for (weight, _, _), mask in zip(rules, masks))
+        
+        results = []
+        for row in range(shape[0]):
+            dataset_scores = []
+            for column, model in enumerate(models):
+                if not supports_task[row, column]:
+                    continue
+                if too_few_samples[row, column]:
+                    dataset_scores.append({"name": model.name, "compatibility_score": None, "reason": "Pas assez d'exemples"})
+                    continue
+                if too_many_features[row, column]:
+                    dataset_scores.append({"name": model.name, "compatibility_score": None, "reason": "Trop de features"})
+                    continue
+                reasons = [reason for (_, reason, _), mask in zip(rules, masks) if mask[row, column]]
+                dataset_scores.append({
+                    "name": model.name,
+                    "compatibility_score": float(scores[row, column]),
+                    "reason": "; ".join(reasons) if reasons else "Compatible avec le dataset"
+                })
+            results.append(dataset_scores)
+        return results
+    
+    def rank_models(
+        self,
+        scores: List[Dict[str, Any]],
+        max_models: int = 5,
+        require_gpu: bool = False,
+        snapshot: Optional[RegistrySnapshot] = None,
+        dataset_info: Optional[Dict[str, Any]] = None,
+        max_training_seconds: Optional[float] = None,
+        max_memory_bytes: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Modèles compatibles les mieux notés
+        
+        Avec dataset_info, chaque candidat reçoit ses estimations de durée et de
+        mémoire d'entraînement (cost_model) ; les candidats qui dépassent le budget
+        sont écartés et, à score égal, le moins coûteux passe devant.
         
-        for model in all_models:
-            # Vérifier la compatibilité de base
-            if task_type_enum not in model.task_types:
+        Args:
+            scores: Résultat de score_models
+            max_models: Nombre maximum de modèles à retourner
+            require_gpu: Si True, ne retourne que les modèles nécessitant GPU
+            snapshot: Registre ayant servi au calcul des scores (celui en vigueur si None)
+            dataset_info: Caractéristiques du dataset (None : pas d'estimation de coût)
+            max_training_seconds: Durée d'entraînement estimée maximale (None : pas de limite)
+            max_memory_bytes: Pic mémoire estimé maximal en octets (None : pas de limite)
+        
+        Returns:
+            Liste des modèles candidats avec scores de compatibilité (et estimations de coût)
+        """
+        snapshot = snapshot or self.registry.snapshot
+        candidates = []
+        for score in scores:
+            model = snapshot.get(score["name"])
+            if model is None or score["compatibility_score"] is None:
                 continue
-            
             if require_gpu and not model.requires_gpu:
                 continue
-            
-            if dataset_info["num_samples"] < model.min_samples:
-                continue
-            
-            if model.max_features and dataset_info["num_features"] > model.max_features:
-                continue
-            
-            # Calculer le score de compatibilité
-            score = 0.0
-            reasons = []
-            
-            # Score basé sur le type de données
-            if dataset_info["has_text_data"] and model.recommended_for_text:
-                score += 2.0
-                reasons.append("Recommandé pour données textuelles")
-            
-            if dataset_info["has_image_data"] and model.recommended_for_images:
-                score += 2.0
-                reasons.append("Recommandé pour données images")
-            
-            if not dataset_info["has_text_data"] and not dataset_info["has_image_data"] and model.recommended_for_tabular:
-                score += 2.0
-                reasons.append("Recommandé pour données tabulaires")
-            
-            # Score basé sur la taille du dataset
-            if dataset_info["num_samples"] >= 10000:
-                if model.category == ModelCategory.ENSEMBLE or model.category == ModelCategory.DEEP_LEARNING:
-                    score += 1.0
-                    reasons.append("Adapté aux gros datasets")
-            elif dataset_info["num_samples"] < 1000:
-                if model.category == ModelCategory.CLASSICAL:
-                    score += 1.0
-                    reasons.append("Adapté aux petits datasets")
-            
-            # Score basé sur le nombre de features
-            if dataset_info["num_features"] > 100:
-                if model.supports_sparse:
-                    score += 0.5
-                    reasons.append("Supporte les datasets avec nombreuses features")
-            
-            # Score basé sur la catégorie (les ensembles sont souvent meilleurs)
-            if model.category == ModelCategory.ENSEMBLE:
-                score += 1.5
-                reasons.append("Modèle d'ensemble performant")
-            elif model.category == ModelCategory.CLASSICAL:
-                score += 0.5
-                reasons.append("Modèle classique rapide")
-            
-            # Bonus pour XGBoost et RandomForest (généralement très performants)
-            if model.name in ["XGBoost", "RandomForest"]:
-                score += 1.0
-                reasons.append("Modèle très performant pour données tabulaires")
-            
-            model.compatibility_score = score
-            model.reason = "; ".join(reasons) if reasons else "Compatible avec le dataset"
-            
-            candidates.append(model)
-        
-        # Trier par score de compatibilité
-        candidates.sort(key=lambda x: x.compatibility_score, reverse=True)
-        
-        # Retourner les top modèles
-        return [model.to_dict() for model in candidates[:max_models]]
+            candidates.append((score, snapshot.position(model.name), model))
+        
+        estimates = {}
+        if dataset_info is not None:
+            estimates = self.cost_model.estimate_all([model for _, _, model in candidates], dataset_info)
+            candidates = [
+                candidate for candidate in candidates
+                if fits_budget(estimates[candidate[2].name], max_training_seconds, max_memory_bytes)
+            ]
+        
+        # Trier par score de compatibilité ; à score égal, le moins coûteux puis l'ordre du registre
+        candidates.sort(key=lambda x: (
+            -x[0]["compatibility_score"],
+            estimates[x[2].name]["estimated_training_seconds"] if estimates else 0,
+            x[1]
+        ))
+        
+        # Retourner les top modèles (les modèles du registre ne sont jamais modifiés)
+        return [
+            dict(
+                model.to_dict(),
+                compatibility_score=score["compatibility_score"],
+                reason=score["reason"],
+                **estimates.get(model.name, {})
+            )
+            for score, _, model in candidates[:max_models]
+        ]
     
     def get_model_details(self, model_name: str) -> Optional[Dict[str, Any]]:
         """Récupère les détails d'un modèle spécifique"""
-        all_models = self.registry.get_all_models()
-        for model in all_models:
-            if model.name.lower() == model_name.lower():
-                return model.to_dict()
-        return None
+        model = self.registry.snapshot.get(model_name)
+        return model.to_dict() if model else None
     
-    def list_all_models(self) -> List[Dict[str, Any]]:
-        """Liste tous les modèles disponibles"""
-        return [model.to_dict() for model in self.registry.get_all_models()]
+    def list_all_models(self, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Liste tous les modèles disponibles (d'une catégorie si category est fourni)"""
+        snapshot = self.registry.snapshot
+        models = snapshot.for_category(ModelCategory(category.lower())) if category else snapshot.models
+        return [model.to_dict() for model in models]
 
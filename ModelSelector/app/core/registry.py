@@ -0,0 +1,98 @@
+"""
+Registre des modèles synchronisé avec la table model_catalogue
+
+Au démarrage, le catalogue est initialisé avec les modèles intégrés s'il est
+vide, puis lu une fois pour construire un RegistrySnapshot immuable et indexé.
+Un thread relit le catalogue toutes les REGISTRY_RELOAD_INTERVAL secondes et
+remplace le snapshot (affectation atomique) lorsque son contenu a changé : les
+requêtes en cours gardent le snapshot qu'elles ont pris.
+"""
+import logging
+import os
+import threading
+from typing import Optional
+
+from app.core.model_selector import ModelCandidate, ModelRegistry, RegistrySnapshot
+from app.core.database import list_catalogue, save_model_to_catalogue
+
+# Intervalle de relecture du catalogue (secondes) ; 0 : pas de rechargement automatique
+REGISTRY_RELOAD_INTERVAL = float(os.getenv("REGISTRY_RELOAD_INTERVAL", "30"))
+# Initialiser un catalogue vide avec les modèles intégrés
+REGISTRY_SEED_CATALOGUE = os.getenv("REGISTRY_SEED_CATALOGUE", "true").lower() == "true"
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogueRegistry(ModelRegistry):
+    """Registre dont le snapshot est construit à partir de model_catalogue et rechargé à chaud"""
+
+    def __init__(self):
+        # Catalogue intégré tant que la base n'a pas été lue (ou si elle est indisponible)
+        super().__init__()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def reload(self) -> bool:
+        """
+        Relire le catalogue et remplacer le snapshot si son contenu a changé
+
+        Les entrées invalides (catégorie ou type de tâche inconnus) sont ignorées ;
+        un catalogue vide laisse le snapshot en place.
+
+        Returns:
+            True si le snapshot a été remplacé
+        """
+        with self._lock:
+            models = []
+            for entry in list_catalogue():
+                try:
+                    models.append(ModelCandidate.from_dict(entry))
+                except (KeyError, ValueError) as e:
+                    logger.warning("Entrée du catalogue ignorée (%s): %s", entry.get("name"), e)
+            if not models:
+                return False
+            snapshot = RegistrySnapshot(models)
+            if snapshot.version == self.snapshot.version:
+                return False
+            self.snapshot = snapshot
+            logger.info("Registre rechargé: %d modèles (version %s)", len(snapshot), snapshot.version)
+            return True
+
+    def _seed(self) -> None:
+        if list_catalogue():
+            return
+        for model in self.get_all_models():
+            save_model_to_catalogue(model.to_dict())
+
+    def _run(self) -> None:
+        while not self._stop.wait(REGISTRY_RELOAD_INTERVAL):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.warning("Rechargement du catalogue impossible: %s", e)
+
+    def start(self) -> None:
+        """Synchroniser le registre avec le catalogue et lancer le rechargement périodique"""
+        try:
+            if REGISTRY_SEED_CATALOGUE:
+                self._seed()
+            self.reload()
+        except Exception as e:
+            # Base indisponible : le catalogue intégré reste en service jusqu'au prochain rechargement
+            logger.warning("Lecture du catalogue impossible, catalogue intégré utilisé: %s", e)
+        if REGISTRY_RELOAD_INTERVAL > 0 and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="registry-reload", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Arrêter le rechargement périodique"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+# Registre partagé par les endpoints
+registry = CatalogueRegistry()
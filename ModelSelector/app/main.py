@@ -4,6 +4,8 @@ Point d'entrée principal du microservice ModelSelector
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.select import router as select_router
+from app.core.model_selector import TaskType, ModelCategory
+from app.core.registry import registry
 
 app = FastAPI(
     title="ModelSelector Service",
@@ -24,6 +26,17 @@ app.add_middleware(
 app.include_router(select_router, prefix="/api/v1", tags=["select"])
 
 
+@app.on_event("startup")
+def load_registry():
+    """Construire le registre des modèles à partir de model_catalogue et lancer son rechargement"""
+    registry.start()
+
+
+@app.on_event("shutdown")
+def stop_registry():
+    registry.stop()
+
+
 @app.get("/")
 def root():
     return {
@@ -42,14 +55,13 @@ def health():
 @app.get("/info")
 def info():
     """Informations sur le service"""
-    from app.core.model_selector import ModelSelector
-    selector = ModelSelector()
-    models = selector.list_all_models()
+    snapshot = registry.snapshot
     
     return {
         "service": "ModelSelector",
-        "total_models": len(models),
-        "supported_task_types": ["classification", "regression", "clustering", "time_series"],
-        "model_categories": ["classical", "ensemble", "deep_learning", "neural_network"]
+        "total_models": len(snapshot),
+        "registry_version": snapshot.version,
+        "supported_task_types": [t.value for t in TaskType],
+        "model_categories": [c.value for c in ModelCategory]
     }
 
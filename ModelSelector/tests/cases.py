@@ -0,0 +1,27 @@
+import itertools
+
+from app.core.model_selector import ModelCandidate, ModelCategory, ModelRegistry, RegistrySnapshot, TaskType
+
+
+def dataset_infos():
+    """Caractéristiques couvrant chaque règle de score (taille, features, texte, images, tâche)"""
+    infos = []
+    for num_samples, num_features, text, images, task in itertools.product(
+        [5, 50, 500, 5000, 50000], [3, 80, 150, 1000], [False, True], [False, True],
+        ["classification", "regression", "clustering"]
+    ):
+        infos.append({
+            "num_samples": num_samples,
+            "num_features": num_features,
+            "has_text_data": text,
+            "has_image_data": images,
+            "task_type": task,
+        })
+    return infos
+
+
+def snapshot_with_clustering() -> RegistrySnapshot:
+    """Catalogue intégré complété d'un modèle n'acceptant que le clustering"""
+    models = ModelRegistry.get_all_models()
+    models.append(ModelCandidate("KMeans", ModelCategory.CLASSICAL, [TaskType.CLUSTERING], max_features=50))
+    return RegistrySnapshot(models)
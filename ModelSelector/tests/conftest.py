@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Base SQLite jetable : les modules de l'application créent leur moteur à l'import
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "model_selector.db"))
+
+# Les tests importent le service comme au démarrage de l'application (paquet app)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,83 @@
+"""Cache des analyses et des scores : mémoire, puis base, puis recalcul"""
+import pandas as pd
+import pytest
+
+from app.api import select
+from app.core import analysis_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(analysis_cache, "ANALYSIS_CACHE_ENABLED", True)
+    monkeypatch.setattr(analysis_cache, "_cache", analysis_cache.OrderedDict())
+
+
+def counting(result):
+    """Fonction de calcul renvoyant une copie de result, et la liste de ses appels"""
+    calls = []
+    return calls, lambda: calls.append(1) or result.copy()
+
+
+def analysis(etag, analyze):
+    return analysis_cache.cached_analysis(
+        analysis_cache.analysis_key(etag, "y"), analyze, "datasets/a.csv", etag, "y"
+    )
+
+
+def test_analysis_memory_then_database_then_miss_on_new_etag(monkeypatch):
+    calls, analyze = counting({"task_type": "classification", "n_samples": 10})
+    assert analysis("etag-1", analyze) == ({"task_type": "classification", "n_samples": 10}, None)
+    assert analysis("etag-1", analyze)[1] == "memory"
+    monkeypatch.setattr(analysis_cache, "_cache", analysis_cache.OrderedDict())
+    info, level = analysis("etag-1", analyze)
+    assert level == "database" and info["n_samples"] == 10
+    assert analysis("etag-1", analyze)[1] == "memory"
+    assert len(calls) == 1
+    # Objet modifié : nouvel ETag, nouvelle analyse
+    assert analysis("etag-2", analyze)[1] is None
+    assert len(calls) == 2
+
+
+def test_disabled_cache_always_recomputes(monkeypatch):
+    monkeypatch.setattr(analysis_cache, "ANALYSIS_CACHE_ENABLED", False)
+    calls, analyze = counting({"task_type": "regression"})
+    assert [analysis("etag-disabled", analyze)[1] for _ in range(2)] == [None, None]
+    assert len(calls) == 2
+    assert analysis_cache.get_dataset_analysis(analysis_cache.analysis_key("etag-disabled", "y")) is None
+    key = analysis_cache.scores_key("analysis-disabled", "regression", "v1")
+    analysis_cache.store_scores(key, "dataset", [{"model_name": "Ridge", "score": 0.5}])
+    assert analysis_cache.lookup_scores(key) == (None, None)
+
+
+def test_scores_are_keyed_by_registry_version():
+    scores = [{"model_name": "Ridge", "score": 0.5}]
+    calls, score_list = counting(scores)
+    first = analysis_cache.scores_key("analysis-registry", "regression", "v1")
+    assert analysis_cache.cached_scores(first, score_list, "dataset") == (scores, None)
+    assert analysis_cache.cached_scores(first, score_list, "dataset") == (scores, "memory")
+    second = analysis_cache.scores_key("analysis-registry", "regression", "v2")
+    assert second != first
+    assert analysis_cache.cached_scores(second, score_list, "dataset") == (scores, None)
+    assert len(calls) == 2
+
+
+def test_cache_write_failures_do_not_fail_the_selection(tmp_path, monkeypatch):
+    def unavailable(*args):
+        raise RuntimeError("base indisponible")
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(select.model_selector.cost_model, "load_runs", None)
+    monkeypatch.setattr(analysis_cache, "save_dataset_analysis", unavailable)
+    monkeypatch.setattr(analysis_cache, "save_model_compatibilities", unavailable)
+    monkeypatch.setattr(select, "save_model_selection", lambda **record: record)
+    monkeypatch.setattr(select, "save_model_selections", lambda records: len(records))
+    pd.DataFrame({"x": range(200), "y": [i % 2 for i in range(200)]}).to_csv("a.csv", index=False)
+    request = select.SelectRequest(dataset_id="a", dataset_path="a.csv", target_column="y")
+
+    response = select.select_models(request)
+    assert response.selected_models and response.cache is None
+    # Résultats conservés en mémoire malgré l'échec de l'écriture en base
+    assert select.select_models(request).cache == "memory"
+    monkeypatch.setattr(analysis_cache, "_cache", analysis_cache.OrderedDict())
+    batch = select.select_models_batch(select.BatchSelectRequest(datasets=[request]))
+    assert batch["succeeded"] == 1
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core import model_selector
+from app.core.model_selector import DatasetAnalyzer
+
+
+def write_dataset(path, rows, seed=0):
+    """CSV dont la colonne de texte long n'apparaît que dans le dernier tiers du fichier"""
+    rng = np.random.default_rng(seed)
+    late = np.arange(rows) >= rows * 2 // 3
+    pd.DataFrame({
+        "x": rng.normal(size=rows).round(6),
+        "city": rng.choice(["Paris", "Lyon", "Lille"], size=rows),
+        "comment": np.where(late, "commentaire " * 8, ""),
+        "y": rng.integers(0, 3, size=rows),
+    }).to_csv(path, index=False)
+
+
+def full_analysis(path, target_column):
+    """Analyse de référence : fichier lu entièrement par pandas"""
+    df = pd.read_csv(path)
+    stats = {}
+    DatasetAnalyzer._update(stats, df, target_column, images=True)
+    return DatasetAnalyzer._describe(stats, len(df), len(df), target_column)
+
+
+@pytest.mark.parametrize("rows", [1, 999, 1000, 2500])
+def test_small_csv_is_read_entirely(tmp_path, monkeypatch, rows):
+    monkeypatch.setattr(model_selector, "ANALYZE_CHUNK_SIZE", 300)
+    monkeypatch.setattr(model_selector, "ANALYZE_MAX_ROWS", 4000)
+    path = tmp_path / "small.csv"
+    write_dataset(path, rows)
+    info = DatasetAnalyzer.analyze(str(path), "y")
+    assert info == full_analysis(path, "y")
+    assert info["confidence"] == 1.0
+
+
+def test_large_csv_samples_blocks_across_the_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_selector, "ANALYZE_CHUNK_SIZE", 300)
+    monkeypatch.setattr(model_selector, "ANALYZE_MAX_ROWS", 2000)
+    monkeypatch.setattr(model_selector, "ANALYZE_CSV_BLOCKS", 8)
+    path = tmp_path / "large.csv"
+    write_dataset(path, 40000)
+    info = DatasetAnalyzer.analyze(str(path), "y")
+    # Les premières lignes seules ne contiennent pas la colonne de texte long
+    assert full_analysis(path, "y")["has_text_data"] and info["has_text_data"]
+    assert info["sample_size"] == 2000
+    assert info["num_samples"] == pytest.approx(40000, rel=0.05)
+    assert info["confidence"] == pytest.approx(0.05, rel=0.05)
+
+
+def test_blocks_start_on_whole_lines(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_selector, "ANALYZE_MAX_ROWS", 40)
+    monkeypatch.setattr(model_selector, "ANALYZE_CSV_BLOCKS", 4)
+    path = tmp_path / "lines.csv"
+    pd.DataFrame({"id": range(1000), "label": [f"ligne {i}" for i in range(1000)]}).to_csv(path, index=False)
+    seen = []
+    update = DatasetAnalyzer._update
+    monkeypatch.setattr(DatasetAnalyzer, "_update", staticmethod(
+        lambda stats, chunk, *args, **kwargs: seen.extend(chunk["id"]) or update(stats, chunk, *args, **kwargs)
+    ))
+    DatasetAnalyzer.analyze(str(path), None)
+    # Premières lignes lues séquentiellement, puis quatre blocs de lignes entières
+    # et consécutives, un par quart du fichier
+    assert seen[:40] == list(range(40))
+    seen = seen[40:]
+    assert len(seen) == len(set(seen)) == 40
+    assert [min(seen[i:i + 10]) // 250 for i in range(0, 40, 10)] == [0, 1, 2, 3]
+    assert all(b - a == 1 for i in range(0, 40, 10) for a, b in zip(seen[i:i + 9], seen[i + 1:i + 10]))
+
+
+def test_header_only_csv(tmp_path):
+    path = tmp_path / "empty.csv"
+    path.write_text("a,b,y\n")
+    info = DatasetAnalyzer.analyze(str(path), "y")
+    assert (info["num_samples"], info["num_features"], info["sample_size"]) == (0, 2, 0)
+
+
+def write_multiline(path, rows):
+    """CSV valide dont un champ entre guillemets s'étend sur plusieurs lignes"""
+    pd.DataFrame({
+        "id": range(rows),
+        "note": [f"ligne {i}\nsuite, avec virgule\n\"citée\"" if i % 3 else "" for i in range(rows)],
+        "y": [i % 2 for i in range(rows)],
+    }).to_csv(path, index=False)
+
+
+def test_multiline_fields_below_the_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_selector, "ANALYZE_CHUNK_SIZE", 300)
+    path = tmp_path / "multiline.csv"
+    write_multiline(path, 2000)
+    assert DatasetAnalyzer.analyze(str(path), "y") == full_analysis(path, "y")
+
+
+def test_unreadable_blocks_fall_back_to_the_first_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_selector, "ANALYZE_CHUNK_SIZE", 300)
+    monkeypatch.setattr(model_selector, "ANALYZE_MAX_ROWS", 1000)
+    path = tmp_path / "multiline.csv"
+    write_multiline(path, 20000)
+
+    def unreadable(*args, **kwargs):
+        raise pd.errors.ParserError("EOF inside string")
+
+    monkeypatch.setattr(DatasetAnalyzer, "_update_csv", staticmethod(unreadable))
+    info = DatasetAnalyzer.analyze(str(path), "y")
+    head = pd.read_csv(path, nrows=1000)
+    stats = {}
+    DatasetAnalyzer._update(stats, head, "y", images=True)
+    assert info["sample_size"] == 1000 and info["num_samples"] > 1000
+    assert info == DatasetAnalyzer._describe(stats, info["num_samples"], 1000, "y")
+
+
+def test_multiline_fields_above_the_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_selector, "ANALYZE_CHUNK_SIZE", 300)
+    monkeypatch.setattr(model_selector, "ANALYZE_MAX_ROWS", 1000)
+    path = tmp_path / "multiline.csv"
+    write_multiline(path, 20000)
+    info = DatasetAnalyzer.analyze(str(path), "y")
+    assert info["sample_size"] <= 1000 and info["num_samples"] > 1000
@@ -0,0 +1,140 @@
+import math
+
+import pytest
+from fastapi import HTTPException
+
+from app.api import select
+from app.core import cost_model
+from app.core.cost_model import PRIOR_COSTS, CostModel, _shrunk_factor, fits_budget
+from app.core.model_selector import ModelRegistry, ModelSelector
+
+MODELS = {model.name: model for model in ModelRegistry.get_all_models()}
+
+
+@pytest.mark.parametrize("name", sorted(PRIOR_COSTS))
+def test_prior_follows_its_exponents(name):
+    prior = PRIOR_COSTS[name]
+    _, exponent_n, exponent_d, memory_factor, memory_fixed = prior
+    seconds, memory = CostModel._prior_estimate(prior, 10000, 20, False, False)
+    assert CostModel._prior_estimate(prior, 20000, 20, False, False)[0] / seconds == pytest.approx(2 ** exponent_n)
+    assert CostModel._prior_estimate(prior, 10000, 40, False, False)[0] / seconds == pytest.approx(2 ** exponent_d)
+    assert memory == memory_factor * 8 * 10000 * 20 + memory_fixed
+
+
+def test_quadratic_models_dominate_on_large_datasets():
+    small = CostModel().estimate_all(MODELS.values(), {"num_samples": 1000, "num_features": 20})
+    large = CostModel().estimate_all(MODELS.values(), {"num_samples": 1000000, "num_features": 20})
+    growth = {name: large[name]["estimated_training_seconds"] / max(small[name]["estimated_training_seconds"], 1e-3)
+              for name in ("SVM", "KNeighbors", "LogisticRegression")}
+    assert growth["SVM"] > 100 * growth["LogisticRegression"]
+    assert growth["KNeighbors"] > 100 * growth["LogisticRegression"]
+
+
+def test_sparse_memory_only_for_models_accepting_sparse_input():
+    prior = PRIOR_COSTS["LogisticRegression"]
+    dense = CostModel._prior_estimate(prior, 1000, 10, True, False)[1]
+    sparse = CostModel._prior_estimate(prior, 1000, 10, True, True)[1]
+    assert sparse == pytest.approx(dense * cost_model.COST_SPARSE_MEMORY_FACTOR)
+    # Dimensions nulles ramenées à 1
+    assert CostModel._prior_estimate(prior, 0, 0, False, False)[0] == pytest.approx(prior[0])
+
+
+def test_shrunk_factor(monkeypatch):
+    monkeypatch.setattr(cost_model, "COST_PRIOR_WEIGHT", 2.0)
+    assert _shrunk_factor([]) == 1.0
+    # Une mesure : un tiers de l'écart logarithmique
+    assert _shrunk_factor([math.log(8)]) == pytest.approx(2.0)
+    # Médiane (nombre pair : moyenne des deux valeurs centrales), insensible aux extrêmes
+    assert _shrunk_factor([0.0, 1.0, 3.0, 100.0]) == pytest.approx(math.exp(4 / 6 * 2.0))
+    assert _shrunk_factor([math.log(10)] * 998) == pytest.approx(10, rel=0.01)
+
+
+def test_calibration_on_measured_runs(monkeypatch):
+    prior = PRIOR_COSTS["SVM"]
+    seconds, memory = CostModel._prior_estimate(prior, 5000, 10, False, False)
+    runs = [{"model_name": "SVM", "num_samples": 5000, "num_features": 10,
+             "seconds": seconds * 10, "peak_memory_bytes": int(memory / 2)}] * 8
+    calls = []
+    model = CostModel(lambda: calls.append(1) or runs)
+    estimate = model.estimate_all([MODELS["SVM"], MODELS["Ridge"]], {"num_samples": 5000, "num_features": 10})
+    weight = 8 / (8 + cost_model.COST_PRIOR_WEIGHT)
+    assert estimate["SVM"]["estimated_training_seconds"] == pytest.approx(seconds * 10 ** weight, rel=1e-3)
+    assert estimate["SVM"]["estimated_peak_memory_bytes"] == pytest.approx(memory * 0.5 ** weight, rel=1e-6)
+    assert estimate["SVM"]["cost_calibration_runs"] == 8
+    assert estimate["Ridge"]["cost_calibration_runs"] == 0
+    # Mesures rechargées seulement après invalidation (ou COST_MODEL_REFRESH_INTERVAL)
+    model.estimate_all([MODELS["SVM"]], {"num_samples": 10, "num_features": 1})
+    assert len(calls) == 1
+    model.invalidate()
+    model.estimate_all([MODELS["SVM"]], {"num_samples": 10, "num_features": 1})
+    assert len(calls) == 2
+
+
+def test_fits_budget():
+    estimate = {"estimated_training_seconds": 10.0, "estimated_peak_memory_bytes": 1000}
+    assert fits_budget(estimate, None, None)
+    assert fits_budget(estimate, 10.0, 1000)
+    assert not fits_budget(estimate, 9.9, None)
+    assert not fits_budget(estimate, None, 999)
+
+
+def scores(*names, score=2.0):
+    return [{"name": name, "compatibility_score": score, "reason": ""} for name in names]
+
+
+def test_rank_excludes_candidates_over_budget():
+    selector = ModelSelector()
+    info = {"num_samples": 1000000, "num_features": 20}
+    ranked = selector.rank_models(scores("SVM", "KNeighbors", "LogisticRegression", "Ridge"),
+                                  dataset_info=info, max_training_seconds=600)
+    assert [model["name"] for model in ranked] == ["Ridge", "LogisticRegression"]
+    assert all(model["estimated_training_seconds"] <= 600 for model in ranked)
+    memory = selector.rank_models(scores("SVM", "Ridge"), dataset_info=info, max_memory_bytes=400 * 1024 * 1024)
+    assert [model["name"] for model in memory] == ["Ridge"]
+
+
+def test_rank_breaks_ties_on_cost():
+    selector = ModelSelector()
+    names = ["RandomForest", "NaiveBayes", "GradientBoosting", "DecisionTree"]
+    info = {"num_samples": 100000, "num_features": 50}
+    ranked = selector.rank_models(scores(*names) + scores("SVM", score=3.0), dataset_info=info)
+    assert ranked[0]["name"] == "SVM"
+    seconds = [model["estimated_training_seconds"] for model in ranked[1:]]
+    assert seconds == sorted(seconds)
+    # Sans estimation de coût : ordre du registre
+    snapshot = selector.registry.snapshot
+    unranked = selector.rank_models(scores(*names))
+    assert [model["name"] for model in unranked] == sorted(names, key=snapshot.position)
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    records = []
+    monkeypatch.setattr(select, "save_training_cost", lambda **record: records.append(record) or record)
+    return records
+
+
+def cost_request(**fields):
+    return select.TrainingCostRequest(**{"model_name": "SVM", "num_samples": 1000, "num_features": 10, "seconds": 2.0, **fields})
+
+
+def test_costs_are_stored_under_the_registry_name(saved):
+    select.model_selector.cost_model._loaded_at = 0.0
+    select.record_training_cost(cost_request(model_name="svm"))
+    assert saved[0]["model_name"] == "SVM"
+    # Mesures rechargées à la prochaine estimation
+    assert select.model_selector.cost_model._loaded_at is None
+
+
+@pytest.mark.parametrize("fields", [
+    {"model_name": "random_forest_clf"},
+    {"model_name": "SimpleNN"},
+    {"seconds": 0},
+    {"num_samples": 0},
+    {"num_features": 0},
+])
+def test_invalid_costs_are_rejected(saved, fields):
+    with pytest.raises(HTTPException) as error:
+        select.record_training_cost(cost_request(**fields))
+    assert error.value.status_code == 400
+    assert saved == []
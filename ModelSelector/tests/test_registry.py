@@ -0,0 +1,94 @@
+import pytest
+
+from app.core import registry as registry_module
+from app.core.model_selector import ModelCategory, ModelRegistry, ModelSelector, RegistrySnapshot, TaskType
+
+from cases import dataset_infos, snapshot_with_clustering
+
+
+def reference_scores(snapshot, dataset_info, task_type=None):
+    """Règles de score appliquées modèle par modèle (version antérieure à la passe vectorisée)"""
+    task = TaskType(task_type.lower() if task_type else dataset_info["task_type"])
+    num_samples, num_features = dataset_info["num_samples"], dataset_info["num_features"]
+    text, images = dataset_info["has_text_data"], dataset_info["has_image_data"]
+    results = []
+    for model in snapshot.models:
+        if task not in model.task_types:
+            continue
+        if num_samples < model.min_samples:
+            results.append({"name": model.name, "compatibility_score": None, "reason": "Pas assez d'exemples"})
+            continue
+        if model.max_features and num_features > model.max_features:
+            results.append({"name": model.name, "compatibility_score": None, "reason": "Trop de features"})
+            continue
+        rules = [
+            (text and model.recommended_for_text, 2.0, "Recommandé pour données textuelles"),
+            (images and model.recommended_for_images, 2.0, "Recommandé pour données images"),
+            (not text and not images and model.recommended_for_tabular, 2.0, "Recommandé pour données tabulaires"),
+            (num_samples >= 10000 and model.category in (ModelCategory.ENSEMBLE, ModelCategory.DEEP_LEARNING),
+             1.0, "Adapté aux gros datasets"),
+            (num_samples < 1000 and model.category == ModelCategory.CLASSICAL, 1.0, "Adapté aux petits datasets"),
+            (num_features > 100 and model.supports_sparse, 0.5, "Supporte les datasets avec nombreuses features"),
+            (model.category == ModelCategory.ENSEMBLE, 1.5, "Modèle d'ensemble performant"),
+            (model.category == ModelCategory.CLASSICAL, 0.5, "Modèle classique rapide"),
+            (model.name in ["XGBoost", "RandomForest"], 1.0, "Modèle très performant pour données tabulaires"),
+        ]
+        matched = [(weight, reason) for condition, weight, reason in rules if condition]
+        results.append({
+            "name": model.name,
+            "compatibility_score": sum(weight for weight, _ in matched),
+            "reason": "; ".join(reason for _, reason in matched) or "Compatible avec le dataset",
+        })
+    return results
+
+
+@pytest.mark.parametrize("forced", [None, "regression", "CLUSTERING"])
+def test_scores_match_per_model_rules(forced):
+    selector, snapshot = ModelSelector(), snapshot_with_clustering()
+    infos = dataset_infos()
+    scores = selector.score_models_batch(infos, [forced] * len(infos), snapshot)
+    assert scores == [reference_scores(snapshot, info, forced) for info in infos]
+
+
+def test_only_task_models_are_scored():
+    snapshot = snapshot_with_clustering()
+    info = dataset_infos()[0]
+    scored = ModelSelector().score_models({**info, "task_type": "clustering"}, None, snapshot)
+    assert [entry["name"] for entry in scored] == ["KMeans"]
+
+
+def test_indexes_follow_registry_order():
+    snapshot = snapshot_with_clustering()
+    for task_type in TaskType:
+        assert snapshot.for_task(task_type) == tuple(m for m in snapshot.models if task_type in m.task_types)
+    for category in ModelCategory:
+        assert snapshot.for_category(category) == tuple(m for m in snapshot.models if m.category == category)
+    assert snapshot.get("kmeans").name == "KMeans"
+    assert snapshot.position("KMeans") == len(snapshot) - 1
+
+
+def test_version_tracks_content():
+    models = ModelRegistry.get_all_models()
+    assert RegistrySnapshot(models).version == RegistrySnapshot(list(reversed(models))).version
+    assert RegistrySnapshot(models).version != snapshot_with_clustering().version
+    changed = ModelRegistry.get_all_models()
+    changed[0].min_samples += 1
+    assert RegistrySnapshot(changed).version != RegistrySnapshot(models).version
+
+
+def test_reload_replaces_snapshot_only_on_change(monkeypatch):
+    catalogue = [model.to_dict() for model in ModelRegistry.get_all_models()]
+    monkeypatch.setattr(registry_module, "list_catalogue", lambda: catalogue)
+    registry = registry_module.CatalogueRegistry()
+    initial = registry.snapshot
+    assert registry.reload() is False and registry.snapshot is initial
+
+    catalogue.append({**catalogue[0], "name": "Extra", "category": "inconnue"})
+    assert registry.reload() is False
+
+    catalogue[-1] = {**catalogue[0], "name": "Extra"}
+    assert registry.reload() is True
+    assert registry.snapshot.get("extra") is not None and registry.snapshot is not initial
+
+    catalogue.clear()
+    assert registry.reload() is False and registry.snapshot.get("extra") is not None
@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+
+from app.api import select
+from app.core import analysis_cache
+from app.core.model_selector import ModelSelector
+
+from cases import dataset_infos, snapshot_with_clustering
+
+
+def test_batch_scores_match_single_dataset_scores():
+    selector, snapshot = ModelSelector(), snapshot_with_clustering()
+    infos = dataset_infos()
+    forced = [None, "regression", "CLUSTERING"] * (len(infos) // 3) + [None] * (len(infos) % 3)
+    batch = selector.score_models_batch(infos, forced, snapshot)
+    assert batch == [selector.score_models(info, task, snapshot) for info, task in zip(infos, forced)]
+
+
+@pytest.fixture
+def datasets(tmp_path, monkeypatch):
+    """Deux CSV locaux (chemins sans '/', donc hors MinIO), sans cache ni mesures de coût"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(analysis_cache, "ANALYSIS_CACHE_ENABLED", False)
+    monkeypatch.setattr(select.model_selector.cost_model, "load_runs", None)
+    pd.DataFrame({"x": range(200), "y": [i % 2 for i in range(200)]}).to_csv("a.csv", index=False)
+    pd.DataFrame({"x": [i * 0.5 for i in range(300)], "y": [i * 1.5 for i in range(300)]}).to_csv("b.csv", index=False)
+    saved = []
+    monkeypatch.setattr(select, "save_model_selections", lambda records: saved.extend(records) or len(records))
+    return saved
+
+
+def batch_request(*paths):
+    return select.BatchSelectRequest(datasets=[
+        select.SelectRequest(dataset_id=f"dataset_{index}", dataset_path=path, target_column="y")
+        for index, path in enumerate(paths)
+    ])
+
+
+def test_batch_matches_single_selection(datasets, monkeypatch):
+    monkeypatch.setattr(select, "save_model_selection", lambda **record: record)
+    response = select.select_models_batch(batch_request("a.csv", "b.csv"))
+    assert response["succeeded"] == 2 and response["persisted"] and response["persist_error"] is None
+    for result, item in zip(response["results"], batch_request("a.csv", "b.csv").datasets):
+        assert result == select.select_models(item).model_dump()
+    assert [record["dataset_id"] for record in datasets] == ["dataset_0", "dataset_1"]
+
+
+def test_results_returned_when_persistence_fails(datasets, monkeypatch):
+    def fail(records):
+        raise RuntimeError("base indisponible")
+
+    monkeypatch.setattr(select, "save_model_selections", fail)
+    response = select.select_models_batch(batch_request("a.csv", "b.csv"))
+    assert response["succeeded"] == 2
+    assert response["persisted"] is False
+    assert "base indisponible" in response["persist_error"]
+    assert all(result["selected_models"] for result in response["results"])
+
+
+def test_rank_failure_only_affects_its_dataset(datasets, monkeypatch):
+    rank = select._rank
+
+    def flaky(request, *args):
+        if request.dataset_id == "dataset_0":
+            raise RuntimeError("classement impossible")
+        return rank(request, *args)
+
+    monkeypatch.setattr(select, "_rank", flaky)
+    response = select.select_models_batch(batch_request("a.csv", "b.csv", "missing.csv"))
+    first, second, third = response["results"]
+    assert first["status_code"] == 500 and "classement impossible" in first["detail"]
+    assert second["selected_models"]
+    assert third["status_code"] == 404
+    assert (response["succeeded"], response["failed"]) == (1, 2)
+    # Seule la sélection classée est enregistrée
+    assert [record["dataset_id"] for record in datasets] == ["dataset_1"]
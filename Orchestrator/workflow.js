@@ -125,6 +125,8 @@ async function executePipeline(id) {
 
         // 2. Model Selection
         let selectedModels = def.models;
+        // Entrée creuse acceptée par chaque modèle sélectionné (supports_sparse du ModelSelector)
+        const sparseSupport = {};
         if (!selectedModels || selectedModels.length === 0) {
             log('Step 2: Model Selection starting...');
             // Attention: ModelSelector attend le path local/minio
@@ -135,6 +137,9 @@ async function executePipeline(id) {
                 def.task_type
             );
             selectedModels = selectionResult.selected_models.map(m => m.name || m.model_name).slice(0, 3);
+            for (const m of selectionResult.selected_models) {
+                sparseSupport[m.name || m.model_name] = m.supports_sparse;
+            }
             await recordStep('ModelSelection', 'completed');
             log(`Model Selection done. Selected: ${selectedModels.join(', ')}`);
         } else {
@@ -152,7 +157,8 @@ async function executePipeline(id) {
                 model_name: modelName,
                 dataset_path: job.artifacts.cleaned_dataset_path,
                 target_column: def.target_column,
-                hyperparameters: def.config.hyperparameters || {}
+                hyperparameters: def.config.hyperparameters || {},
+                sparse_input: sparseSupport[modelName]
             });
 
             // Attendre la fin du job si asynchrone ? 
@@ -163,6 +169,9 @@ async function executePipeline(id) {
 
             const finalTrainStatus = await pollTrainingCompletion(trainResult.job_id);
             trainingResults.push({ model: modelName, job_id: trainResult.job_id, ...finalTrainStatus });
+            if (finalTrainStatus.status === 'completed' && finalTrainStatus.cost) {
+                await recordTrainingCost(trainResult.job_id, finalTrainStatus.cost, log);
+            }
         }
         job.artifacts.training_results = trainingResults;
         await recordStep('Training', 'completed');
@@ -216,11 +225,20 @@ async function executeDataPreparation(filePath, config) {
         };
     }
 
-    const res = await axios.post(`${SERVICES.DATA_PREPARER}/prepare`, {
+    // Préparation en tâche de fond côté DataPreparer : soumission puis polling du job
+    const res = await axios.post(`${SERVICES.DATA_PREPARER}/prepare/jobs`, {
         file_path: filePath,
         pipeline: pipelinePayload
     });
-    return res.data;
+    const job = await startPolling(
+        `${SERVICES.DATA_PREPARER}/prepare/jobs/${res.data.job_id}`,
+        (data) => data.status === 'completed' || data.status === 'failed',
+        3600000
+    );
+    if (job.status === 'failed') {
+        throw new Error(`Data preparation failed: ${job.error}`);
+    }
+    return job.result;
 }
 
 async function executeModelSelection(datasetId, datasetPath, targetCol, taskType) {
@@ -233,6 +251,17 @@ async function executeModelSelection(datasetId, datasetPath, targetCol, taskType
     return res.data;
 }
 
+// Mesures d'un entraînement transmises au ModelSelector (calibration des estimations de coût),
+// sous le nom de l'estimateur réellement entraîné (cost.model_name, renseigné par le Trainer)
+async function recordTrainingCost(jobId, cost, log) {
+    try {
+        await axios.post(`${SERVICES.MODEL_SELECTOR}/costs`, { job_id: jobId, ...cost });
+    } catch (e) {
+        // Sans conséquence sur le pipeline : la mesure est simplement perdue
+        await log(`Training cost not recorded for ${cost.model_name}: ${e.message}`);
+    }
+}
+
 async function executeTraining(payload) {
     const res = await axios.post(`${SERVICES.TRAINER}/train`, payload);
     return res.data;
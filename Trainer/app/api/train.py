@@ -1,5 +1,6 @@
 import os
 import io
+import json
 import uuid
 import joblib
 import pandas as pd
@@ -10,8 +11,11 @@ import torch.optim as optim
 import mlflow
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from minio import Minio
+from app.core.dataset_reader import read_dataset
+from app.core.feature_matrix import fit_feature_layout, build_feature_matrix, feature_layout_path
+from app.core.resource_usage import ResourceUsage
 from sklearn.model_selection import train_test_split
 # ... (imports sklearn standard existants) ...
 from sklearn.linear_model import LogisticRegression
@@ -57,6 +61,17 @@ class TrainRequest(BaseModel):
     target_column: str
     hyperparameters: Optional[Dict[str, Any]] = {}
     job_id: Optional[str] = None 
+    # Colonnes de features à charger (projection) ; toutes si None
+    feature_columns: Optional[List[str]] = None
+    # Entrée creuse (CSR) pour les colonnes category, seulement si True (jamais pour le réseau de neurones) ;
+    # défaut : matrice dense (l'Orchestrator transmet supports_sparse du ModelSelector)
+    sparse_input: Optional[bool] = None
+
+# Nom du catalogue du ModelSelector de chaque estimateur entraîné (nom de classe sinon)
+CATALOGUE_MODEL_NAMES = {
+    "RandomForestClassifier": "RandomForest",
+    "LogisticRegression": "LogisticRegression",
+}
 
 training_jobs = {}
 
@@ -65,12 +80,17 @@ def train_model_task(job_id: str, request: TrainRequest):
         training_jobs[job_id]["status"] = "running"
         
         # 1. Load Data
-        response = minio_client.get_object(MINIO_BUCKET, request.dataset_path)
-        df = pd.read_csv(io.BytesIO(response.read()))
+        columns = None
+        if request.feature_columns:
+            columns = request.feature_columns + [request.target_column]
+        df = read_dataset(minio_client, MINIO_BUCKET, request.dataset_path, columns)
         
         X = df.drop(columns=[request.target_column])
         y = df[request.target_column]
-        X = pd.get_dummies(X)
+        # Matrice de features (CSR si le modèle accepte une entrée creuse) et son schéma
+        sparse = request.model_name != "neural_network" and request.sparse_input is True
+        layout = fit_feature_layout(X, sparse)
+        X = build_feature_matrix(X, layout)
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2)
         
         # MLflow Run
@@ -93,13 +113,14 @@ def train_model_task(job_id: str, request: TrainRequest):
                 optimizer = optim.Adam(model.parameters(), lr=request.hyperparameters.get("lr", 0.001))
                 
                 epochs = request.hyperparameters.get("epochs", 10)
-                for epoch in range(epochs):
-                    optimizer.zero_grad()
-                    outputs = model(X_train_t)
-                    loss = criterion(outputs, y_train_t)
-                    loss.backward()
-                    optimizer.step()
-                    mlflow.log_metric("loss", loss.item(), step=epoch)
+                with ResourceUsage() as usage:
+                    for epoch in range(epochs):
+                        optimizer.zero_grad()
+                        outputs = model(X_train_t)
+                        loss = criterion(outputs, y_train_t)
+                        loss.backward()
+                        optimizer.step()
+                        mlflow.log_metric("loss", loss.item(), step=epoch)
                 
                 # Eval simple
                 with torch.no_grad():
@@ -120,19 +141,37 @@ def train_model_task(job_id: str, request: TrainRequest):
                 else: 
                     model = LogisticRegression() # Default
                     
-                model.fit(X_train, y_train)
-                score = model.score(X_test, y_test)
+                with ResourceUsage() as usage:
+                    model.fit(X_train, y_train)
+                    score = model.score(X_test, y_test)
                 mlflow.sklearn.log_model(model, "model")
                 model_to_save = model
 
             mlflow.log_metric("accuracy", score)
             training_jobs[job_id]["score"] = score
+            # Durée et pic mémoire mesurés, transmis au modèle de coût du ModelSelector sous le
+            # nom de l'estimateur réellement entraîné (pas celui demandé)
+            fitted_name = type(model_to_save).__name__
+            training_jobs[job_id]["cost"] = {
+                "model_name": CATALOGUE_MODEL_NAMES.get(fitted_name, fitted_name),
+                "num_samples": int(len(df)),
+                "num_features": int(df.shape[1] - 1),
+                "sparse": bool(sparse),
+                "seconds": usage.seconds,
+                "peak_memory_bytes": usage.peak_memory_bytes
+            }
+            mlflow.log_metric("training_seconds", usage.seconds)
             
             # Save to MinIO (Binary for internal usage)
             buffer = io.BytesIO()
             joblib.dump(model_to_save, buffer) # Note: Joblib works for Torch models usually but save/load state_dict is better best practice. Keeping joblib for homogeneity here.
             buffer.seek(0)
             minio_client.put_object(MINIO_BUCKET, f"models/{job_id}.joblib", buffer, buffer.getbuffer().nbytes)
+            layout_bytes = json.dumps(layout).encode("utf-8")
+            minio_client.put_object(
+                MINIO_BUCKET, feature_layout_path(f"models/{job_id}.joblib"), io.BytesIO(layout_bytes), len(layout_bytes),
+                content_type="application/json"
+            )
             
             training_jobs[job_id]["model_path"] = f"models/{job_id}.joblib"
             training_jobs[job_id]["status"] = "completed"
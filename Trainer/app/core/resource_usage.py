@@ -0,0 +1,72 @@
+"""
+Durée et pic mémoire d'un entraînement
+
+La mémoire résidente (RSS) du processus est échantillonnée par un thread
+(lecture de /proc/self/statm) pendant l'entraînement ; le pic est relatif à la
+mémoire au début du bloc. Ces mesures calibrent le modèle de coût du ModelSelector.
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+# Intervalle d'échantillonnage de la mémoire résidente (secondes)
+MEMORY_SAMPLE_INTERVAL = float(os.getenv("TRAINING_MEMORY_SAMPLE_INTERVAL", "0.05"))
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def rss_bytes() -> Optional[int]:
+    """Mémoire résidente du processus (None si /proc n'est pas disponible)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ResourceUsage:
+    """Durée et hausse maximale de la mémoire résidente entre l'entrée et la sortie du bloc"""
+
+    def __init__(self, interval: float = MEMORY_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.seconds = 0.0
+        self.start = None
+        self.peak = None
+        self._started_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self) -> None:
+        current = rss_bytes()
+        if current is not None and (self.peak is None or current > self.peak):
+            self.peak = current
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "ResourceUsage":
+        self.start = rss_bytes()
+        if self.start is not None:
+            self.peak = self.start
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.seconds = time.perf_counter() - self._started_at
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._sample()
+
+    @property
+    def peak_memory_bytes(self) -> Optional[int]:
+        if self.start is None:
+            return None
+        return max(self.peak - self.start, 0)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les tests importent le service comme au démarrage de l'application (paquet app)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,42 @@
+import time
+
+import numpy as np
+import pytest
+
+from app.core import resource_usage
+from app.core.resource_usage import ResourceUsage, rss_bytes
+
+pytestmark = pytest.mark.skipif(rss_bytes() is None, reason="/proc/self/statm indisponible")
+
+MB = 1024 * 1024
+
+
+def test_peak_of_a_block_that_allocates():
+    with ResourceUsage(interval=0.005) as usage:
+        block = np.ones(200 * MB // 8)
+        time.sleep(0.05)
+        del block
+    # Pic mesuré pendant le bloc, même si la mémoire est libérée avant la sortie
+    assert usage.peak_memory_bytes >= 150 * MB
+    assert usage.seconds >= 0.05
+
+
+def test_block_without_allocation():
+    with ResourceUsage(interval=0.005) as usage:
+        time.sleep(0.02)
+    assert 0 <= usage.peak_memory_bytes < 20 * MB
+
+
+def test_peak_is_relative_to_the_start_of_the_block():
+    baseline = np.ones(100 * MB // 8)
+    with ResourceUsage(interval=0.005) as usage:
+        pass
+    assert usage.peak_memory_bytes < 20 * MB
+    del baseline
+
+
+def test_without_proc(monkeypatch):
+    monkeypatch.setattr(resource_usage, "rss_bytes", lambda: None)
+    with ResourceUsage() as usage:
+        pass
+    assert usage.peak_memory_bytes is None and usage.seconds >= 0